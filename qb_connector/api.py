@@ -3,11 +3,18 @@
 # API and event handler functions for QB Connector integration with QuickBooks Online and ERPNext.
 
 
+import hashlib
+import json
+
 import frappe
 import requests
 from frappe import _
+from frappe.utils.background_jobs import get_job
 from frappe.utils.password import get_decrypted_password
 import qb_connector.qbo_hooks
+from qb_connector.change_detection import get_previous_value
+from qb_connector.queues import enqueue_qbo
+from qb_connector.utils import get_node_server_url, run_ts_script
 
 
 @frappe.whitelist(allow_guest=True)
@@ -25,7 +32,7 @@ def handle_qbo_callback(code=None, realmId=None):
         frappe.throw(_("Missing code or realmId in the query parameters."))
 
     # The URL of your local Node.js server
-    node_server_url = frappe.db.get_single_value("QuickBooks Settings", "node_server_url") or "http://localhost:3000"
+    node_server_url = get_node_server_url()
 
     try:
         response = requests.get(f"{node_server_url}/auth/qbo/callback", params={
@@ -88,17 +95,82 @@ def test_scheduler_job():
     frappe.logger().info("✅ test_scheduler_job executed successfully")
 
 
+# Customer fields mapped onto the QBO Customer (see ts_qbo_client/src/createCustomerInQbo.ts)
+QBO_CUSTOMER_FIELDS = (
+    "customer_name",
+    "custom_email",
+    "custom_phone",
+    "custom_street_address_line_1",
+    "custom_street_address_line_2",
+    "custom_city",
+    "custom_state",
+    "custom_zip_code",
+    "custom_country",
+    "custom_tax_status",
+)
+
+# Fields that decide whether a Customer may be created in QBO at all
+QBO_ELIGIBILITY_FIELDS = (
+    "custom_camp_link",
+    "custom_other_organization_link",
+    "custom_tax_exemption_number",
+)
+
+
+def get_qbo_fingerprint(doc) -> str:
+    """
+    Returns a hash of the Customer fields that QBO sync depends on.
+    Saves that leave this hash unchanged cannot affect QBO.
+    Args:
+        doc: The Customer document.
+    Returns:
+        str: Hex digest of the QBO-relevant field values.
+    """
+    values = [str(doc.get(field) or "").strip() for field in QBO_CUSTOMER_FIELDS + QBO_ELIGIBILITY_FIELDS]
+    return hashlib.sha1(json.dumps(values).encode()).hexdigest()
+
+
+def get_changed_qbo_fields(doc) -> list:
+    """
+    Returns the QBO-mapped Customer fields that changed in the current save.
+    Falls back to every mapped field when the previous version is not available.
+    Args:
+        doc: The Customer document being saved.
+    Returns:
+        list: Names of changed QBO-mapped fields.
+    """
+    previous = doc.get_doc_before_save()
+    if not previous:
+        return list(QBO_CUSTOMER_FIELDS)
+    return [
+        field for field in QBO_CUSTOMER_FIELDS
+        if str(doc.get(field) or "").strip() != str(previous.get(field) or "").strip()
+    ]
+
+
 def customer_update_handler(doc, method):
     """
-    Handles updates to Customer documents before save.
-    Checks for required fields and organization links, manages QBO sync status,
-    and triggers customer creation in QBO via Node.js server if needed.
+    Handles updates to Customer documents after save.
+    Skips saves that do not change any field QBO sync depends on. For customers already in QBO,
+    enqueues a sparse update of the changed fields; otherwise checks for required fields and
+    organization links, manages QBO sync status, and triggers customer creation in QBO if needed.
     Args:
         doc: The Customer document being saved.
         method: The event method triggering the handler.
     """
+    # Nothing QBO cares about changed (e.g. notes or credit limit edits) and no failed update is waiting
+    if get_qbo_fingerprint(doc) == doc.custom_qbo_fingerprint and not has_changed_fields(doc.name):
+        return
+
+    # Already in QBO: push only the fields that changed, plus any left over from a failed update.
+    # The fingerprint is written by the job after a successful push, never here.
+    if doc.custom_qbo_sync_status == "Synced" and doc.custom_qbo_customer_id:
+        changed_fields = get_changed_qbo_fields(doc)
+        if changed_fields or has_changed_fields(doc.name):
+            enqueue_customer_sync(doc.name, changed_fields)
+        return
+
     # Check if all required fields and links are present for QBO sync
-    print(f"Camp link: {doc.custom_camp_link}\nOrganization link: {doc.custom_other_organization_link}\nEmail: {doc.custom_email}\nPhone: {doc.custom_phone}\nStreet Address: {doc.custom_street_address_line_1}\nCity: {doc.custom_city}\nState: {doc.custom_state}\nZip Code: {doc.custom_zip_code}\nCountry: {doc.custom_country}\nTax Status: {doc.custom_tax_status}\nTax Exemption Number: {doc.custom_tax_exemption_number}\nQBO Sync Status: {doc.custom_qbo_sync_status}")
     if (doc.custom_camp_link or doc.custom_other_organization_link) and doc.custom_email and doc.custom_phone and doc.custom_street_address_line_1 and doc.custom_city and doc.custom_state and doc.custom_zip_code and doc.custom_country and (doc.custom_tax_status == "Taxed" or (doc.custom_tax_status == "Exempt" and doc.custom_tax_exemption_number) and doc.custom_qbo_sync_status != "Synced"):
         doc.custom_create_customer_in_qbo = 1
     else:
@@ -138,57 +210,221 @@ def customer_update_handler(doc, method):
 
     print(f"Sync Status: {doc.custom_qbo_sync_status}")
     if doc.custom_qbo_sync_status != "Synced":
-        frappe.enqueue("qb_connector.api.sync_with_qbo", queue='default', timeout=300, now=False, doc=doc, is_async=True)
+        enqueue_customer_sync(doc.name)
     else:
         doc.custom_create_customer_in_qbo = 0
 
-def sync_with_qbo(doc):
+def enqueue_customer_sync(customer_name: str, changed_fields: list = None):
+    """
+    Queues a QBO sync job for a Customer, keyed by name so at most one job per customer is pending.
+    Changed fields are collected in Redis so edits made while a job is queued are not lost.
+    A job that has already started has taken its fields, so one more job is queued behind it.
+    Args:
+        customer_name (str): The Customer name.
+        changed_fields (list, optional): QBO-mapped fields to send as a sparse update.
+    """
+    if changed_fields:
+        cache = frappe.cache()
+        for field in changed_fields:
+            cache.hset(_changed_fields_key(customer_name), field, 1)
+
+    job_id = f"qbo_customer_sync::{customer_name}"
+    job = get_job(job_id)
+    if job and job.get_status() == "started":
+        job_id = f"{job_id}::rerun"
+
+    enqueue_qbo(
+        "qb_connector.api.sync_with_qbo",
+        "interactive",
+        job_id=job_id,
+        deduplicate=True,
+        enqueue_after_commit=True,
+        customer_name=customer_name,
+    )
+
+
+# Longest a customer sync holds its lock, and the longest a rerun waits for it
+CUSTOMER_SYNC_LOCK_TIMEOUT = 120
+
+
+def _changed_fields_key(customer_name: str) -> str:
+    return f"qbo_customer_changed_fields::{customer_name}"
+
+
+def has_changed_fields(customer_name: str) -> bool:
+    """
+    Returns True if QBO-mapped fields are still queued for a Customer, e.g. after a failed update.
+    """
+    return bool(frappe.cache().hkeys(_changed_fields_key(customer_name)))
+
+
+def pop_changed_fields(customer_name: str) -> list:
+    """
+    Returns and clears the QBO-mapped fields queued for a Customer.
+    """
+    cache = frappe.cache()
+    fields = list(cache.hgetall(_changed_fields_key(customer_name)) or {})
+    if fields:
+        cache.hdel(_changed_fields_key(customer_name), fields)
+    return [field.decode() if isinstance(field, bytes) else field for field in fields]
+
+
+def sync_with_qbo(customer_name: str):
+    """
+    Background job that creates the Customer in QBO, or sends a sparse update of the
+    queued changed fields when the Customer is already linked to a QBO customer.
+    Results are written with frappe.db.set_value so the Customer hooks do not fire again.
+    Syncs of one customer run one at a time under a lock, so a rerun queued behind a running
+    create waits for it and sends an update instead of creating the customer twice.
+    Args:
+        customer_name (str): The Customer name.
+    """
+    cache = frappe.cache()
+    lock = cache.lock(
+        cache.make_key(f"qbo_customer_sync::{customer_name}"),
+        timeout=CUSTOMER_SYNC_LOCK_TIMEOUT,
+        blocking_timeout=CUSTOMER_SYNC_LOCK_TIMEOUT,
+    )
+    if not lock.acquire():
+        # The fields stay queued; the next save or retry sends them
+        frappe.logger().warning(f"⏳ QBO sync for {customer_name} still running, skipped")
+        return
+
+    try:
+        _sync_customer(customer_name)
+    finally:
+        lock.release()
+
+
+def _sync_customer(customer_name: str):
+    doc = frappe.get_doc("Customer", customer_name)
+    changed_fields = pop_changed_fields(customer_name)
+    if doc.custom_qbo_customer_id:
+        if changed_fields:
+            update_customer_in_qbo(doc, changed_fields)
+        elif doc.custom_qbo_sync_status != "Synced":
+            # Already exists in QBO: repair a Failed / Pending status left by an earlier run
+            frappe.db.set_value("Customer", doc.name, {
+                "custom_qbo_sync_status": "Synced",
+                "custom_customer_exists_in_qbo": 1,
+                "custom_create_customer_in_qbo": 0,
+            })
+            frappe.db.commit()
+            frappe.logger().info(f"✅ Customer {doc.name} exists in QBO, marked Synced.")
+        return
+
     try:
         # Call Node.js server to create customer in QBO
-        
         response = requests.post(
-            "http://localhost:3000/api/handle-customer-create",
+            f"{get_node_server_url()}/api/handle-customer-create",
             json={"customer_name": doc.name},
-            timeout=5
+            timeout=60
         )
 
         if response.status_code != 200:
-            if not doc.custom_qbo_customer_id:
-
-                doc.custom_create_customer_in_qbo = 0
-                frappe.msgprint(f"❌ Failed to sync with QBO (HTTP {response.status_code})")
-            else:
-                doc.custom_qbo_sync_status = "Synced"
-                doc.custom_create_customer_in_qbo = 0
-                frappe.msgprint(f"Customer exists in QBO")
-                doc.save(ignore_permissions=True)
+            frappe.db.set_value("Customer", doc.name, "custom_create_customer_in_qbo", 0)
+            frappe.log_error(f"Failed to sync {doc.name} with QBO (HTTP {response.status_code}): {response.text[:500]}", "QBO Sync Error")
+            frappe.db.commit()
             return
 
         result = response.json()
-
-        # Apply returned values to the doc
-        doc.custom_qbo_sync_status = result.get("custom_qbo_sync_status", "Unknown")
-        doc.custom_qbo_customer_id = result.get("custom_qbo_customer_id") or ""
-        doc.custom_last_synced_at = result.get("custom_last_synced_at") or ""
-
-        if doc.custom_qbo_sync_status == "Synced":
-            frappe.msgprint(f"✅ Successfully synced {doc.name} to QBO.")
-            doc.custom_customer_exists_in_qbo = 1
-            doc.custom_create_customer_in_qbo = 0
-            doc.save(ignore_permissions=True)
+        sync_status = result.get("custom_qbo_sync_status", "Unknown")
+        values = {
+            "custom_qbo_sync_status": sync_status,
+            "custom_qbo_customer_id": result.get("custom_qbo_customer_id") or "",
+            "custom_qbo_last_synced_at": result.get("custom_last_synced_at") or None,
+            "custom_create_customer_in_qbo": 0,
+        }
+        if sync_status == "Synced":
+            values["custom_customer_exists_in_qbo"] = 1
+            values["custom_qbo_fingerprint"] = get_qbo_fingerprint(doc)
+            frappe.logger().info(f"✅ Successfully synced {doc.name} to QBO.")
         else:
-            frappe.msgprint(f"⚠️ QBO Sync Result for {doc.name}: {doc.custom_qbo_sync_status}")
+            frappe.logger().info(f"⚠️ QBO Sync Result for {doc.name}: {sync_status}")
+
+        frappe.db.set_value("Customer", doc.name, values)
+        frappe.db.commit()
     except Exception as e:
-        doc.custom_qbo_sync_status = "Failed"
-        doc.custom_create_customer_in_qbo = 0
+        frappe.db.rollback()
+        frappe.db.set_value("Customer", doc.name, {
+            "custom_qbo_sync_status": "Failed",
+            "custom_create_customer_in_qbo": 0,
+        })
+        frappe.db.commit()
         frappe.log_error(f"Error during QBO sync for {doc.name}: {e}", "QBO Sync Error")
-        frappe.msgprint(f"❌ Exception during QBO sync: {e}")
-        doc.save(ignore_permissions=True)
+
+def update_customer_in_qbo(doc, changed_fields):
+    """
+    Sends a sparse update of the changed QBO-mapped fields via the Node.js server
+    and records the new fingerprint on success.
+    Args:
+        doc: The Customer document, already linked to a QBO customer.
+        changed_fields (list): QBO-mapped fields that changed.
+    """
+    try:
+        response = requests.post(
+            f"{get_node_server_url()}/api/handle-customer-update",
+            json={"customer_name": doc.name, "fields": changed_fields},
+            timeout=30
+        )
+        response.raise_for_status()
+        result = response.json()
+
+        frappe.db.set_value("Customer", doc.name, {
+            "custom_qbo_sync_status": result.get("custom_qbo_sync_status", "Synced"),
+            "custom_qbo_last_synced_at": result.get("custom_last_synced_at") or frappe.utils.now_datetime(),
+            "custom_qbo_fingerprint": get_qbo_fingerprint(doc),
+        })
+        frappe.db.commit()
+    except Exception as e:
+        # Put the fields back; customer_update_handler re-queues them on the next save
+        for field in changed_fields:
+            frappe.cache().hset(_changed_fields_key(doc.name), field, 1)
+        frappe.log_error(f"Error during QBO update for {doc.name} ({', '.join(changed_fields)}): {e}", "QBO Sync Error")
+
+
+@frappe.whitelist()
+def sync_customers_to_qbo():
+    """
+    Queues a bulk sync of every unsynced Customer: matches existing QBO customers
+    in memory and creates the missing eligible ones in batches.
+    Returns:
+        dict: Message for the caller.
+    """
+    frappe.only_for("System Manager")
+    enqueue_qbo(
+        "qb_connector.api.run_customer_bulk_sync",
+        "bulk",
+        job_id="qbo_customer_bulk_sync",
+        deduplicate=True,
+    )
+    return {"message": "🔄 Syncing customers with QBO in the background."}
+
+
+def run_customer_bulk_sync() -> dict:
+    """
+    Background job: runs sync/syncCustomersToQbo.ts and logs its summary.
+    Returns:
+        dict: Matched, created, skipped and failed customers, or an empty dict if the script failed.
+    """
+    result = run_ts_script("sync/syncCustomersToQbo.ts", timeout=3300)
+    if result.returncode != 0:
+        frappe.log_error(f"{result.stdout}\n{result.stderr}"[-2000:], "QBO Customer Bulk Sync Failed")
+        return {}
+
+    report = json.loads(result.stdout.strip().splitlines()[-1])
+    frappe.logger().info(
+        f"👥 QBO customer bulk sync: {len(report['matched'])} matched, {len(report['created'])} created, "
+        f"{len(report['skipped'])} skipped, {len(report['failed'])} failed in {report['seconds']}s"
+    )
+    for name, reason in report["failed"].items():
+        frappe.log_error(reason, f"QBO customer bulk sync failed for {name}")
+    return report
+
 
 def announce_synced(doc, method):
     if not doc.is_new():
-        if not hasattr(doc, "_original"):
-            doc._original = frappe.get_doc(doc.doctype, doc.name)
-        print(f"Original Sync Status: {doc._original.custom_qbo_sync_status} - new Sync Status: {doc.custom_qbo_sync_status}")
-        if doc._original.custom_qbo_sync_status != "Synced" and doc.custom_qbo_sync_status == "Synced":
+        previous_status = get_previous_value(doc, "custom_qbo_sync_status")
+        print(f"Original Sync Status: {previous_status} - new Sync Status: {doc.custom_qbo_sync_status}")
+        if previous_status != "Synced" and doc.custom_qbo_sync_status == "Synced":
             frappe.msgprint(f"✅ Customer {doc.name} has been successfully synced with QuickBooks Online.")
\ No newline at end of file
@@ -0,0 +1,220 @@
+import frappe
+from qb_connector.order_hooks import get_state_tax_map, state_to_abbr
+
+# node_client.py
+# Composite endpoints for the Node.js QBO client. Each one runs a multi-step Frappe operation
+# server-side in a single request and transaction, replacing a chain of REST round trips.
+
+# Field holding the QBO entity ID for each synced DocType
+QBO_ID_FIELDS = {
+    "Customer": "custom_qbo_customer_id",
+    "Item": "custom_qbo_item_id",
+    "Sales Invoice": "custom_qbo_sales_invoice_id",
+    "Payment Entry": "custom_qbo_payment_id",
+}
+
+# Fields the Node client may set through set_sync_status, per DocType
+SYNC_STATUS_FIELDS = {
+    "Customer": {
+        "custom_qbo_sync_status",
+        "custom_qbo_customer_id",
+        "custom_qbo_last_synced_at",
+        "custom_customer_exists_in_qbo",
+        "custom_create_customer_in_qbo",
+    },
+    "Item": {"custom_sync_status", "custom_last_synced_at", "custom_qbo_item_id"},
+    "Sales Invoice": {"custom_sync_status", "custom_last_synced_at", "custom_qbo_sales_invoice_id"},
+    "Payment Entry": {"custom_sync_status", "custom_qbo_payment_id", "custom_dont_sync_with_qbo"},
+}
+
+
+@frappe.whitelist()
+def get_names_by_qbo_id(doctype: str, qbo_ids, filters=None) -> dict:
+    """
+    Looks up many documents by their QBO ID in one query.
+    Args:
+        doctype (str): One of the DocTypes in QBO_ID_FIELDS.
+        qbo_ids (list | str): QBO IDs to look up (a JSON list over REST).
+        filters (dict | str, optional): Extra filters, e.g. {"docstatus": 1}.
+    Returns:
+        dict: QBO ID to document name, for the IDs that matched.
+    """
+    if doctype not in QBO_ID_FIELDS:
+        frappe.throw(f"{doctype} has no QBO ID field")
+    frappe.has_permission(doctype, "read", throw=True)
+
+    qbo_ids = frappe.parse_json(qbo_ids) or []
+    if not qbo_ids:
+        return {}
+
+    id_field = QBO_ID_FIELDS[doctype]
+    rows = frappe.get_all(
+        doctype,
+        filters={**(frappe.parse_json(filters) or {}), id_field: ["in", list(qbo_ids)]},
+        fields=["name", id_field],
+        order_by="creation asc",
+    )
+    names = {}
+    for row in rows:
+        names.setdefault(row[id_field], row.name)
+    return names
+
+
+@frappe.whitelist()
+def submit_doc(doctype: str, name: str) -> str:
+    """
+    Submits a saved document, reading its latest version server-side.
+    Args:
+        doctype (str): The DocType name.
+        name (str): The document name.
+    Returns:
+        str: The document name.
+    """
+    doc = frappe.get_doc(doctype, name)
+    doc.submit()
+    return doc.name
+
+
+@frappe.whitelist()
+def insert_doc(doc, submit=0, unique_field: str = None) -> dict:
+    """
+    Inserts a document and optionally submits it in the same transaction.
+    When unique_field is given and a document with the same value already exists,
+    nothing is inserted and the existing name is returned instead.
+    Args:
+        doc (dict | str): The document, including its doctype.
+        submit (int, optional): 1 to submit after insert.
+        unique_field (str, optional): Field that identifies a duplicate, e.g. custom_qbo_payment_id.
+    Returns:
+        dict: {"name": ..., "created": bool}
+    """
+    doc = frappe.parse_json(doc)
+    if unique_field and doc.get(unique_field):
+        existing = frappe.db.get_value(doc["doctype"], {unique_field: doc[unique_field]}, "name")
+        if existing:
+            return {"name": existing, "created": False}
+
+    new_doc = frappe.get_doc(doc)
+    new_doc.insert()
+    if frappe.utils.cint(submit) and new_doc.docstatus == 0:
+        new_doc.submit()
+    return {"name": new_doc.name, "created": True}
+
+
+@frappe.whitelist()
+def set_sync_status(doctype: str, updates) -> dict:
+    """
+    Writes QBO sync results for many documents in one request.
+    Values are written with frappe.db.set_value so document hooks do not fire again.
+    Args:
+        doctype (str): One of the DocTypes in SYNC_STATUS_FIELDS.
+        updates (list | str): [{"name": ..., "values": {field: value}}, ...]
+    Returns:
+        dict: {"updated": [...], "failed": {name: reason}}
+    """
+    if doctype not in SYNC_STATUS_FIELDS:
+        frappe.throw(f"Sync status cannot be set on {doctype}")
+    frappe.has_permission(doctype, "write", throw=True)
+
+    allowed = SYNC_STATUS_FIELDS[doctype]
+    result = {"updated": [], "failed": {}}
+    for update in frappe.parse_json(updates) or []:
+        name = update.get("name")
+        values = update.get("values") or {}
+        rejected = set(values) - allowed
+        if rejected:
+            result["failed"][name] = f"Fields not allowed: {', '.join(sorted(rejected))}"
+            continue
+        if not frappe.db.exists(doctype, name):
+            result["failed"][name] = "Not found"
+            continue
+        frappe.db.set_value(doctype, name, values, update_modified=False)
+        result["updated"].append(name)
+    return result
+
+
+@frappe.whitelist()
+def import_qbo_payment(payment) -> dict:
+    """
+    Creates and submits the Payment Entry for a QBO payment in one transaction:
+    skips payments already imported, matches the linked QBO invoices to submitted Sales Invoices,
+    and allocates the payment to every unpaid invoice of the first matched customer.
+    Args:
+        payment (dict | str): {"qbo_payment_id", "posting_date", "total_amount",
+            "invoice_amounts": {qbo_invoice_id: amount}, "paid_to", "mode_of_payment"}
+    Returns:
+        dict: {"status": "exists" | "created" | "skipped", "name": ..., "reason": ...}
+    """
+    frappe.has_permission("Payment Entry", "create", throw=True)
+    payment = frappe.parse_json(payment)
+    payment_id = str(payment["qbo_payment_id"])
+
+    existing = frappe.db.get_value("Payment Entry", {"custom_qbo_payment_id": payment_id}, "name")
+    if existing:
+        return {"status": "exists", "name": existing}
+
+    invoice_amounts = payment.get("invoice_amounts") or {}
+    invoices = frappe.get_all(
+        "Sales Invoice",
+        filters={"custom_qbo_sales_invoice_id": ["in", list(invoice_amounts)], "docstatus": 1},
+        fields=["name", "customer", "outstanding_amount", "custom_qbo_sales_invoice_id"],
+    )
+    invoices_by_qbo_id = {inv.custom_qbo_sales_invoice_id: inv for inv in invoices}
+
+    # A Payment Entry has a single party
+    references = []
+    party = None
+    for qbo_invoice_id, amount in invoice_amounts.items():
+        invoice = invoices_by_qbo_id.get(qbo_invoice_id)
+        if not invoice or invoice.outstanding_amount <= 0:
+            continue
+        party = party or invoice.customer
+        if invoice.customer != party:
+            continue
+        references.append({
+            "reference_doctype": "Sales Invoice",
+            "reference_name": invoice.name,
+            "allocated_amount": min(float(amount or 0), invoice.outstanding_amount),
+        })
+
+    if not references:
+        return {"status": "skipped", "reason": "No unpaid Sales Invoices matched the QBO payment"}
+
+    entry = frappe.get_doc({
+        "doctype": "Payment Entry",
+        "payment_type": "Receive",
+        "party_type": "Customer",
+        "party": party,
+        "posting_date": payment["posting_date"],
+        "paid_amount": payment["total_amount"],
+        "received_amount": payment["total_amount"],
+        "paid_to": payment.get("paid_to"),
+        "mode_of_payment": payment.get("mode_of_payment"),
+        "reference_no": payment_id,
+        "reference_date": payment["posting_date"],
+        "references": references,
+        "custom_qbo_payment_id": payment_id,
+        "custom_sync_status": "Synced",
+        "custom_dont_sync_with_qbo": 1,
+    })
+    entry.insert()
+    entry.submit()
+    frappe.logger().info(f"💵 Imported QBO payment {payment_id} as Payment Entry {entry.name}")
+    return {"status": "created", "name": entry.name}
+
+
+@frappe.whitelist()
+def get_state_taxability() -> dict:
+    """
+    Returns the cached state taxability map for the Node client, keyed by lower-case
+    abbreviation and also by lower-case state name, so a Customer's custom_state can be
+    looked up as entered.
+    Returns:
+        dict: e.g. {"md": 1, "maryland": 1, "ny": 0, "new york": 0, ...}
+    """
+    frappe.has_permission("State Tax Information", "read", throw=True)
+    state_map = dict(get_state_tax_map())
+    for name, abbr in state_to_abbr.items():
+        if abbr in state_map:
+            state_map[name] = state_map[abbr]
+    return state_map
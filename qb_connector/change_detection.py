@@ -0,0 +1,38 @@
+import frappe
+
+# change_detection.py
+# Field-level change detection shared by the save hooks, so no hook reloads the full saved
+# document (with its child tables) just to compare one field.
+
+
+def get_previous_value(doc, fieldname: str):
+    """
+    Returns the saved (pre-save) value of a field.
+    Uses the before-save snapshot Frappe keeps in memory during save() when it exists; otherwise
+    reads the single column from the database. Nothing is cached on the document, so a later
+    save() of the same object compares against that save's own snapshot.
+    Args:
+        doc: The document being saved.
+        fieldname (str): The field to look up.
+    Returns:
+        The saved value, or None for a new document.
+    """
+    if doc.is_new():
+        return None
+
+    before_save = doc.get_doc_before_save()
+    if before_save is not None:
+        return before_save.get(fieldname)
+    return frappe.db.get_value(doc.doctype, doc.name, fieldname)
+
+
+def has_value_changed(doc, fieldname: str) -> bool:
+    """
+    Returns True if a field differs from its saved value. New documents count as changed.
+    Args:
+        doc: The document being saved.
+        fieldname (str): The field to compare.
+    """
+    if doc.is_new():
+        return True
+    return doc.get(fieldname) != get_previous_value(doc, fieldname)
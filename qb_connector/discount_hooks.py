@@ -1,5 +1,7 @@
 
 import frappe
+from .change_detection import get_previous_value
+from .pricing_profile import get_pricing_profile
 
 # ========== Validation: Ensure customer discount is sane ========== 
 def validate_customer_discount(doc, method):
@@ -16,8 +18,8 @@ def validate_customer_discount(doc, method):
         # If no customer is set, nothing to validate
         return
 
-    customer = frappe.get_doc("Customer", customer_name)  # Fetch the Customer DocType
-    discount = customer.get("custom_discount_")  # Get the custom discount field
+    profile = get_pricing_profile(customer_name)  # Cached Customer pricing inputs
+    discount = profile.base_discount if profile else None  # The custom discount field
 
     try:
         discount_val = float(discount)  # Try converting discount to float
@@ -31,52 +33,63 @@ def validate_customer_discount(doc, method):
 
 
 # ========== Dynamic Discount Logic ========== 
-def apply_dynamic_discount(doc, method):
+def apply_dynamic_discount(doc, method, profile=None, recalculate=True):
     """
     Applies a dynamic discount to the document based on the customer's base discount
     and the total quantity of items. If the 'ignore discount' flag is set, disables discounting.
     Args:
         doc: The document being processed (e.g., Sales Invoice).
         method: The event method triggering the hook.
+        profile (optional): The customer's pricing profile; looked up when not given.
+        recalculate (bool, optional): Recalculate totals after a change; order_hooks passes False
+            and recalculates once at the end of its pipeline.
+    Returns:
+        bool: True if the discount fields changed.
     """
+    changed = False
     if not doc.custom_ignore_discount:
         # Only apply discount if 'ignore discount' is not checked
         customer_name = doc.customer
         if not customer_name:
             # No customer, nothing to do
-            return
+            return False
 
         total_qty = doc.total_qty or 0  # Get total quantity from the document
         discount_modifier = get_qty_discount_modifier(total_qty)  # Get extra discount based on quantity
 
-        customer = frappe.get_doc("Customer", customer_name)  # Fetch the Customer DocType
-        base_discount = float(customer.get("custom_discount_") or 0)  # Get base discount, default to 0
+        profile = profile or get_pricing_profile(customer_name)  # Cached Customer pricing inputs
+        if not profile:
+            frappe.throw(f"Customer {customer_name} not found")
+        base_discount = float(profile.base_discount or 0)  # Get base discount, default to 0
 
         total_discount_percentage = base_discount + discount_modifier  # Sum base and modifier
 
-        # For non-new docs, store the original for comparison
-        if not doc.is_new() and not hasattr(doc, "_original"):
-            doc._original = frappe.get_doc(doc.doctype, doc.name)
-
-        # Only update discount if it's a new doc or the discount has changed
-        if (doc.is_new() and not doc.additional_discount_percentage) or (hasattr(doc, "_original") and doc._original.additional_discount_percentage != total_discount_percentage):
+        # Only update discount if it's a new doc or the saved discount differs
+        if doc.is_new():
+            needs_update = not doc.additional_discount_percentage
+        else:
+            needs_update = get_previous_value(doc, "additional_discount_percentage") != total_discount_percentage
+        if needs_update:
             # Set ERPNext discount fields
             doc.apply_discount_on = "Net Total"  # Apply discount on net total
             doc.additional_discount_percentage = total_discount_percentage  # Set the calculated discount
             # doc.additional_discount_amount = 0  # Let ERPNext calculate this automatically
-
-            doc.calculate_taxes_and_totals()  # Recalculate totals after discount
+            changed = True
 
             frappe.msgprint(f"✅ Applied total discount of {total_discount_percentage:.2f}%")
     else:
         # If 'ignore discount' is checked, set discount fields to zero
+        changed = bool(doc.additional_discount_percentage or doc.discount_amount or doc.apply_discount_on != "Net Total")
         doc.apply_discount_on = "Net Total"
         doc.additional_discount_percentage = 0
         doc.discount_amount = 0
-        doc.calculate_taxes_and_totals()
 
         print("Discounting Skipped due to ignore_discount checkbox")
 
+    if changed and recalculate:
+        doc.calculate_taxes_and_totals()  # Recalculate totals after discount
+    return changed
+
 
 
 def get_qty_discount_modifier(qty):
@@ -22,7 +22,9 @@ fixtures = [
             ["name", "in", [
                 "State Tax Information", 
                 "QuickBooks Settings", 
-                "Shipment Tracker"
+                "Shipment Tracker",
+                "Negotiated Price",
+                "Shipment Status Summary"
             ]]
         ]
     },
@@ -38,7 +40,9 @@ fixtures = [
             "Tax Category", 
             "Payment Entry", 
             "Sales Order",
-            "Shipment Tracker"
+            "Shipment Tracker",
+            "Camp",
+            "Other Organization"
         ]]]
     },
 
@@ -52,7 +56,9 @@ fixtures = [
             "Item", 
             "Tax Category", 
             "Payment Entry", 
-            "Sales Order"
+            "Sales Order",
+            "Camp",
+            "Other Organization"
         ]]]
     },
 
@@ -84,6 +90,16 @@ fixtures = [
         ]]]
     },
 
+    # Shipments workspace cards and charts (read Shipment Status Summary)
+    {
+        "doctype": "Number Card",
+        "filters": [["document_type", "=", "Shipment Status Summary"]]
+    },
+    {
+        "doctype": "Dashboard Chart",
+        "filters": [["name", "in", ["Shipments by Status", "Shipments by Month"]]]
+    },
+
     # Workspaces
     {
         "doctype": "Workspace",
@@ -116,8 +132,17 @@ fixtures = [
 
 
 scheduler_events = {
+    "all": [
+        "qb_connector.qbo_hooks.schedule_item_push_flush"
+    ],
     "hourly": [
         "qb_connector.api.refresh_qbo_token"
+    ],
+    "daily": [
+        "qb_connector.item_reconciliation.enqueue_item_drift_reconciliation"
+    ],
+    "weekly": [
+        "qb_connector.shipment_summary.enqueue_summary_rebuild"
     ]
 }
 override_whitelisted_methods = {
@@ -126,7 +151,13 @@ override_whitelisted_methods = {
 
 doc_events = {
     "Customer": {
-        "on_update": "qb_connector.api.customer_update_handler",
+        "on_update": [
+            "qb_connector.api.customer_update_handler",
+            "qb_connector.pricing_profile.clear_customer_pricing_profile",
+            "qb_connector.repricing.enqueue_customer_repricing"
+        ],
+        "on_trash": "qb_connector.pricing_profile.clear_customer_pricing_profile",
+        "after_rename": "qb_connector.pricing_profile.clear_renamed_customer_pricing_profile"
     },
     "Item": {
         "before_save": "qb_connector.qbo_hooks.sync_qbo_cost_on_update"
@@ -141,9 +172,18 @@ doc_events = {
             "qb_connector.shipment_hooks.link_invoice_to_tracker"
         ] 
     },
-    # "Camp":{
-    #     "on_update": "qb_connector.api.customer_discount_update"
-    # },
+    "Camp": {
+        "on_update": [
+            "qb_connector.pricing_profile.clear_organization_pricing_profiles",
+            "qb_connector.repricing.enqueue_organization_repricing"
+        ]
+    },
+    "Other Organization": {
+        "on_update": [
+            "qb_connector.pricing_profile.clear_organization_pricing_profiles",
+            "qb_connector.repricing.enqueue_organization_repricing"
+        ]
+    },
     "Sales Order": {
         "on_submit": "qb_connector.shipment_hooks.create_shipment_tracker",
         "before_save": "qb_connector.order_hooks.order_hooks"      
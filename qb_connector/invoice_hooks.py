@@ -5,6 +5,9 @@ import json
 import os
 from frappe.utils import now_datetime
 import qb_connector.api
+import qb_connector.qbo_hooks
+from qb_connector.queues import enqueue_qbo
+from qb_connector.sync_retry import enqueue_failed_sync_retry
 
 # invoice_hooks.py
 # Hooks and helpers for syncing Sales Invoices to QuickBooks Online (QBO) and handling tax logic.
@@ -13,50 +16,55 @@ import qb_connector.api
 # ========== Hook: Sync Sales Invoice to QBO ==========
 def sync_sales_invoice_to_qbo(doc, method):
     """
-    Syncs a Sales Invoice document to QuickBooks Online (QBO) by calling a Node.js TypeScript script.
-    Updates the sync status in ERPNext based on the result.
+    Queues the QBO sync of a submitted Sales Invoice on the transactional queue.
+    The job runs after the submit commits, so the Node.js script reads the submitted invoice.
     Args:
         doc: The Sales Invoice document being submitted.
         method: The event method triggering the hook (e.g., 'on_submit').
     """
-    print(f"🚨 Hook triggered for Sales Invoice: {doc.name}")
     frappe.logger().info(f"🚨 Hook triggered for Sales Invoice: {doc.name}")
-    if not doc.custom_dont_sync:
-        try:
-            print("🔧 Starting QBO script execution...")
-            # Only sync if the 'don't sync' flag is not set
-            if not doc.custom_dont_sync:
-                # Run the TypeScript script to sync invoice to QBO
-                invoice_id = run_qbo_script("syncInvoiceToQbo.ts", doc.name)
-
-                # Determine sync status based on script result
-                if invoice_id >= 0:
-                    status = "Synced"
-                else:
-                    status = "Failed"
-                    invoice_id = None
-
-                print(f"📨 Enqueuing sync status update → {status}")
-                # Enqueue a background job to update sync status in ERPNext
-                if invoice_id:
-                    frappe.enqueue("qb_connector.qbo_hooks.mark_qbo_sync_status",
-                                doctype=doc.doctype,
-                                docname=doc.name,
-                                status=status,
-                                invoice_id=invoice_id)
-                else:
-                    frappe.enqueue("qb_connector.qbo_hooks.mark_qbo_sync_status",
-                        doctype=doc.doctype,
-                        docname=doc.name,
-                        status=status)
-
-                print(f"🧾 Enqueued Sales Invoice sync status update for {doc.name}")
-                frappe.logger().info(f"🧾 Enqueued Sales Invoice sync status update → {status}")
-            else:
-                print("Not syncing due to don't sync flag")
-        except Exception as e:
-            print(f"❌ Error in sync_sales_invoice_to_qbo: {e}")
-            frappe.logger().error(f"❌ Sales Invoice sync failed: {str(e)}")
+    if doc.custom_dont_sync:
+        print("Not syncing due to don't sync flag")
+        return
+
+    enqueue_qbo(
+        "qb_connector.invoice_hooks.sync_sales_invoice_job",
+        "transactional",
+        job_id=f"qbo_invoice_sync::{doc.name}",
+        deduplicate=True,
+        enqueue_after_commit=True,
+        docname=doc.name,
+    )
+
+
+def sync_sales_invoice_job(docname: str):
+    """
+    Background job: syncs a Sales Invoice to QBO by calling a Node.js TypeScript script
+    and records the sync status in ERPNext.
+    Args:
+        docname (str): The name of the Sales Invoice to sync.
+    """
+    try:
+        # Run the TypeScript script to sync invoice to QBO
+        invoice_id = run_qbo_script("syncInvoiceToQbo.ts", docname)
+
+        # Determine sync status based on script result
+        if invoice_id >= 0:
+            status = "Synced"
+        else:
+            status = "Failed"
+            invoice_id = None
+
+        qb_connector.qbo_hooks.mark_qbo_sync_status(
+            doctype="Sales Invoice",
+            docname=docname,
+            status=status,
+            invoice_id=invoice_id,
+        )
+        frappe.logger().info(f"🧾 Sales Invoice {docname} sync status → {status}")
+    except Exception as e:
+        print(f"❌ Error in sync_sales_invoice_job: {e}")
+        frappe.logger().error(f"❌ Sales Invoice sync failed: {str(e)}")
 
 
 
@@ -121,27 +129,9 @@ def run_qbo_script(script_name: str, docname: str) -> int:
 @frappe.whitelist()
 def retry_failed_invoice_syncs():
     """
-    Attempts to re-sync all Sales Invoices that previously failed to sync to QBO.
-    Returns a summary message and refresh flag.
+    Queues a background job that re-syncs all Sales Invoices that previously failed to sync to QBO.
+    Progress is pushed to the list view as the job runs.
     Returns:
         dict: Message and refresh status for the UI.
     """
-    resynced_count = 0
-
-    # Find all invoices with sync status 'Failed'
-    failed_invoices = frappe.get_all("Sales Invoice", filters={"custom_sync_status": "Failed"}, fields=["name"])
-    for inv in failed_invoices:
-        try:
-            # Try to sync each failed invoice again
-            sync_sales_invoice_to_qbo(frappe.get_doc("Sales Invoice", inv.name), "manual_retry")
-            resynced_count += 1
-        except Exception as e:
-            frappe.log_error(str(e), f"Retry failed for {inv.name}")
-
-    return {
-        "message": f"✅ Resynced {resynced_count} invoice(s).",
-        "refresh": resynced_count > 0
-    }
-
-
-
+    return enqueue_failed_sync_retry("Sales Invoice")
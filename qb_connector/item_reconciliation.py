@@ -0,0 +1,102 @@
+import time
+
+import frappe
+from qb_connector.qbo_hooks import get_selling_price_list, push_items_to_qbo
+from qb_connector.queues import enqueue_qbo
+from qb_connector.utils import qbo_query_all
+
+# item_reconciliation.py
+# Scheduled check that QBO item prices/costs still match ERPNext, pushing only the items that drifted.
+
+# Differences below half a cent are rounding, not drift
+DRIFT_TOLERANCE = 0.005
+
+
+def enqueue_item_drift_reconciliation():
+    """
+    Scheduler entry point: runs the reconciliation on the bulk queue instead of the scheduler's queue.
+    """
+    enqueue_qbo(
+        "qb_connector.item_reconciliation.reconcile_item_drift",
+        "bulk",
+        job_id="qbo_item_drift_reconciliation",
+        deduplicate=True,
+    )
+
+
+def reconcile_item_drift() -> dict:
+    """
+    Compares QBO UnitPrice/PurchaseCost with ERPNext selling price_list_rate/valuation_rate
+    for every linked Item and pushes the drifted items back to QBO in batches.
+    Returns:
+        dict: Counts of compared and drifted items, push results, and per-stage timings in seconds.
+    """
+    timings = {}
+
+    # Stage 1: page every active QBO item once
+    stage = time.time()
+    qbo_items = {
+        row["Id"]: row
+        for row in qbo_query_all("Item", select="Id, UnitPrice, PurchaseCost", where="Active = true")
+    }
+    timings["fetch_qbo"] = round(time.time() - stage, 3)
+
+    # Stage 2: load every linked Item and its selling price with one query each
+    stage = time.time()
+    items = frappe.get_all(
+        "Item",
+        filters={"custom_qbo_item_id": ["is", "set"], "disabled": 0},
+        fields=["name", "custom_qbo_item_id", "valuation_rate"],
+        limit_page_length=0,
+    )
+    prices = frappe.get_all(
+        "Item Price",
+        filters={"price_list": get_selling_price_list(), "selling": 1},
+        fields=["item_code", "price_list_rate"],
+        order_by="modified desc",
+        limit_page_length=0,
+    )
+    price_by_item = {}
+    for price in prices:
+        price_by_item.setdefault(price.item_code, price.price_list_rate)
+    timings["load_frappe"] = round(time.time() - stage, 3)
+
+    # Stage 3: compare in memory
+    stage = time.time()
+    drifted = [
+        item.name
+        for item in items
+        if item.custom_qbo_item_id in qbo_items
+        and has_drifted(item, price_by_item.get(item.name), qbo_items[item.custom_qbo_item_id])
+    ]
+    missing_in_qbo = sum(1 for item in items if item.custom_qbo_item_id not in qbo_items)
+    timings["compare"] = round(time.time() - stage, 3)
+
+    # Stage 4: push only the deltas
+    stage = time.time()
+    outcome = push_items_to_qbo(drifted) if drifted else {"synced": [], "failed": {}}
+    timings["push"] = round(time.time() - stage, 3)
+
+    report = {
+        "compared": len(items) - missing_in_qbo,
+        "missing_in_qbo": missing_in_qbo,
+        "drifted": len(drifted),
+        "pushed": len(outcome["synced"]),
+        "failed": len(outcome["failed"]),
+        "deferred": len(outcome.get("deferred") or []),
+        "timings": timings,
+    }
+    frappe.logger().info(f"🧮 QBO item drift reconciliation: {report}")
+    return report
+
+
+def has_drifted(item, selling_price, qbo_item: dict) -> bool:
+    """
+    Returns True if the ERPNext price or cost of an Item differs from its QBO item.
+    Values that ERPNext does not have are not compared, matching what push_items_to_qbo sends.
+    """
+    if selling_price is not None and abs(float(selling_price) - float(qbo_item.get("UnitPrice") or 0)) > DRIFT_TOLERANCE:
+        return True
+    if item.valuation_rate is not None and abs(float(item.valuation_rate) - float(qbo_item.get("PurchaseCost") or 0)) > DRIFT_TOLERANCE:
+        return True
+    return False
@@ -1,5 +1,9 @@
+import hashlib
+import json
+
 import frappe
 from .discount_hooks import apply_dynamic_discount, get_qty_discount_modifier, validate_customer_discount
+from .pricing_profile import get_pricing_profile
 
 # order_hooks.py
 # This file contains hooks and helpers for Sales Orders and Sales Invoices, including discount and tax logic.
@@ -8,43 +12,184 @@ from .discount_hooks import apply_dynamic_discount, get_qty_discount_modifier, v
 def order_hooks(doc, method):
     """
     Main hook called for Sales Orders and Sales Invoices.
-    Applies negotiated item prices, dynamic discounts, and tax status logic.
+    Runs the pricing pipeline in order: negotiated item prices, dynamic discounts, then tax status.
+    Totals are recalculated once at the end, and only if one of the steps changed the document.
+    A Sales Invoice made from a Sales Order whose pricing inputs are unchanged reuses the order's result.
     Args:
         doc: The document being processed (Sales Order or Sales Invoice).
         method: The event method triggering the hook.
     """
     if not doc.custom_built_from_webhook:
-        check_negotiated_items(doc, method)  # Update item prices if negotiated
-        apply_dynamic_discount(doc, method)  # Apply customer and quantity-based discounts
-        use_tax_status(doc, method)  # Set tax exemption status
+        # Customer, organization and state tax inputs, from one cache lookup
+        profile = get_pricing_profile(doc.customer)
+        if doc.doctype == "Sales Invoice" and reuse_order_pricing(doc, profile):
+            return
+
+        changed = check_negotiated_items(doc, method, profile)  # Update item prices if negotiated
+        changed = apply_dynamic_discount(doc, method, profile, recalculate=False) or changed  # Apply customer and quantity-based discounts
+        changed = use_tax_status(doc, method, profile) or changed  # Set tax exemption status
+        if changed:
+            doc.calculate_taxes_and_totals()
+
+        if doc.doctype == "Sales Order":
+            store_pricing_result(doc, profile)
     else:
         print("Skipping order_hooks for webhook-built document.")
 
+
+# ========== Pricing Reuse (Sales Order -> Sales Invoice) ==========
+def get_pricing_fingerprint(doc, profile) -> str:
+    """
+    Returns a hash of every input the pricing pipeline reads: the customer's pricing profile,
+    the ignore flags and the (item_code, qty) lines.
+    Args:
+        doc: The Sales Order or Invoice document.
+        profile: The customer's pricing profile.
+    Returns:
+        str: Hex digest of the pricing inputs.
+    """
+    inputs = {
+        "profile": profile,
+        "ignore_discount": int(doc.custom_ignore_discount or 0),
+        "ignore_negotiated_price": int(doc.custom_ignore_negotiated_price or 0),
+        "lines": sorted((item.item_code, float(item.qty or 0)) for item in doc.items),
+    }
+    return hashlib.sha1(json.dumps(inputs, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def store_pricing_result(doc, profile):
+    """
+    Records the pricing result and its input fingerprint on a Sales Order, for invoices made from it.
+    Args:
+        doc: The Sales Order document.
+        profile: The customer's pricing profile.
+    """
+    if not profile:
+        return
+
+    # Only the rates the pipeline sets (negotiated prices), keyed by Sales Order Item row, so two lines
+    # of one item stay apart and manual rates on other lines are left to the invoice
+    negotiated_rates = {}
+    if not doc.custom_ignore_negotiated_price and profile.organization:
+        negotiated_rates = {
+            item.name: item.rate
+            for item in doc.items
+            if item.name and item.item_code in profile.negotiated_prices
+        }
+
+    doc.custom_pricing_fingerprint = get_pricing_fingerprint(doc, profile)
+    doc.custom_pricing_result = json.dumps({
+        "negotiated_rates": negotiated_rates,
+        "apply_discount_on": doc.apply_discount_on,
+        "additional_discount_percentage": doc.additional_discount_percentage,
+        "exempt_from_sales_tax": int(doc.exempt_from_sales_tax or 0),
+    })
+
+
+def reuse_order_pricing(doc, profile) -> bool:
+    """
+    Applies the stored pricing result of the Sales Order an invoice was made from, if the
+    invoice's pricing inputs match the order's fingerprint: the negotiated rates of the lines made
+    from the order's rows (matched by so_detail), the discount and the tax exemption. Other line
+    rates are kept, as the full pipeline would. Totals are recalculated only if the result changed
+    the invoice.
+    Args:
+        doc: The Sales Invoice document.
+        profile: The customer's pricing profile.
+    Returns:
+        bool: True if the order's result was reused; False if full pricing must run.
+    """
+    sales_orders = {item.sales_order for item in doc.items}
+    if not profile or len(sales_orders) != 1 or None in sales_orders:
+        return False
+
+    order = frappe.db.get_value(
+        "Sales Order", sales_orders.pop(), ["custom_pricing_fingerprint", "custom_pricing_result"], as_dict=True
+    )
+    if not order or not order.custom_pricing_fingerprint or not order.custom_pricing_result:
+        return False
+    if order.custom_pricing_fingerprint != get_pricing_fingerprint(doc, profile):
+        return False
+
+    result = json.loads(order.custom_pricing_result)
+    if "negotiated_rates" not in result:
+        # Stored before results were keyed by order row: price the invoice in full
+        return False
+
+    changed = False
+    for item in doc.items:
+        rate = result["negotiated_rates"].get(item.so_detail)
+        if rate is not None and item.rate != rate:
+            item.rate = rate
+            changed = True
+
+    for field in ("apply_discount_on", "additional_discount_percentage"):
+        if doc.get(field) != result[field]:
+            doc.set(field, result[field])
+            changed = True
+
+    if result["exempt_from_sales_tax"]:
+        changed = changed or not doc.exempt_from_sales_tax or bool(doc.taxes_and_charges) or bool(doc.get("taxes"))
+        doc.exempt_from_sales_tax = 1
+        doc.taxes_and_charges = None
+        doc.set("taxes", [])
+        doc.total_taxes_and_charges = 0
+    elif doc.exempt_from_sales_tax:
+        doc.exempt_from_sales_tax = 0
+        changed = True
+
+    if changed:
+        doc.calculate_taxes_and_totals()
+    return True
+
 # ========== Tax Status Application ==========
-def use_tax_status(doc, method):
+def use_tax_status(doc, method, profile=None):
     """
     Sets the 'exempt_from_sales_tax' flag and clears taxes if the customer is tax exempt
     or their state tax status is 0. Otherwise, leaves taxes as normal.
+    Totals are not recalculated here; order_hooks does that once for the whole pipeline.
     Args:
         doc: The Sales Order or Invoice document.
         method: The event method triggering the hook.
+        profile (optional): The customer's pricing profile; looked up when not given.
+    Returns:
+        bool: True if the tax flag or the taxes changed.
     """
     try:
-        # Fetch the linked customer document
-        customer = frappe.get_doc("Customer", doc.customer)
+        profile = profile or get_pricing_profile(doc.customer)
+        if not profile:
+            raise ValueError(f"Customer '{doc.customer}' not found")
+        state_tax_status = get_profile_state_tax_status(profile)
 
-        print(f"Tax Status: {customer.custom_tax_status}\n State Status: {get_state_tax_status(customer)}")
+        print(f"Tax Status: {profile.tax_status}\n State Status: {state_tax_status}")
         # Exempt from sales tax if customer is marked 'Exempt' or state tax status is 0
-        if customer.custom_tax_status == "Exempt" or get_state_tax_status(customer) == 0:
+        if profile.tax_status == "Exempt" or state_tax_status == 0:
+            changed = not doc.exempt_from_sales_tax or bool(doc.taxes_and_charges) or bool(doc.get("taxes"))
             doc.exempt_from_sales_tax = 1
             doc.taxes_and_charges = None  # Remove any taxes and charges
             doc.set("taxes", [])          # Clear taxes table
             doc.total_taxes_and_charges = 0
-        else:
-            doc.exempt_from_sales_tax = 0
+            return changed
+
+        changed = bool(doc.exempt_from_sales_tax)
+        doc.exempt_from_sales_tax = 0
+        return changed
     except Exception as e:
         raise ValueError(f"❌ Doc does not have a valid customer link: {str(e)}")
 
+
+def get_profile_state_tax_status(profile):
+    """
+    Returns the state tax status held in a pricing profile, with the same results as
+    get_state_tax_status: 0 or 1, or False if the state is not in State Tax Information.
+    """
+    if not profile.has_state:
+        raise ValueError("❌ Invalid billing address format (expected at least 3 parts: 'Street, City, State').")
+    if profile.state_tax_status is None:
+        frappe.msgprint(f"❌ State '{profile.state}' not found in US State Tax Information DocType. \n(If this customer is outside the US, ignore this message.))")
+        return False
+    return profile.state_tax_status
+
 state_to_abbr = {
     'alabama': 'al',
     'alaska': 'ak',
@@ -98,105 +243,135 @@ state_to_abbr = {
     'wyoming': 'wy'
 }
 
+# Redis key of the cached state taxability map
+STATE_TAX_MAP_KEY = "qbo_state_tax_map"
+
+
+def get_state_tax_map() -> dict:
+    """
+    Returns the taxability of every state in State Tax Information, keyed by lower-case
+    state abbreviation. Built once from the singleton and cached until it is saved again.
+    Returns:
+        dict: e.g. {"md": 1, "ny": 0, ...}
+    """
+    return frappe.cache().get_value(STATE_TAX_MAP_KEY, generator=build_state_tax_map)
+
+
+def build_state_tax_map() -> dict:
+    """
+    Reads State Tax Information into a dict keyed by state abbreviation.
+    Abbreviations come from each field's label, so fields not named after their
+    abbreviation (e.g. new_york) are keyed correctly.
+    Returns:
+        dict: Lower-case state abbreviation to 0 or 1.
+    """
+    values = frappe.db.get_singles_dict("State Tax Information")
+    state_map = {}
+    for df in frappe.get_meta("State Tax Information").fields:
+        if df.fieldtype != "Check":
+            continue
+        abbr = state_to_abbr.get((df.label or "").strip().lower(), df.fieldname)
+        state_map[abbr] = frappe.utils.cint(values.get(df.fieldname))
+    return state_map
+
+
+def clear_state_tax_map():
+    """
+    Drops the cached state taxability map; called when State Tax Information is saved.
+    """
+    frappe.cache().delete_value(STATE_TAX_MAP_KEY)
+
+
+def normalize_state(state: str) -> str | None:
+    """
+    Returns the lower-case abbreviation for a state name or abbreviation, or None if unknown.
+    """
+    state = (state or "").strip().lower()
+    if len(state) > 2:
+        # Convert full state name to abbreviation if necessary
+        return state_to_abbr.get(state)
+    return state or None
+
+
 def get_state_tax_status(customer):
     """
     Looks up the state tax status for a customer based on their state field.
-    Returns the value from the State Tax Information DocType if found, else False.
+    Returns the value from the cached State Tax Information map if found, else False.
     Args:
-        customer: The Customer document.
+        customer: The Customer document (or a dict with custom_state).
     Returns:
         int or bool: The state tax status value (usually 0 or 1), or False if not found.
     """
-    try:
-        state = customer.custom_state.lower()  # Get the state from the customer
-        print(f"📂 State: {state}")
-        if len(state) > 2:
-            # Convert full state name to abbreviation if necessary
-            state = state_to_abbr.get(state)
-    except Exception:
+    if not customer.custom_state:
         raise ValueError("❌ Invalid billing address format (expected at least 3 parts: 'Street, City, State').")
 
-    state_info = frappe.get_doc("State Tax Information", "State Tax Information")
+    state = normalize_state(customer.custom_state)
+    print(f"📂 State: {state}")
 
-    meta = frappe.get_meta("State Tax Information")
-    # Check if the state exists as a field in State Tax Information
-    if has_field("State Tax Information", state):
-        # Return the value of the state field
-        return state_info.get(state)
-    else:
-        frappe.msgprint(f"❌ State '{state}' not found in US State Tax Information DocType. \n(If this customer is outside the US, ignore this message.))")
-        return False
-def has_field(doctype: str, fieldname: str) -> bool:
-    """
-    Checks if the specified DocType has a field with the given fieldname.
+    state_map = get_state_tax_map()
+    if state in state_map:
+        return state_map[state]
 
-    Args:
-        doctype (str): The name of the DocType.
-        fieldname (str): The fieldname to check.
+    frappe.msgprint(f"❌ State '{state}' not found in US State Tax Information DocType. \n(If this customer is outside the US, ignore this message.))")
+    return False
 
-    Returns:
-        bool: True if the field exists in the DocType, False otherwise.
-    """
-    meta = frappe.get_meta(doctype)
-    return any(df.fieldname == fieldname for df in meta.fields)
-def check_negotiated_items(doc, method):
+
+def check_negotiated_items(doc, method, profile=None):
     """
-    Checks if the customer is linked to a Camp or Other Organization and applies negotiated prices
-    for specific items (wristband, regular account, staff account) if set. Updates item prices in the order.
+    Checks if the customer is linked to a Camp or Other Organization and applies the negotiated
+    prices from its Negotiated Prices table to the order lines.
     Args:
         doc: The Sales Order or Invoice document.
         method: The event method triggering the hook.
+        profile (optional): The customer's pricing profile; looked up when not given.
+    Returns:
+        bool: True if any line rate changed.
     """
     try:
         # Only apply negotiated prices if the ignore flag is not set
         if not doc.custom_ignore_negotiated_price:
-            customer = frappe.get_doc("Customer", doc.customer)
-            organization = None
-            # Determine which organization the customer is linked to
-            if customer.custom_camp_link:
-                organization = frappe.get_doc("Camp", customer.custom_camp_link)
-            elif customer.custom_other_organization_link:
-                organization = frappe.get_doc("Other Organization", customer.custom_other_organization_link)
-
-            if organization is None:
+            profile = profile or get_pricing_profile(doc.customer)
+            if not profile:
+                raise ValueError(f"Customer '{doc.customer}' not found")
+
+            if not profile.organization:
                 frappe.msgprint("Customer is not Linked to a Camp or an Organization")
-                return
-
-            # Check and apply negotiated wristband price
-            if organization.negotiated_wristband:
-                if organization.negotiated_wristband_price:
-                    search_order_and_update_price(doc, organization.negotiated_wristband, organization.negotiated_wristband_price)
-                else:
-                    frappe.msgprint("Customer has a negotiated wristband, but no negotiated writband price")
-
-            # Check and apply negotiated regular account price
-            if organization.negotiated_regular_account:
-                if organization.negotiated_regular_account_price:
-                    search_order_and_update_price(doc, organization.negotiated_regular_account, organization.negotiated_regular_account_price)
-                else:
-                    frappe.msgprint("Customer has a negotiated account, but no negotiated account price")
-
-            # Check and apply negotiated staff account price
-            if organization.negotiated_staff_account:
-                if organization.negotiated_staff_account_price:
-                    search_order_and_update_price(doc, organization.negotiated_staff_account, organization.negotiated_staff_account_price)
-                else:
-                    frappe.msgprint("Customer has a negotiated account, but no negotiated account price")
+                return False
+
+            for item_code in profile.negotiated_without_price:
+                frappe.msgprint(f"Customer has a negotiated price for {item_code}, but no negotiated price is set")
+
+            changed = apply_negotiated_prices(doc, profile.negotiated_prices)
+            if changed:
+                lines = ", ".join(f"row {line['idx']} {line['item_code']}: ${line['price']}" for line in changed)
+                frappe.msgprint(f"Changed to the negotiated price: {lines}")
+            return bool(changed)
     except Exception as e:
         frappe.msgprint(f"Failed due to: {str(e)}")
+    return False
 
-def search_order_and_update_price(order, target, new_price):
+
+def apply_negotiated_prices(order, negotiated_prices: dict) -> list:
     """
-    Searches the order's items for a specific item code and updates its price to the negotiated price.
-    Also sets the 'ignore discount' flag to prevent further discounting on this item.
+    Sets every order line whose item has a negotiated price to that price, in one pass over the lines.
+    Also sets the 'ignore discount' flag when any line changes, to prevent further discounting.
     Args:
         order: The Sales Order or Invoice document.
-        target: The item code to search for.
-        new_price: The negotiated price to set.
+        negotiated_prices (dict): Item code to negotiated price.
+    Returns:
+        list: The changed lines as {"idx", "item_code", "old_rate", "price"}.
     """
+    changed = []
+    if not negotiated_prices:
+        return changed
+
     for item in order.items:
-        if item.item_code == target:
-            if item.rate != new_price:
-                order.custom_ignore_discount = 1  # Prevent further discounting
-                item.rate = new_price
-                frappe.msgprint(f"{item.item_code} price changed to the negotiated price: ${new_price}")
\ No newline at end of file
+        price = negotiated_prices.get(item.item_code)
+        if price is None or item.rate == price:
+            continue
+        changed.append({"idx": item.idx, "item_code": item.item_code, "old_rate": item.rate, "price": price})
+        item.rate = price
+
+    if changed:
+        order.custom_ignore_discount = 1  # Prevent further discounting
+    return changed
@@ -0,0 +1,8 @@
+from qb_connector.shipment_summary import rebuild_shipment_summary
+
+
+def execute():
+    """
+    Counts the existing Shipment Trackers into Shipment Status Summary.
+    """
+    rebuild_shipment_summary()
@@ -0,0 +1,47 @@
+import frappe
+
+# Legacy negotiated (item field, price field) pairs on Camp and Other Organization
+LEGACY_NEGOTIATED_FIELDS = (
+    ("negotiated_wristband", "negotiated_wristband_price"),
+    ("negotiated_regular_account", "negotiated_regular_account_price"),
+    ("negotiated_staff_account", "negotiated_staff_account_price"),
+)
+
+
+def execute():
+    """
+    Copies the three fixed negotiated items of every Camp and Other Organization
+    into its Negotiated Prices table. Organizations that already have rows are skipped.
+    """
+    for doctype in ("Camp", "Other Organization"):
+        if not frappe.db.table_exists(doctype):
+            continue
+        fields = [field for pair in LEGACY_NEGOTIATED_FIELDS for field in pair if frappe.db.has_column(doctype, field)]
+        if not fields:
+            continue
+
+        migrated = set(frappe.get_all(
+            "Negotiated Price",
+            filters={"parenttype": doctype, "parentfield": "custom_negotiated_prices"},
+            pluck="parent",
+        ))
+        for org in frappe.get_all(doctype, fields=["name"] + fields):
+            if org.name in migrated:
+                continue
+            idx = 0
+            for item_field, price_field in LEGACY_NEGOTIATED_FIELDS:
+                if not org.get(item_field):
+                    continue
+                idx += 1
+                frappe.get_doc({
+                    "doctype": "Negotiated Price",
+                    "parenttype": doctype,
+                    "parent": org.name,
+                    "parentfield": "custom_negotiated_prices",
+                    "idx": idx,
+                    "item_code": org.get(item_field),
+                    "price": org.get(price_field) or 0,
+                }).db_insert()
+
+    # Profiles cached before the migration still hold the legacy prices
+    frappe.cache().delete_value("qbo_pricing_profile")
@@ -1,78 +1,68 @@
 import frappe
 import subprocess
 import os
+from qb_connector.queues import enqueue_qbo
+from qb_connector.sync_retry import enqueue_failed_sync_retry
 
 # payment_hooks.py
 # Hooks and helpers for syncing Payment Entry documents to QuickBooks Online (QBO).
 
 def sync_payment_entry_to_qbo(doc, method):
     """
-    Syncs a Payment Entry document to QuickBooks Online (QBO) by calling a Node.js TypeScript script.
-    Updates the sync status in ERPNext based on the result.
+    Queues the QBO sync of a submitted Payment Entry on the transactional queue.
+    The job runs after the submit commits, so the Node.js script reads the submitted payment.
     Args:
         doc: The Payment Entry document being submitted.
         method: The event method triggering the hook (e.g., 'on_submit').
     """
-    print(f"🚨 Hook triggered for Payment Entry: {doc.name}")
     frappe.logger().info(f"🚨 Hook triggered for Payment Entry: {doc.name}")
-    if not doc.custom_dont_sync_with_qbo:
-        try:
-            print("🔧 Starting QBO script execution...")
-            payment_id = run_qbo_script("syncPaymentToQbo.ts", doc.name)
-
-            if payment_id:
-                status = "Synced"
-                # Mark as synced so it doesn't sync again
-                frappe.db.set_value("Payment Entry", doc.name, "custom_dont_sync_with_qbo", 1)
-            else:
-                status = "Failed"
-
-            print(f"📨 Enqueuing sync status update → {status}")
-            # Enqueue a background job to update sync status in ERPNext
-            if payment_id:
-                frappe.enqueue("qb_connector.payment_hooks.mark_qbo_sync_status",
-                    doctype=doc.doctype,
-                    docname=doc.name,
-                    status=status,
-                    payment_id=payment_id)
-            else:
-                frappe.enqueue("qb_connector.payment_hooks.mark_qbo_sync_status",
-                    doctype=doc.doctype,
-                    docname=doc.name,
-                    status=status)
-
-            print(f"🧾 Enqueued Payment Entry sync status update for {doc.name}")
-            frappe.logger().info(f"🧾 Enqueued Payment Entry sync status update → {status}")
-        except Exception as e:
-            print(f"❌ Error in sync_payment_entry_to_qbo: {e}")
-            frappe.logger().error(f"❌ Payment Entry sync failed: {str(e)}")
-    else:
+    if doc.custom_dont_sync_with_qbo:
         print("Skipped because of custom_dont_sync_with_qbo")
+        return
+
+    enqueue_qbo(
+        "qb_connector.payment_hooks.sync_payment_entry_job",
+        "transactional",
+        job_id=f"qbo_payment_sync::{doc.name}",
+        deduplicate=True,
+        enqueue_after_commit=True,
+        docname=doc.name,
+    )
+
+
+def sync_payment_entry_job(docname: str):
+    """
+    Background job: syncs a Payment Entry to QBO by calling a Node.js TypeScript script
+    and records the sync status in ERPNext.
+    Args:
+        docname (str): The name of the Payment Entry to sync.
+    """
+    try:
+        payment_id = run_qbo_script("syncPaymentToQbo.ts", docname)
+
+        if payment_id:
+            status = "Synced"
+            # Mark as synced so it doesn't sync again
+            frappe.db.set_value("Payment Entry", docname, "custom_dont_sync_with_qbo", 1)
+            mark_qbo_sync_status(doctype="Payment Entry", docname=docname, status=status, payment_id=payment_id)
+        else:
+            status = "Failed"
+            mark_qbo_sync_status(doctype="Payment Entry", docname=docname, status=status)
+
+        frappe.logger().info(f"🧾 Payment Entry {docname} sync status → {status}")
+    except Exception as e:
+        print(f"❌ Error in sync_payment_entry_job: {e}")
+        frappe.logger().error(f"❌ Payment Entry sync failed: {str(e)}")
 
 @frappe.whitelist()
 def retry_failed_payment_syncs():
     """
-    Attempts to re-sync all Payment Entries that previously failed to sync to QBO.
-    Returns a summary message and refresh flag.
+    Queues a background job that re-syncs all Payment Entries that previously failed to sync to QBO.
+    Progress is pushed to the list view as the job runs.
     Returns:
         dict: Message and refresh status for the UI.
     """
-    resynced_count = 0
-
-    # Find all payment entries with sync status 'Failed'
-    failed_invoices = frappe.get_all("Payment Entry", filters={"custom_sync_status": "Failed"}, fields=["name"])
-    for pymt in failed_invoices:
-        try:
-            # Try to sync each failed payment again
-            sync_payment_entry_to_qbo(frappe.get_doc("Payment Entry", pymt.name), "manual_retry")
-            resynced_count += 1
-        except Exception as e:
-            frappe.log_error(str(e), f"Retry failed for {pymt.name}")
-
-    return {
-        "message": f"✅ Resynced {resynced_count} invoice(s).",
-        "refresh": resynced_count > 0
-    }
+    return enqueue_failed_sync_retry("Payment Entry")
 
 def run_qbo_script(script_name: str, docname: str = None) -> str | None:
     """
@@ -0,0 +1,134 @@
+import frappe
+
+# pricing_profile.py
+# Cached per-customer pricing profile read by the Sales Order / Sales Invoice pricing hooks.
+# One profile holds everything order pricing needs from the Customer, its Camp or Other Organization
+# and State Tax Information, so a save does a single cache lookup instead of reloading those docs.
+
+# Redis hash of Customer name -> pricing profile
+PRICING_PROFILE_KEY = "qbo_pricing_profile"
+
+# Table field holding Negotiated Price rows on Camp and Other Organization
+NEGOTIATED_PRICES_FIELD = "custom_negotiated_prices"
+
+
+def get_pricing_profile(customer_name: str):
+    """
+    Returns the cached pricing profile of a Customer, building it on first use.
+    Args:
+        customer_name (str): The Customer name.
+    Returns:
+        frappe._dict | None: The profile (see build_pricing_profile), or None if there is no customer.
+    """
+    if not customer_name:
+        return None
+    profile = frappe.cache().hget(
+        PRICING_PROFILE_KEY, customer_name, generator=lambda: build_pricing_profile(customer_name)
+    )
+    return frappe._dict(profile) if profile else None
+
+
+def build_pricing_profile(customer_name: str) -> dict | None:
+    """
+    Reads the pricing inputs of a Customer into a compact dict.
+    Args:
+        customer_name (str): The Customer name.
+    Returns:
+        dict | None: {"customer", "base_discount", "tax_status", "has_state", "state", "state_tax_status",
+            "organization_doctype", "organization", "negotiated_prices", "negotiated_without_price"},
+            or None if the Customer does not exist.
+    """
+    # Imported here: order_hooks imports this module
+    from qb_connector.order_hooks import get_state_tax_map, normalize_state
+
+    customer = frappe.db.get_value(
+        "Customer",
+        customer_name,
+        ["name", "custom_discount_", "custom_tax_status", "custom_state", "custom_camp_link", "custom_other_organization_link"],
+        as_dict=True,
+    )
+    if not customer:
+        return None
+
+    state = normalize_state(customer.custom_state)
+    state_map = get_state_tax_map()
+
+    organization_doctype = organization = None
+    if customer.custom_camp_link:
+        organization_doctype, organization = "Camp", customer.custom_camp_link
+    elif customer.custom_other_organization_link:
+        organization_doctype, organization = "Other Organization", customer.custom_other_organization_link
+
+    negotiated_prices = {}
+    negotiated_without_price = []
+    if organization:
+        rows = frappe.get_all(
+            "Negotiated Price",
+            filters={"parenttype": organization_doctype, "parent": organization, "parentfield": NEGOTIATED_PRICES_FIELD},
+            fields=["item_code", "price"],
+            order_by="idx asc",
+        )
+        for row in rows:
+            if row.price:
+                negotiated_prices[row.item_code] = row.price
+            else:
+                negotiated_without_price.append(row.item_code)
+
+    return {
+        "customer": customer.name,
+        "base_discount": customer.custom_discount_,
+        "tax_status": customer.custom_tax_status,
+        "has_state": bool(customer.custom_state),
+        "state": state,
+        # None when the state is not in State Tax Information (e.g. outside the US)
+        "state_tax_status": state_map.get(state) if state in state_map else None,
+        "organization_doctype": organization_doctype,
+        "organization": organization,
+        "negotiated_prices": negotiated_prices,
+        "negotiated_without_price": negotiated_without_price,
+    }
+
+
+def clear_pricing_profiles(customer_names: list = None):
+    """
+    Drops cached pricing profiles so they are rebuilt on next use.
+    Args:
+        customer_names (list, optional): Customers to drop; drops every profile when omitted.
+    """
+    if customer_names is None:
+        frappe.cache().delete_value(PRICING_PROFILE_KEY)
+    elif customer_names:
+        frappe.cache().hdel(PRICING_PROFILE_KEY, list(customer_names))
+
+
+def clear_pricing_profiles_on_commit(customer_names: list = None):
+    """
+    Drops cached pricing profiles now and again after the current transaction commits, so a profile
+    that a concurrent order save rebuilt from the old committed rows in the meantime is not kept.
+    Args:
+        customer_names (list, optional): Customers to drop; drops every profile when omitted.
+    """
+    clear_pricing_profiles(customer_names)
+    frappe.db.after_commit.add(lambda: clear_pricing_profiles(customer_names))
+
+
+def clear_customer_pricing_profile(doc, method):
+    """
+    Customer on_update / on_trash hook: drops the customer's cached pricing profile.
+    """
+    clear_pricing_profiles_on_commit([doc.name])
+
+
+def clear_renamed_customer_pricing_profile(doc, method, old_name, new_name, merge=False):
+    """
+    Customer after_rename hook: drops the profiles cached under the old and the new name.
+    """
+    clear_pricing_profiles_on_commit([old_name, new_name])
+
+
+def clear_organization_pricing_profiles(doc, method):
+    """
+    Camp / Other Organization on_update hook: drops the profiles of every linked Customer.
+    """
+    link_field = "custom_camp_link" if doc.doctype == "Camp" else "custom_other_organization_link"
+    clear_pricing_profiles_on_commit(frappe.get_all("Customer", filters={link_field: doc.name}, pluck="name"))
@@ -26,6 +26,10 @@ function inject_retry_button(listview) {
                 method: "qb_connector.invoice_hooks.retry_failed_invoice_syncs"
             });
             
+            // 📨 The retry runs in the background; progress arrives over realtime
+            frappe.show_alert({ message: r.message?.message || "Retry queued", indicator: "blue" });
+            listen_for_retry_progress(listview);
+
             // ✅ Re-enable the button and restore its label
             button.prop("disabled", false).html("Retry Failed QBO Syncs");
             // 🔄 Refresh the list view to show updated invoices
@@ -42,6 +46,37 @@ function inject_retry_button(listview) {
     listview.retry_button_added = true;
 }
 
+// 👇 Show background retry progress pushed by qb_connector.sync_retry
+function listen_for_retry_progress(listview) {
+    if (listview.retry_progress_listening) return;
+
+    frappe.realtime.on("qbo_retry_progress", (data) => {
+        if (data.doctype !== listview.doctype) return;
+
+        frappe.show_progress(
+            "Retrying failed QBO syncs",
+            data.done,
+            data.total,
+            `${data.synced} synced, ${data.permanent + data.transient} failed, ${data.retrying} retrying`
+        );
+
+        if (data.finished) {
+            frappe.hide_progress();
+            const failures = { ...data.failures.permanent, ...data.failures.transient };
+            const rows = Object.keys(failures).map((name) => `<li><b>${name}</b>: ${frappe.utils.escape_html(failures[name])}</li>`);
+            frappe.msgprint({
+                title: "QBO Retry Summary",
+                message: `✅ Synced: ${data.synced}<br>❌ Permanent failures: ${data.permanent}<br>⏳ Transient failures (attempts exhausted): ${data.transient}`
+                    + (rows.length ? `<ul>${rows.join("")}</ul>` : ""),
+            });
+            listview.refresh();
+        }
+    });
+
+    // Mark that the listener has been registered to avoid duplicates
+    listview.retry_progress_listening = true;
+}
+
 // 👇 Register hook for Sales Invoice List view
 frappe.listview_settings["Sales Invoice"] = {
     onload(listview) {
@@ -0,0 +1,20 @@
+frappe.provide("frappe.dashboards.chart_sources");
+
+frappe.dashboards.chart_sources["Shipments by Month"] = {
+	method: "qb_connector.qb.dashboard_chart_source.shipments_by_month.shipments_by_month.get",
+	filters: [
+		{
+			fieldname: "shipment_status",
+			label: __("Shipment Status"),
+			fieldtype: "Select",
+			options:
+				"\nSales Order Made\nInvoice Sent\nPayment Received\nProduct Ordered\nProduct Shipped\nReceived",
+		},
+		{
+			fieldname: "organization_type",
+			label: __("Organization Type"),
+			fieldtype: "Select",
+			options: "\nCamp\nOther Organization",
+		},
+	],
+};
@@ -0,0 +1,56 @@
+# Copyright (c) 2026, funfangle and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.utils import add_months, getdate, nowdate
+
+from qb_connector.shipment_summary import SUMMARY_DOCTYPE
+
+# Months shown, ending with the current one
+MONTHS = 12
+
+
+@frappe.whitelist()
+def get(
+	chart_name=None,
+	chart=None,
+	no_cache=None,
+	filters=None,
+	from_date=None,
+	to_date=None,
+	timespan=None,
+	time_interval=None,
+	heatmap_year=None,
+):
+	"""
+	Returns Shipment Trackers created per month, oldest month first, read from Shipment Status Summary.
+	Months without trackers are shown as 0.
+	Args:
+		filters (dict | str, optional): shipment_status and / or organization_type.
+	Returns:
+		dict: {"labels": [period, ...], "datasets": [{"name", "values"}]}
+	"""
+	frappe.has_permission(SUMMARY_DOCTYPE, "read", throw=True)
+	filters = frappe.parse_json(filters) or {}
+
+	current = getdate(nowdate()).replace(day=1)
+	periods = [add_months(current, offset - MONTHS + 1).strftime("%Y-%m") for offset in range(MONTHS)]
+
+	conditions = {"period": ["in", periods]}
+	for field in ("shipment_status", "organization_type"):
+		if filters.get(field):
+			conditions[field] = filters[field]
+
+	counts = {
+		row.period: row.trackers
+		for row in frappe.get_all(
+			SUMMARY_DOCTYPE,
+			filters=conditions,
+			fields=["period", "sum(tracker_count) as trackers"],
+			group_by="period",
+		)
+	}
+	return {
+		"labels": periods,
+		"datasets": [{"name": "Shipments", "values": [counts.get(period) or 0 for period in periods]}],
+	}
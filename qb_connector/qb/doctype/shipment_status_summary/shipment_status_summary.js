@@ -0,0 +1,8 @@
+// Copyright (c) 2026, funfangle and contributors
+// For license information, please see license.txt
+
+// frappe.ui.form.on("Shipment Status Summary", {
+// 	refresh(frm) {
+
+// 	},
+// });
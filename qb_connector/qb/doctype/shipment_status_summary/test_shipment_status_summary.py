@@ -0,0 +1,122 @@
+# Copyright (c) 2026, funfangle and Contributors
+# See license.txt
+
+from unittest.mock import patch
+
+import frappe
+from frappe.tests import IntegrationTestCase, UnitTestCase
+
+from qb_connector.shipment_hooks import update_trackers
+from qb_connector.shipment_summary import (
+	SUMMARY_DOCTYPE,
+	get_summary_key,
+	get_summary_name,
+	move_trackers,
+	rebuild_shipment_summary,
+)
+
+
+# On IntegrationTestCase, the doctype test records and all
+# link-field test record dependencies are recursively loaded
+# Use these module variables to add/remove to/from that list
+EXTRA_TEST_RECORD_DEPENDENCIES = []  # eg. ["User"]
+IGNORE_TEST_RECORD_DEPENDENCIES = []  # eg. ["User"]
+
+
+class UnitTestShipmentStatusSummary(UnitTestCase):
+	"""
+	Unit tests for the Shipment Status Summary keys and set-based moves.
+	"""
+
+	def test_summary_key(self):
+		tracker = {"shipment_status": "Invoice Sent", "organization_type": "Camp", "creation": "2026-03-05 10:00:00"}
+		self.assertEqual(get_summary_key(tracker), ("Invoice Sent", "Camp", "2026-03"))
+
+	def test_summary_key_without_organization_type(self):
+		tracker = {"shipment_status": "Received", "organization_type": "", "creation": "2026-11-30 23:59:59"}
+		self.assertEqual(get_summary_key(tracker), ("Received", None, "2026-11"))
+
+	def test_summary_name_matches_rebuild_format(self):
+		self.assertEqual(get_summary_name(("Invoice Sent", "Camp", "2026-03")), "2026-03|Camp|Invoice Sent")
+		self.assertEqual(get_summary_name(("Received", None, "2026-11")), "2026-11|-|Received")
+
+	def test_move_trackers(self):
+		trackers = [
+			frappe._dict(name="T1", shipment_status="Sales Order Made", organization_type="Camp", creation="2026-03-01"),
+			frappe._dict(name="T2", shipment_status="Sales Order Made", organization_type="Camp", creation="2026-03-20"),
+			frappe._dict(name="T3", shipment_status="Invoice Sent", organization_type="Camp", creation="2026-03-02"),
+		]
+		with patch("qb_connector.shipment_summary.adjust_summary") as adjust_summary:
+			move_trackers(trackers, {"sales_invoice": "SINV-1", "shipment_status": "Invoice Sent"})
+
+		adjust_summary.assert_called_once_with({
+			("Sales Order Made", "Camp", "2026-03"): -2,
+			("Invoice Sent", "Camp", "2026-03"): 2,
+		})
+
+	def test_move_trackers_without_status_change(self):
+		trackers = [frappe._dict(name="T1", shipment_status="Invoice Sent", organization_type="Camp", creation="2026-03-01")]
+		with patch("qb_connector.shipment_summary.adjust_summary") as adjust_summary:
+			move_trackers(trackers, {"sales_invoice": "SINV-1", "shipment_status": "Invoice Sent"})
+
+		adjust_summary.assert_called_once_with({})
+
+
+class IntegrationTestShipmentStatusSummary(IntegrationTestCase):
+	"""
+	Integration tests: the incremental summary updates must match a full rebuild.
+	rebuild_shipment_summary commits, so its commit is patched out to keep the test rollback.
+	"""
+
+	def setUp(self):
+		self.rebuild()
+
+	def rebuild(self):
+		with patch.object(frappe.db, "commit"):
+			rebuild_shipment_summary()
+
+	def summary_counts(self) -> dict:
+		rows = frappe.get_all(SUMMARY_DOCTYPE, fields=["name", "tracker_count"])
+		return {row.name: row.tracker_count for row in rows if row.tracker_count}
+
+	def assertMatchesRebuild(self):
+		incremental = self.summary_counts()
+		self.rebuild()
+		self.assertEqual(incremental, self.summary_counts())
+
+	def make_tracker(self, name, organization_type="Camp"):
+		tracker = frappe.new_doc("Shipment Tracker")
+		tracker.name = name
+		tracker.shipment_name = name
+		tracker.organization_type = organization_type
+		tracker.shipment_status = "Sales Order Made"
+		tracker.insert()
+		return tracker
+
+	def test_insert(self):
+		self.make_tracker("_Test Summary Tracker 1")
+		self.make_tracker("_Test Summary Tracker 2", "Other Organization")
+		self.assertMatchesRebuild()
+
+	def test_status_change(self):
+		tracker = self.make_tracker("_Test Summary Tracker 1")
+		tracker.shipment_status = "Product Shipped"
+		tracker.save()
+		self.assertMatchesRebuild()
+
+	def test_trash(self):
+		tracker = self.make_tracker("_Test Summary Tracker 1")
+		self.make_tracker("_Test Summary Tracker 2")
+		tracker.delete()
+		self.assertMatchesRebuild()
+
+	def test_set_based_update(self):
+		self.make_tracker("_Test Summary Tracker 1")
+		self.make_tracker("_Test Summary Tracker 2")
+		trackers = frappe.get_all(
+			"Shipment Tracker",
+			filters={"name": ["like", "_Test Summary Tracker %"]},
+			fields=["name", "shipment_status", "organization_type", "creation"],
+		)
+		update_trackers(trackers, {"shipment_status": "Invoice Sent"})
+		self.assertMatchesRebuild()
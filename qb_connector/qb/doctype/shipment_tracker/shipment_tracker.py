@@ -4,6 +4,21 @@
 # import frappe
 from frappe.model.document import Document
 
+from qb_connector.shipment_summary import adjust_summary, count_tracker, get_summary_key
+
 
 class ShipmentTracker(Document):
-	pass
+	def after_insert(self):
+		count_tracker(self, 1)
+
+	def on_update(self):
+		# Keep Shipment Status Summary in step when the status or organization type changes
+		previous = self.get_doc_before_save()
+		if self.flags.in_insert or previous is None:
+			return
+		old_key, new_key = get_summary_key(previous), get_summary_key(self)
+		if old_key != new_key:
+			adjust_summary({old_key: -1, new_key: 1})
+
+	def on_trash(self):
+		count_tracker(self, -1)
@@ -4,6 +4,12 @@
 # import frappe
 from frappe.model.document import Document
 
+from qb_connector.order_hooks import clear_state_tax_map
+from qb_connector.pricing_profile import clear_pricing_profiles_on_commit
+
 
 class StateTaxInformation(Document):
-	pass
+	def on_update(self):
+		# Order pricing reads taxability from cached maps and profiles; rebuild them from the saved values
+		clear_state_tax_map()
+		clear_pricing_profiles_on_commit()
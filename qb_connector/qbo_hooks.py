@@ -1,14 +1,33 @@
 import frappe
+import json
 import subprocess
 import os
+import tempfile
+import time
 from frappe.utils import now_datetime
+from frappe.utils.background_jobs import get_job
+from qb_connector.change_detection import has_value_changed
+from qb_connector.queues import enqueue_qbo
+from qb_connector.utils import acquire_qbo_budget, run_ts_script
 
 # qbo_hooks.py
 # Hooks and helpers for syncing Item cost/price and tax templates to QuickBooks Online (QBO).
 
+# Seconds without new edits before pending pushes are sent, and the longest a flush waits for quiet
+ITEM_PUSH_DEBOUNCE_SECONDS = 10
+ITEM_PUSH_MAX_WAIT_SECONDS = 120
+
+ITEM_PUSH_PENDING_KEY = "qbo_item_push_pending"
+ITEM_PUSH_LAST_CHANGE_KEY = "qbo_item_push_last_change"
+
+# Job id of the flush, also the name of the lock that keeps flushes from overlapping
+ITEM_PUSH_FLUSH_JOB_ID = "qbo_item_push_flush"
+ITEM_PUSH_FLUSH_TIMEOUT = 600
+
+
 def sync_qbo_cost_on_update(doc, method):
     """
-    Syncs the cost (valuation_rate) of an Item to QBO if it has changed.
+    Queues a QBO cost push for an Item if its valuation_rate has changed.
     Also sets the item tax template before saving.
     Args:
         doc: The Item document being updated.
@@ -17,24 +36,17 @@ def sync_qbo_cost_on_update(doc, method):
     # Set tax template before save
     set_item_tax_template(doc, method)
 
+    if is_qbo_import(doc):
+        return
+
     try:
-        # Store original doc for comparison if not already present
-        if not hasattr(doc, "_original"):
-            doc._original = frappe.get_doc(doc.doctype, doc.name)
+        if doc.is_new() or not doc.custom_qbo_item_id:
+            return
 
-        # Only sync if valuation_rate has changed and QBO item ID is present
-        if doc.valuation_rate != doc._original.valuation_rate and doc.custom_qbo_item_id:
+        # Only push if valuation_rate has changed
+        if has_value_changed(doc, "valuation_rate"):
             frappe.logger().info(f"🔁 Detected valuation_rate change for Item {doc.name}")
-            success = run_qbo_script("updateQboCost.ts", doc.name, str(doc.valuation_rate))
-
-            status = "Synced" if success else "Failed"
-            print(f"Status: {status}")
-            frappe.enqueue("qb_connector.qbo_hooks.mark_qbo_sync_status",
-                doctype=doc.doctype,
-                docname=doc.name,
-                status=status)
-            print(f"📨 Enqueuing sync status update for {doc.doctype} {doc.name} → {status}")
-            frappe.logger().info(f"📨 Enqueuing sync status update for {doc.doctype} {doc.name} → {status}")
+            queue_item_push(doc.name)
 
     except Exception as e:
         frappe.logger().error(f"❌ Cost sync failed for Item {doc.name}: {str(e)}")
@@ -42,32 +54,223 @@ def sync_qbo_cost_on_update(doc, method):
 
 def sync_qbo_price_on_update(doc, method):
     """
-    Syncs the price (price_list_rate) of an Item Price to QBO if it has changed.
+    Queues a QBO price push for an Item if its selling price_list_rate has changed.
+    Only the selling price list configured in Selling Settings is pushed.
     Args:
         doc: The Item Price document being updated.
         method: The event method triggering the hook.
     """
+    if is_qbo_import(doc):
+        return
+
     try:
-        # Store original doc for comparison if not already present
-        if not hasattr(doc, "_original"):
-            doc._original = frappe.get_doc(doc.doctype, doc.name)
-
-        # Only sync if price_list_rate has changed
-        if doc.price_list_rate != doc._original.price_list_rate:
-            item = frappe.get_doc("Item", doc.item_code)
-            if item.custom_qbo_item_id:
-                success = run_qbo_script("updateQboPrice.ts", item.name, str(doc.price_list_rate))
-
-                status = "Synced" if success else "Failed"
-                print(f"Status: {status}")
-                frappe.enqueue("qb_connector.qbo_hooks.mark_qbo_sync_status",
-                            doctype=item.doctype,
-                            docname=item.name,
-                            status=status)
+        if not doc.selling or doc.price_list != get_selling_price_list():
+            return
+
+        # Only push if price_list_rate has changed (new prices always count as changed)
+        if has_value_changed(doc, "price_list_rate"):
+            if frappe.db.get_value("Item", doc.item_code, "custom_qbo_item_id"):
+                queue_item_push(doc.item_code)
     except Exception as e:
         frappe.logger().error(f"❌ Price sync failed for Item Price {doc.name}: {str(e)}")
 
 
+def is_qbo_import(doc) -> bool:
+    """
+    Returns True for a save made by the QBO item import, whose values came from QBO and must not
+    be pushed back. The import sends custom_skip_qbo_sync = 1 with each Item and Item Price write;
+    it is cleared here so it only covers that save. Server code can set doc.flags.from_qbo_import.
+    Args:
+        doc: The Item or Item Price document being saved.
+    """
+    from_import = bool(doc.flags.get("from_qbo_import") or doc.get("custom_skip_qbo_sync"))
+    if doc.get("custom_skip_qbo_sync"):
+        doc.custom_skip_qbo_sync = 0
+    return from_import
+
+
+def get_selling_price_list() -> str:
+    """
+    Returns the default selling price list, whose rates are pushed to QBO as UnitPrice.
+    """
+    return frappe.db.get_single_value("Selling Settings", "selling_price_list") or "Standard Selling"
+
+
+def queue_item_push(item_code: str):
+    """
+    Records that an Item's price/cost needs to be pushed to QBO and schedules a debounced flush.
+    Repeated edits to the same item before the flush collapse into a single QBO write.
+    The item is marked pending only after this transaction commits, so a flush that is already
+    running never pushes the old values and clears the marker of an edit it did not see.
+    Args:
+        item_code (str): The Item to push.
+    """
+    frappe.db.after_commit.add(lambda: mark_item_push(item_code))
+
+
+def mark_item_push(item_code: str):
+    """
+    Marks a committed Item edit as pending and queues a flush.
+    """
+    cache = frappe.cache()
+    cache.hset(ITEM_PUSH_PENDING_KEY, item_code, 1)
+    cache.set_value(ITEM_PUSH_LAST_CHANGE_KEY, time.time())
+    enqueue_item_push_flush()
+
+
+def enqueue_item_push_flush():
+    """
+    Queues flush_item_pushes. Pending edits share one queued job; a job that has already started
+    may have finished reading the pending set, so one more job is queued behind it.
+    """
+    job_id = ITEM_PUSH_FLUSH_JOB_ID
+    job = get_job(job_id)
+    if job and job.get_status() == "started":
+        job_id = f"{job_id}::rerun"
+
+    enqueue_qbo(
+        "qb_connector.qbo_hooks.flush_item_pushes",
+        "transactional",
+        # A rerun first waits for the running flush to release the lock
+        timeout=ITEM_PUSH_FLUSH_TIMEOUT * 2,
+        job_id=job_id,
+        deduplicate=True,
+    )
+
+
+def schedule_item_push_flush():
+    """
+    Scheduler safety net: queues a flush when items are still pending, e.g. after a push was
+    deferred for lack of QBO budget. Goes through the same job id as the hooks, so it never
+    runs a second flush next to one that is already pushing.
+    """
+    if frappe.cache().hkeys(ITEM_PUSH_PENDING_KEY):
+        enqueue_item_push_flush()
+
+
+def flush_item_pushes():
+    """
+    Background job: waits for edits to go quiet, then pushes the latest price and cost of every
+    pending Item to QBO in batches. Flushes run one at a time under a lock, so a rerun queued
+    behind a running flush never pushes the same items alongside it.
+    """
+    cache = frappe.cache()
+    lock = cache.lock(
+        cache.make_key(ITEM_PUSH_FLUSH_JOB_ID),
+        timeout=ITEM_PUSH_FLUSH_TIMEOUT,
+        blocking_timeout=ITEM_PUSH_FLUSH_TIMEOUT,
+    )
+    if not lock.acquire():
+        # Still locked after a full flush timeout; the items stay pending for the scheduler
+        frappe.logger().warning("⏳ QBO item push flush still running, leaving items pending")
+        return
+
+    try:
+        started = time.time()
+        while cache.hgetall(ITEM_PUSH_PENDING_KEY):
+            # Debounce: wait until no edit has arrived for ITEM_PUSH_DEBOUNCE_SECONDS
+            while time.time() - started < ITEM_PUSH_MAX_WAIT_SECONDS:
+                last_change = float(cache.get_value(ITEM_PUSH_LAST_CHANGE_KEY) or 0)
+                quiet_for = time.time() - last_change
+                if quiet_for >= ITEM_PUSH_DEBOUNCE_SECONDS:
+                    break
+                time.sleep(ITEM_PUSH_DEBOUNCE_SECONDS - quiet_for)
+
+            # Take the pending set; edits committed from here on are picked up by the next loop
+            item_codes = list(cache.hgetall(ITEM_PUSH_PENDING_KEY).keys())
+            if not item_codes:
+                break
+            cache.hdel(ITEM_PUSH_PENDING_KEY, item_codes)
+
+            if push_items_to_qbo(item_codes).get("deferred"):
+                # Out of QBO budget: stop here and let the scheduler's flush retry the pending items
+                break
+    finally:
+        lock.release()
+
+
+def push_items_to_qbo(item_codes: list) -> dict:
+    """
+    Pushes the current selling price and valuation rate of the given Items to QBO.
+    Reads all values with one query per table and sends them as batched sparse updates.
+    Args:
+        item_codes (list): Item names to push.
+    Returns:
+        dict: {"synced": [...], "failed": {item_code: reason}}, plus "deferred": [...] when no
+            QBO rate budget could be reserved and the items were put back in the pending set.
+    """
+    items = frappe.get_all(
+        "Item",
+        filters={"name": ["in", item_codes], "custom_qbo_item_id": ["is", "set"]},
+        fields=["name", "custom_qbo_item_id", "valuation_rate"],
+    )
+    prices = frappe.get_all(
+        "Item Price",
+        filters={"item_code": ["in", item_codes], "price_list": get_selling_price_list(), "selling": 1},
+        fields=["item_code", "price_list_rate"],
+        order_by="modified desc",
+    )
+    price_by_item = {}
+    for price in prices:
+        price_by_item.setdefault(price.item_code, price.price_list_rate)
+
+    updates = []
+    for item in items:
+        update = {"itemCode": item.name, "qboId": item.custom_qbo_item_id}
+        if item.valuation_rate is not None:
+            update["purchaseCost"] = item.valuation_rate
+        if item.name in price_by_item:
+            update["unitPrice"] = price_by_item[item.name]
+        if len(update) > 2:
+            updates.append(update)
+
+    if not updates:
+        return {"synced": [], "failed": {}}
+
+    # One SyncToken query per 1000 items plus one batch request per 30 items
+    if not acquire_qbo_budget(len(updates) // 1000 + 1 + len(updates) // 30 + 1):
+        # No budget within the wait: put the items back; the next flush (at the latest the scheduler's) sends them
+        deferred = [update["itemCode"] for update in updates]
+        cache = frappe.cache()
+        for item_code in deferred:
+            cache.hset(ITEM_PUSH_PENDING_KEY, item_code, 1)
+        frappe.logger().warning(f"⏳ QBO rate budget exhausted, deferred push of {len(deferred)} Item(s)")
+        return {"synced": [], "failed": {}, "deferred": deferred}
+
+    with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False) as f:
+        json.dump(updates, f)
+        input_path = f.name
+    try:
+        result = run_ts_script("pushItemUpdatesToQbo.ts", input_path)
+    finally:
+        os.unlink(input_path)
+
+    try:
+        outcome = json.loads(result.stdout.strip().splitlines()[-1])
+    except (ValueError, IndexError):
+        reason = (result.stderr or result.stdout or "no output").strip()[-500:]
+        frappe.logger().error(f"❌ QBO item push failed: {reason}")
+        outcome = {"synced": [], "failed": {u["itemCode"]: reason for u in updates}}
+
+    now = now_datetime()
+    if outcome["synced"]:
+        frappe.db.set_value(
+            "Item", {"name": ["in", outcome["synced"]]},
+            {"custom_sync_status": "Synced", "custom_last_synced_at": now},
+        )
+    if outcome["failed"]:
+        frappe.db.set_value(
+            "Item", {"name": ["in", list(outcome["failed"])]},
+            {"custom_sync_status": "Failed", "custom_last_synced_at": now},
+        )
+        for item_code, reason in outcome["failed"].items():
+            frappe.logger().error(f"❌ QBO push failed for Item {item_code}: {reason}")
+    frappe.db.commit()
+
+    frappe.logger().info(f"💲 Pushed {len(outcome['synced'])} Item(s) to QBO, {len(outcome['failed'])} failed")
+    return outcome
+
+
 def mark_qbo_sync_status(doctype: str, docname: str, status: str, invoice_id: str = None):
     """
     Sets last_synced and sync_status after QBO update for Item or Item Price.
@@ -94,49 +297,6 @@ def mark_qbo_sync_status(doctype: str, docname: str, status: str, invoice_id: st
         print(f"❌ Error in mark_qbo_sync_status: {e}")
 
 
-def run_qbo_script(script_name: str, item_name: str, new_value: str) -> bool:
-    """
-    Runs a Node.js TypeScript script to sync Item cost or price to QBO.
-    Returns True if successful, False otherwise.
-    Args:
-        script_name (str): The TypeScript script filename to run.
-        item_name (str): The name of the Item document to sync.
-        new_value (str): The new value to set (cost or price).
-    Returns:
-        bool: True if sync succeeded, False otherwise.
-    """
-    try:
-        # Determine the script directory and path
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        app_root = os.path.abspath(os.path.join(current_dir, ".."))
-        script_dir = os.path.join(app_root, "ts_qbo_client", "src")
-        script_path = os.path.join(script_dir, script_name)
-
-        process = subprocess.Popen(
-            ["npx", "ts-node", os.path.basename(script_path), item_name, new_value],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
-            cwd=script_dir
-        )
-
-        process.wait()  # ✅ wait for completion before checking exit code
-
-        stderr = process.stderr.read()
-        if stderr:
-            print(f"❗ STDERR:\n{stderr}")
-            frappe.logger().error(f"[QBO Script Error] {stderr}")
-
-        return_code = process.returncode
-        print(f"📦 Script exited with code {return_code}")
-        return return_code == 0
-
-    except Exception as e:
-        print(f"❌ Exception: {e}")
-        frappe.logger().error(f"❌ Failed to run script {script_name}: {str(e)}")
-        return False
-
-
 def set_item_tax_template(doc, method):
     """
     Sets the item_tax_template field based on the custom tax_category field.
@@ -158,10 +318,10 @@ def sync_items_from_qbo():
     print("✅ Enqueuing sync_items_from_qbo")
     frappe.logger().info("✅ Enqueuing sync_items_from_qbo")
 
-    frappe.enqueue("qb_connector.qbo_hooks.run_item_sync_script",
-        queue="default",
-        timeout=600,
-        now=False
+    enqueue_qbo("qb_connector.qbo_hooks.run_item_sync_script",
+        "bulk",
+        job_id="qbo_item_import",
+        deduplicate=True,
         )
 
 def run_item_sync_script():
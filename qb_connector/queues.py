@@ -0,0 +1,122 @@
+from datetime import datetime, timezone
+
+import frappe
+from frappe.utils.background_jobs import get_queue, get_queues_timeout
+
+# queues.py
+# Named RQ queues for qb_connector background work, so long imports never delay invoice status updates.
+#
+#   interactive    customer creates and sync status marks (user is waiting on the result)
+#   transactional  invoice, payment and item price/cost pushes to QBO
+#   bulk           imports, reconciliations and retries
+#
+# Each queue runs on its own workers once it is declared in common_site_config.json, e.g.
+#   "workers": {"qbo_interactive": {"timeout": 300, "background_workers": 2}, ...}
+# (see get_qbo_workers_config). Undeclared queues fall back to the standard Frappe queue,
+# so nothing breaks on a bench that has not been reconfigured yet.
+
+QBO_QUEUES = {
+    "interactive": {"queue": "qbo_interactive", "fallback": "short", "timeout": 300, "workers": 2},
+    "transactional": {"queue": "qbo_transactional", "fallback": "default", "timeout": 900, "workers": 2},
+    "bulk": {"queue": "qbo_bulk", "fallback": "long", "timeout": 3600, "workers": 1},
+}
+
+
+def get_qbo_queue(kind: str) -> str:
+    """
+    Returns the RQ queue name for a kind of QBO work.
+    Uses the dedicated queue when it is declared in the bench `workers` config, otherwise the fallback.
+    A site can rename a queue with `qbo_queues: {"bulk": "my_queue"}` in site_config.json.
+    Args:
+        kind (str): 'interactive', 'transactional' or 'bulk'.
+    Returns:
+        str: Queue name to pass to frappe.enqueue.
+    """
+    config = QBO_QUEUES[kind]
+    queue = (frappe.conf.get("qbo_queues") or {}).get(kind) or config["queue"]
+    return queue if queue in get_queues_timeout() else config["fallback"]
+
+
+def get_qbo_queue_timeout(kind: str) -> int:
+    """
+    Returns the default job timeout for a kind of QBO work: the `timeout` of the dedicated
+    queue in the bench `workers` config, or the built-in default.
+    """
+    config = QBO_QUEUES[kind]
+    workers = frappe.conf.get("workers") or {}
+    return int((workers.get(get_qbo_queue(kind)) or {}).get("timeout") or config["timeout"])
+
+
+def enqueue_qbo(method: str, kind: str, timeout: int = None, **kwargs):
+    """
+    Enqueues a qb_connector job on the queue for its kind of work.
+    Args:
+        method (str): Dotted path of the job function.
+        kind (str): 'interactive', 'transactional' or 'bulk'.
+        timeout (int, optional): Job timeout in seconds; defaults to the queue timeout.
+        **kwargs: Passed to frappe.enqueue (job_id, deduplicate, enqueue_after_commit, job arguments).
+    Returns:
+        The RQ job, or None if it was deduplicated or deferred until commit.
+    """
+    return frappe.enqueue(
+        method,
+        queue=get_qbo_queue(kind),
+        timeout=timeout or get_qbo_queue_timeout(kind),
+        **kwargs,
+    )
+
+
+@frappe.whitelist()
+def get_qbo_workers_config() -> dict:
+    """
+    Returns the `workers` entries to add to common_site_config.json for the QBO queues,
+    keeping any timeout or worker count already configured there.
+    Run `bench setup supervisor` (or update the Procfile) after changing it.
+    Returns:
+        dict: Queue name to {"timeout", "background_workers"}.
+    """
+    frappe.only_for("System Manager")
+    workers = frappe.conf.get("workers") or {}
+    config = {}
+    for kind, defaults in QBO_QUEUES.items():
+        queue = (frappe.conf.get("qbo_queues") or {}).get(kind) or defaults["queue"]
+        current = workers.get(queue) or {}
+        config[queue] = {
+            "timeout": current.get("timeout") or defaults["timeout"],
+            "background_workers": current.get("background_workers") or defaults["workers"],
+        }
+    return config
+
+
+@frappe.whitelist()
+def get_qbo_queue_metrics() -> dict:
+    """
+    Reports depth and wait time for each QBO queue.
+    Returns:
+        dict: Per kind of work: queue name, whether it is dedicated, queued/started/failed counts,
+            and the age in seconds of the oldest queued job.
+    """
+    frappe.only_for("System Manager")
+    metrics = {}
+    for kind, config in QBO_QUEUES.items():
+        queue_name = get_qbo_queue(kind)
+        queue = get_queue(queue_name)
+
+        oldest_wait = 0
+        oldest = queue.get_job_ids(0, 1)
+        if oldest:
+            job = queue.fetch_job(oldest[0])
+            if job and job.enqueued_at:
+                # RQ stores enqueued_at in UTC, naive on older versions
+                enqueued_at = job.enqueued_at.replace(tzinfo=job.enqueued_at.tzinfo or timezone.utc)
+                oldest_wait = round((datetime.now(timezone.utc) - enqueued_at).total_seconds(), 1)
+
+        metrics[kind] = {
+            "queue": queue_name,
+            "dedicated": queue_name != config["fallback"],
+            "queued": queue.count,
+            "started": queue.started_job_registry.count,
+            "failed": queue.failed_job_registry.count,
+            "oldest_wait_seconds": oldest_wait,
+        }
+    return metrics
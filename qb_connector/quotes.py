@@ -0,0 +1,249 @@
+import frappe
+from frappe.utils import flt
+
+from qb_connector.discount_hooks import get_qty_discount_modifier
+from qb_connector.pricing_profile import get_pricing_profile
+from qb_connector.qbo_hooks import get_selling_price_list
+
+# quotes.py
+# Read-only bulk price quotes that follow the same rules as order_hooks (negotiated prices,
+# quantity tier, customer discount, state/customer tax exemption) without creating documents.
+
+# Carts accepted per call
+MAX_QUOTE_CARTS = 500
+
+
+@frappe.whitelist()
+def get_price_quotes(carts) -> list:
+    """
+    Prices many carts in one call. Item prices, tax categories and tax rates are read once for
+    every item in every cart, and each customer's pricing profile is read once.
+    Args:
+        carts (list | str): [{"id": optional, "customer": str, "items": [{"item_code": str, "qty": float}]}]
+            (a JSON list over REST).
+    Returns:
+        list: One result per cart, in order: {"id", "customer", "lines": [{"item_code", "qty",
+            "price_list_rate", "rate", "negotiated", "amount", "taxable"}], "total_qty",
+            "discount_percentage", "net_total", "discount_amount", "exempt_from_sales_tax",
+            "taxable_total", "tax_amount", "grand_total"}, or {"id", "customer", "error"} for a
+            malformed cart or a customer the user may not read.
+    """
+    frappe.has_permission("Item Price", "read", throw=True)
+    carts = frappe.parse_json(carts) or []
+    if not isinstance(carts, list):
+        frappe.throw("carts must be a list")
+    if len(carts) > MAX_QUOTE_CARTS:
+        frappe.throw(f"At most {MAX_QUOTE_CARTS} carts can be quoted per call")
+
+    errors = [validate_cart(cart) for cart in carts]
+    item_codes = {
+        line["item_code"]
+        for cart, error in zip(carts, errors) if not error
+        for line in cart.get("items") or []
+    }
+    prices = get_list_prices(item_codes)
+    taxable_items = set(frappe.get_all(
+        "Item",
+        filters={"name": ["in", list(item_codes)], "custom_tax_category": "Taxable"},
+        pluck="name",
+    )) if item_codes else set()
+    tax_rows = get_sales_tax_rows()
+    item_tax_rates = get_item_tax_rates(item_codes)
+
+    profiles = {}
+    readable = {}
+    results = []
+    for cart, error in zip(carts, errors):
+        cart_id = cart.get("id") if isinstance(cart, dict) else None
+        customer = cart.get("customer") if isinstance(cart, dict) else None
+        if error:
+            results.append({"id": cart_id, "customer": customer, "error": error})
+            continue
+
+        # Quotes reveal the customer's discount, tax status and negotiated prices
+        if customer not in readable:
+            readable[customer] = bool(frappe.has_permission("Customer", "read", doc=customer))
+        if not readable[customer]:
+            results.append({"id": cart_id, "customer": customer, "error": f"Not permitted to read Customer '{customer}'"})
+            continue
+
+        if customer not in profiles:
+            profiles[customer] = get_pricing_profile(customer)
+        try:
+            results.append(quote_cart(cart, profiles[customer], prices, taxable_items, tax_rows, item_tax_rates))
+        except ValueError as e:
+            results.append({"id": cart_id, "customer": customer, "error": str(e)})
+    return results
+
+
+def validate_cart(cart) -> str | None:
+    """
+    Checks the shape of one cart.
+    Returns:
+        str | None: What is wrong with the cart, or None if it can be quoted.
+    """
+    if not isinstance(cart, dict):
+        return "Cart must be an object"
+    if not cart.get("customer") or not isinstance(cart.get("customer"), str):
+        return "Cart has no customer"
+    lines = cart.get("items") or []
+    if not isinstance(lines, list):
+        return "Cart items must be a list"
+    for index, line in enumerate(lines, start=1):
+        if not isinstance(line, dict) or not line.get("item_code") or not isinstance(line.get("item_code"), str):
+            return f"Line {index} has no item_code"
+        try:
+            float(line.get("qty") or 0)
+        except (TypeError, ValueError):
+            return f"Line {index} has an invalid qty"
+    return None
+
+
+def get_list_prices(item_codes) -> dict:
+    """
+    Returns the selling price list rate of each item, keeping the most recently modified price.
+    """
+    if not item_codes:
+        return {}
+    prices = {}
+    for price in frappe.get_all(
+        "Item Price",
+        filters={"item_code": ["in", list(item_codes)], "price_list": get_selling_price_list(), "selling": 1},
+        fields=["item_code", "price_list_rate"],
+        order_by="modified desc",
+    ):
+        prices.setdefault(price.item_code, price.price_list_rate)
+    return prices
+
+
+def get_sales_tax_rows() -> list:
+    """
+    Returns the "On Net Total" rows of the default Sales Taxes and Charges Template, the taxes
+    an order keeps when use_tax_status does not exempt it.
+    Returns:
+        list: Rows with account_head and rate.
+    """
+    template = frappe.db.get_value("Sales Taxes and Charges Template", {"is_default": 1, "disabled": 0}, "name")
+    if not template:
+        return []
+    return frappe.get_all(
+        "Sales Taxes and Charges",
+        filters={"parenttype": "Sales Taxes and Charges Template", "parent": template, "charge_type": "On Net Total"},
+        fields=["account_head", "rate"],
+        order_by="idx asc",
+    )
+
+
+def get_item_tax_rates(item_codes) -> dict:
+    """
+    Returns the rates of the Item Tax Template in each item's Taxes table,
+    which override the template row rate for their tax account as on an order line.
+    Returns:
+        dict: Item code to {account: rate}.
+    """
+    if not item_codes:
+        return {}
+    templates_by_item = {}
+    for row in frappe.get_all(
+        "Item Tax",
+        filters={"parenttype": "Item", "parent": ["in", list(item_codes)]},
+        fields=["parent", "item_tax_template"],
+        order_by="idx asc",
+    ):
+        templates_by_item.setdefault(row.parent, row.item_tax_template)
+
+    rates_by_template = {}
+    if templates_by_item:
+        for row in frappe.get_all(
+            "Item Tax Template Detail",
+            filters={"parenttype": "Item Tax Template", "parent": ["in", list(set(templates_by_item.values()))]},
+            fields=["parent", "tax_type", "tax_rate"],
+        ):
+            rates_by_template.setdefault(row.parent, {})[row.tax_type] = row.tax_rate
+
+    return {item_code: rates_by_template.get(template, {}) for item_code, template in templates_by_item.items()}
+
+
+def quote_cart(cart: dict, profile, prices: dict, taxable_items: set, tax_rows: list = None, item_tax_rates: dict = None) -> dict:
+    """
+    Prices one cart the way order_hooks prices a Sales Order.
+    Args:
+        cart (dict): {"id", "customer", "items": [{"item_code", "qty"}]}
+        profile: The customer's pricing profile.
+        prices (dict): Item code to selling price list rate.
+        taxable_items (set): Item codes whose tax category is Taxable.
+        tax_rows (list, optional): Rows of the default sales tax template (see get_sales_tax_rows).
+        item_tax_rates (dict, optional): Item code to {account: rate} (see get_item_tax_rates).
+    Returns:
+        dict: The quote (see get_price_quotes).
+    Raises:
+        ValueError: If the customer, an item price or the customer's state is missing.
+    """
+    if not profile:
+        raise ValueError(f"Customer '{cart.get('customer')}' not found")
+    if not profile.has_state:
+        raise ValueError(f"Customer '{profile.customer}' has no state")
+
+    negotiated = profile.negotiated_prices if profile.organization else {}
+    missing = [line.get("item_code") for line in cart.get("items") or [] if line.get("item_code") not in prices]
+    if missing:
+        raise ValueError(f"No selling price for {', '.join(map(str, missing))}")
+
+    # Negotiated prices replace list rates; as in check_negotiated_items, any change disables discounting
+    lines = []
+    ignore_discount = False
+    for line in cart.get("items") or []:
+        item_code, qty = line["item_code"], flt(line.get("qty"))
+        rate = negotiated.get(item_code, prices[item_code])
+        ignore_discount = ignore_discount or rate != prices[item_code]
+        lines.append({
+            "item_code": item_code,
+            "qty": qty,
+            "price_list_rate": prices[item_code],
+            "rate": rate,
+            "negotiated": item_code in negotiated,
+            "amount": flt(rate * qty, 2),
+            "taxable": item_code in taxable_items,
+        })
+
+    total_qty = sum(line["qty"] for line in lines)
+    net_total = flt(sum(line["amount"] for line in lines), 2)
+
+    # Quantity tier plus customer discount, applied on the net total as apply_dynamic_discount does
+    discount_percentage = 0
+    if not ignore_discount:
+        try:
+            discount_percentage = float(profile.base_discount or 0) + get_qty_discount_modifier(total_qty)
+        except (TypeError, ValueError):
+            raise ValueError(f"Custom discount for '{profile.customer}' is not a number") from None
+    discount_amount = flt(net_total * discount_percentage / 100, 2)
+
+    # Same rule as use_tax_status: exempt customers, and states not taxed (or unknown), pay no tax
+    exempt = profile.tax_status == "Exempt" or not profile.state_tax_status
+    taxable_total = 0 if exempt else flt(sum(line["amount"] for line in lines if line["taxable"]) * (1 - discount_percentage / 100), 2)
+
+    # Otherwise the order keeps the default tax template; each taxable line is taxed on its discounted
+    # amount, at its Item Tax Template rate for the row's account when it has one
+    tax_amount = 0
+    if not exempt:
+        for row in tax_rows or []:
+            for line in lines:
+                if not line["taxable"]:
+                    continue
+                rate = (item_tax_rates or {}).get(line["item_code"], {}).get(row.account_head, row.rate)
+                tax_amount += line["amount"] * (1 - discount_percentage / 100) * flt(rate) / 100
+    tax_amount = flt(tax_amount, 2)
+
+    return {
+        "id": cart.get("id"),
+        "customer": profile.customer,
+        "lines": lines,
+        "total_qty": total_qty,
+        "discount_percentage": discount_percentage,
+        "net_total": net_total,
+        "discount_amount": discount_amount,
+        "exempt_from_sales_tax": int(exempt),
+        "taxable_total": taxable_total,
+        "tax_amount": tax_amount,
+        "grand_total": flt(net_total - discount_amount + tax_amount, 2),
+    }
@@ -0,0 +1,194 @@
+import time
+
+import frappe
+from frappe.utils.background_jobs import get_job
+from qb_connector.discount_hooks import get_qty_discount_modifier
+from qb_connector.pricing_profile import NEGOTIATED_PRICES_FIELD, get_pricing_profile
+from qb_connector.queues import enqueue_qbo
+
+# repricing.py
+# Re-prices open (draft) Sales Orders and Sales Invoices after a customer's discount or an
+# organization's negotiated prices change, so drafts do not keep stale prices until re-saved by hand.
+
+# Documents saved per commit
+REPRICE_CHUNK_SIZE = 50
+
+# Draft documents repriced, with their item child tables
+REPRICE_DOCTYPES = {
+    "Sales Order": "Sales Order Item",
+    "Sales Invoice": "Sales Invoice Item",
+}
+
+
+def enqueue_customer_repricing(doc, method):
+    """
+    Customer on_update hook: queues re-pricing of the customer's open orders when custom_discount_ changed.
+    Args:
+        doc: The Customer document.
+        method: The event method triggering the hook.
+    """
+    previous = doc.get_doc_before_save()
+    if not previous or str(previous.get("custom_discount_") or "") == str(doc.get("custom_discount_") or ""):
+        return
+    enqueue_repricing(doc.doctype, doc.name)
+
+
+def enqueue_organization_repricing(doc, method):
+    """
+    Camp / Other Organization on_update hook: queues re-pricing of the open orders of every linked
+    Customer when the negotiated prices changed.
+    Args:
+        doc: The Camp or Other Organization document.
+        method: The event method triggering the hook.
+    """
+    previous = doc.get_doc_before_save()
+    if previous and get_negotiated_price_rows(previous) == get_negotiated_price_rows(doc):
+        return
+    enqueue_repricing(doc.doctype, doc.name)
+
+
+def get_negotiated_price_rows(doc) -> set:
+    """
+    Returns the (item_code, price) pairs of an organization's Negotiated Prices table.
+    """
+    return {(row.item_code, row.price) for row in doc.get(NEGOTIATED_PRICES_FIELD) or []}
+
+
+def enqueue_repricing(source_doctype: str, source_name: str):
+    """
+    Queues reprice_source on the bulk queue after the current transaction commits.
+    Repeated changes share one queued job, which reads the customers and their profiles when it
+    starts. A job that has already started read the old values, so one more job is queued behind it.
+    Args:
+        source_doctype (str): Customer, Camp or Other Organization.
+        source_name (str): The changed document.
+    """
+    job_id = f"qbo_reprice::{source_doctype}::{source_name}"
+    job = get_job(job_id)
+    if job and job.get_status() == "started":
+        job_id = f"{job_id}::rerun"
+
+    enqueue_qbo(
+        "qb_connector.repricing.reprice_source",
+        "bulk",
+        job_id=job_id,
+        deduplicate=True,
+        enqueue_after_commit=True,
+        source_doctype=source_doctype,
+        source_name=source_name,
+    )
+
+
+def reprice_source(source_doctype: str, source_name: str) -> dict:
+    """
+    Background job: re-prices the open orders of a changed Customer, or of every Customer
+    linked to a changed Camp / Other Organization, as linked when the job runs.
+    Args:
+        source_doctype (str): Customer, Camp or Other Organization.
+        source_name (str): The changed document.
+    Returns:
+        dict: The report of reprice_open_orders.
+    """
+    if source_doctype == "Customer":
+        customers = [source_name]
+    else:
+        link_field = "custom_camp_link" if source_doctype == "Camp" else "custom_other_organization_link"
+        customers = frappe.get_all("Customer", filters={link_field: source_name}, pluck="name")
+    if not customers:
+        return {"checked": 0, "updated": [], "failed": {}, "seconds": 0}
+    return reprice_open_orders(customers)
+
+
+def reprice_open_orders(customers: list) -> dict:
+    """
+    Background job: re-prices the draft Sales Orders and Sales Invoices of the given customers.
+    Selects the drafts and their lines with one query per table, computes the expected discount and
+    negotiated line rates in memory, and saves only the documents whose pricing changes, committing
+    every REPRICE_CHUNK_SIZE documents.
+    Args:
+        customers (list): Customer names.
+    Returns:
+        dict: {"checked": int, "updated": [...], "failed": {name: reason}, "seconds": float}
+    """
+    started = time.time()
+    report = {"checked": 0, "updated": [], "failed": {}}
+    profiles = {customer: get_pricing_profile(customer) for customer in customers}
+
+    for doctype, item_doctype in REPRICE_DOCTYPES.items():
+        orders = frappe.get_all(
+            doctype,
+            filters={"customer": ["in", customers], "docstatus": 0, "custom_built_from_webhook": 0},
+            fields=[
+                "name", "customer", "total_qty", "additional_discount_percentage",
+                "custom_ignore_discount", "custom_ignore_negotiated_price",
+            ],
+        )
+        report["checked"] += len(orders)
+        if not orders:
+            continue
+
+        lines_by_order = {}
+        for line in frappe.get_all(
+            item_doctype,
+            filters={"parenttype": doctype, "parent": ["in", [order.name for order in orders]]},
+            fields=["parent", "item_code", "rate"],
+        ):
+            lines_by_order.setdefault(line.parent, []).append(line)
+
+        stale = [
+            order.name for order in orders
+            if needs_repricing(order, lines_by_order.get(order.name, []), profiles.get(order.customer))
+        ]
+
+        for start in range(0, len(stale), REPRICE_CHUNK_SIZE):
+            for name in stale[start:start + REPRICE_CHUNK_SIZE]:
+                # Undo only this document on failure, keeping the rest of the chunk
+                frappe.db.savepoint("reprice_order")
+                try:
+                    # Saving runs order_hooks, which applies the new prices and recalculates totals
+                    doc = frappe.get_doc(doctype, name)
+                    doc.flags.ignore_permissions = True
+                    doc.save()
+                    report["updated"].append(name)
+                except Exception as e:
+                    frappe.db.rollback(save_point="reprice_order")
+                    report["failed"][name] = str(e)
+            frappe.db.commit()
+
+    report["seconds"] = round(time.time() - started, 2)
+    frappe.logger().info(
+        f"💲 Repriced {len(report['updated'])} of {report['checked']} open order(s) for "
+        f"{len(customers)} customer(s) in {report['seconds']}s, {len(report['failed'])} failed"
+    )
+    for name, reason in report["failed"].items():
+        frappe.log_error(reason, f"Repricing failed for {name}")
+    return report
+
+
+def needs_repricing(order, lines: list, profile) -> bool:
+    """
+    Returns True if saving the order would change its line rates or discount,
+    following the same rules as check_negotiated_items and apply_dynamic_discount.
+    Args:
+        order: The order row (name, total_qty, discount and ignore flags).
+        lines (list): The order's item rows (item_code, rate).
+        profile: The customer's pricing profile.
+    """
+    if not profile:
+        return False
+
+    if not order.custom_ignore_negotiated_price and profile.organization:
+        negotiated = profile.negotiated_prices
+        for line in lines:
+            price = negotiated.get(line.item_code)
+            if price is not None and line.rate != price:
+                return True
+
+    if order.custom_ignore_discount:
+        return float(order.additional_discount_percentage or 0) != 0
+
+    try:
+        expected = float(profile.base_discount or 0) + get_qty_discount_modifier(order.total_qty or 0)
+    except (TypeError, ValueError):
+        return False
+    return float(order.additional_discount_percentage or 0) != expected
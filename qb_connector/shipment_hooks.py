@@ -1,8 +1,27 @@
+import time
+
 import frappe
+from frappe.utils import now
+from qb_connector.queues import enqueue_qbo
+from qb_connector.shipment_summary import adjust_summary, get_summary_key, move_trackers, queue_summary_rebuild
 
 # shipment_hooks.py
 # Hooks and helpers for creating and updating Shipment Tracker documents based on Sales Orders, Invoices, and Payments.
 
+# Shipment Tracker field -> Camp / Other Organization field copied when a tracker is created
+ORGANIZATION_FIELDS = {
+    "order_id": "organization_order_id",
+    "street_address_line_1": "street_address_line_1_shipping_address",
+    "street_address_line_2": "street_address_line_2_shipping_address",
+    "city": "city_shipping_address",
+    "state": "state_shipping_address",
+    "zip_code": "zip_code_shipping_address",
+    "country": "country_shipping_address",
+}
+
+# Trackers inserted per commit by the backfill
+BACKFILL_CHUNK_SIZE = 500
+
 def create_shipment_tracker(doc, method):
     """
     Creates a Shipment Tracker document when a Sales Order is submitted, if one does not already exist.
@@ -50,68 +69,239 @@ def set_organization_info(tracker, organization_type, customer_name):
         customer_name (str): The name of the customer.
     """
     organization = frappe.get_doc(organization_type, customer_name)
-    tracker.order_id = organization.organization_order_id
-    tracker.street_address_line_1 = organization.street_address_line_1_shipping_address
-    tracker.street_address_line_2 = organization.street_address_line_2_shipping_address
-    tracker.city = organization.city_shipping_address
-    tracker.state = organization.state_shipping_address
-    tracker.zip_code = organization.zip_code_shipping_address
-    tracker.country = organization.country_shipping_address
-    
+    for tracker_field, organization_field in ORGANIZATION_FIELDS.items():
+        tracker.set(tracker_field, organization.get(organization_field))
 
 
 def link_invoice_to_tracker(doc, method):
     """
-    Links a submitted Sales Invoice to the corresponding Shipment Tracker, updating its status.
+    Links a submitted Sales Invoice to the Shipment Trackers of every Sales Order it bills,
+    updating their status. Runs inside the submit transaction.
     Args:
         doc: The Sales Invoice document being submitted.
         method: The event method triggering the hook.
     """
-    if not doc.items or not doc.items[0].sales_order:
-        return
-
-    sales_order = doc.items[0].sales_order
-    tracker = frappe.get_value("Shipment Tracker", {"sales_order": sales_order}, "name")
-    if not tracker:
+    sales_orders = {item.sales_order for item in doc.items or [] if item.sales_order}
+    if not sales_orders:
         return
 
-    st = frappe.get_doc("Shipment Tracker", tracker)
-    st.sales_invoice = doc.name
-    st.shipment_status = "Invoice Sent"
-    st.save()  # Save changes to Shipment Tracker
-    frappe.db.commit()  # Commit the transaction
+    update_trackers(
+        get_trackers("sales_order", sales_orders),
+        {"sales_invoice": doc.name, "shipment_status": "Invoice Sent"},
+    )
 
 
 def link_payment_to_tracker(doc, method):
     """
-    Links a submitted Payment Entry to the corresponding Shipment Tracker, updating its status.
+    Links a submitted Payment Entry to the Shipment Trackers of every Sales Invoice it pays,
+    updating their status. Runs inside the submit transaction.
     Args:
         doc: The Payment Entry document being submitted.
         method: The event method triggering the hook.
     """
-    for ref in doc.references:
-        if ref.reference_doctype == "Sales Invoice":
-            invoice = ref.reference_name
-            frappe.logger().debug(f"Fetching Sales Invoice doc: {invoice}")
-            try:
-                invoice_doc = frappe.get_doc("Sales Invoice", invoice)
-            except Exception as e:
-                frappe.msgprint(f"Error fetching Sales Invoice {invoice}: {e}")
-                continue
+    invoices = {ref.reference_name for ref in doc.references if ref.reference_doctype == "Sales Invoice"}
+    if not invoices:
+        return
+
+    update_trackers(
+        get_trackers("sales_invoice", invoices),
+        {"payment_entry": doc.name, "shipment_status": "Payment Received"},
+    )
+
+
+def get_trackers(link_field: str, names) -> list:
+    """
+    Returns the Shipment Trackers linked to any of the given documents, in one indexed query.
+    Args:
+        link_field (str): sales_order, sales_invoice or payment_entry.
+        names (iterable): Names of the linked documents.
+    Returns:
+        list: Tracker rows with name, shipment_status, organization_type and creation.
+    """
+    return frappe.get_all(
+        "Shipment Tracker",
+        filters={link_field: ["in", list(names)]},
+        fields=["name", "shipment_status", "organization_type", "creation"],
+    )
+
+
+def update_trackers(trackers: list, values: dict):
+    """
+    Sets the same values on every given Shipment Tracker with a single UPDATE and moves them
+    to their new Shipment Status Summary rows. Does not commit; the caller's transaction does.
+    Args:
+        trackers (list): Tracker rows from get_trackers.
+        values (dict): Field values to set.
+    """
+    if not trackers:
+        return
+    names = [tracker.name for tracker in trackers]
+    try:
+        frappe.db.set_value("Shipment Tracker", {"name": ["in", names]}, values)
+        frappe.logger().debug(f"Shipment Trackers {', '.join(names)} updated with {values}")
+    except Exception as e:
+        frappe.logger().error(f"Error updating Shipment Trackers {', '.join(names)}: {e}")
+        frappe.msgprint(f"Error updating Shipment Trackers {', '.join(names)}: {e}")
+        return
 
-            # Look for a Shipment Tracker that directly references this Sales Invoice
-            tracker_name = frappe.get_value("Shipment Tracker", {"sales_invoice": invoice}, "name")
-            if not tracker_name:
-                frappe.logger().debug(f"No Shipment Tracker found for Sales Invoice {invoice}")
-                continue
+    try:
+        move_trackers(trackers, values)
+    except Exception:
+        # The trackers did change: record the failure and recount the summary instead of letting it drift
+        frappe.log_error(frappe.get_traceback(), f"Shipment Status Summary update failed for {', '.join(names)}")
+        queue_summary_rebuild()
 
+
+@frappe.whitelist()
+def enqueue_tracker_backfill():
+    """
+    Queues backfill_shipment_trackers on the bulk queue.
+    """
+    frappe.only_for("System Manager")
+    enqueue_qbo(
+        "qb_connector.shipment_hooks.backfill_shipment_trackers",
+        "bulk",
+        job_id="qbo_shipment_tracker_backfill",
+        deduplicate=True,
+    )
+
+
+def backfill_shipment_trackers() -> dict:
+    """
+    Background job: creates the Shipment Trackers that create_shipment_tracker would have created
+    for submitted Sales Orders that have none (e.g. orders submitted before the app was installed).
+    Finds the orders with one anti-join query, reads their Customers and organizations with one
+    query per doctype, and inserts the trackers in chunks of BACKFILL_CHUNK_SIZE, one commit per chunk.
+    A chunk that fails is retried one row at a time, so only the colliding rows are reported as failed.
+    Safe to re-run: orders that already have a tracker are not selected again.
+    Returns:
+        dict: {"missing": int, "created": int, "skipped": {sales_order: reason},
+            "failed": {sales_order: reason}, "seconds": float}
+    """
+    started = time.time()
+    report = {"missing": 0, "created": 0, "skipped": {}, "failed": {}}
+
+    orders = frappe.db.sql(
+        """
+        SELECT so.name, so.customer
+        FROM `tabSales Order` so
+        LEFT JOIN `tabShipment Tracker` st ON st.sales_order = so.name
+        WHERE so.docstatus = 1 AND IFNULL(so.customer, '') != '' AND st.name IS NULL
+        ORDER BY so.creation
+        """,
+        as_dict=True,
+    )
+    report["missing"] = len(orders)
+
+    customer_names = list({order.customer for order in orders})
+    customers = {
+        customer.name: customer
+        for customer in frappe.get_all(
+            "Customer",
+            filters={"name": ["in", customer_names]},
+            fields=["name", "custom_camp_link", "custom_other_organization_link"],
+            limit_page_length=0,
+        )
+    } if customer_names else {}
+
+    # As in set_organization_info, the organization shares the Customer's name
+    organizations = {}
+    for organization_type, link_field in (("Camp", "custom_camp_link"), ("Other Organization", "custom_other_organization_link")):
+        names = [customer.name for customer in customers.values() if customer.get(link_field)]
+        if not names:
+            continue
+        for organization in frappe.get_all(
+            organization_type,
+            filters={"name": ["in", names]},
+            fields=["name", *ORGANIZATION_FIELDS.values()],
+            limit_page_length=0,
+        ):
+            organizations[(organization_type, organization.name)] = organization
+
+    trackers = []
+    for order in orders:
+        customer = customers.get(order.customer)
+        if not customer:
+            report["skipped"][order.name] = f"Customer {order.customer} not found"
+            continue
+        if customer.custom_camp_link:
+            organization_type = "Camp"
+        elif customer.custom_other_organization_link:
+            organization_type = "Other Organization"
+        else:
+            report["skipped"][order.name] = f"Customer {customer.name} does not have an organization type"
+            continue
+        organization = organizations.get((organization_type, customer.name))
+        if not organization:
+            report["skipped"][order.name] = f"{organization_type} {customer.name} not found"
+            continue
+
+        shipment_name = f"{customer.name} order {order.name}"
+        tracker = frappe._dict(
+            name=shipment_name,
+            shipment_name=shipment_name,
+            sales_order=order.name,
+            organization_type=organization_type,
+            shipment_status="Sales Order Made",
+            organization=customer.name,
+        )
+        for tracker_field, organization_field in ORGANIZATION_FIELDS.items():
+            tracker[tracker_field] = organization.get(organization_field)
+        trackers.append(tracker)
+
+    for start in range(0, len(trackers), BACKFILL_CHUNK_SIZE):
+        chunk = trackers[start:start + BACKFILL_CHUNK_SIZE]
+        try:
+            insert_backfill_trackers(chunk)
+            frappe.db.commit()
+            report["created"] += len(chunk)
+            continue
+        except Exception:
+            frappe.db.rollback()
+
+        # One colliding row (e.g. a tracker created by the on_submit hook meanwhile, or an existing
+        # tracker with the same name) must not hold back the rest: retry the chunk row by row
+        for tracker in chunk:
+            frappe.db.savepoint("backfill_tracker")
             try:
-                tracker_doc = frappe.get_doc("Shipment Tracker", tracker_name)
-                tracker_doc.payment_entry = doc.name
-                tracker_doc.shipment_status = "Payment Received"
-                tracker_doc.save()  # Save changes to Shipment Tracker
-                frappe.db.commit()  # Commit the transaction
-                frappe.logger().debug(f"Shipment Tracker {tracker_name} updated with payment_entry {doc.name} and status 'Payment Received'")
+                insert_backfill_trackers([tracker])
+                report["created"] += 1
             except Exception as e:
-                frappe.logger().error(f"Error updating Shipment Tracker {tracker_name}: {e}")
-                frappe.msgprint(f"Error updating Shipment Tracker {tracker_name}: {e}")
+                frappe.db.rollback(save_point="backfill_tracker")
+                report["failed"][tracker.sales_order] = str(e)
+        frappe.db.commit()
+
+    report["seconds"] = round(time.time() - started, 2)
+    frappe.logger().info(
+        f"📦 Backfilled {report['created']} of {report['missing']} missing Shipment Tracker(s) in "
+        f"{report['seconds']}s, {len(report['skipped'])} skipped, {len(report['failed'])} failed"
+    )
+    if report["failed"]:
+        frappe.log_error(frappe.as_json(report["failed"]), "Shipment Tracker backfill failed")
+    return report
+
+
+def insert_backfill_trackers(trackers: list):
+    """
+    Inserts Shipment Trackers with one bulk INSERT and counts them into Shipment Status Summary.
+    The bulk insert bypasses the Shipment Tracker controller, so the summary is updated here.
+    Does not commit.
+    Args:
+        trackers (list): Tracker values built by backfill_shipment_trackers.
+    """
+    tracker_fields = ["shipment_name", "sales_order", "organization_type", "shipment_status", "organization", *ORGANIZATION_FIELDS]
+    timestamp, user = now(), frappe.session.user
+    frappe.db.bulk_insert(
+        "Shipment Tracker",
+        ["name", "creation", "modified", "owner", "modified_by", "docstatus", "idx", *tracker_fields],
+        [
+            [tracker.name, timestamp, timestamp, user, user, 0, 0, *(tracker[field] for field in tracker_fields)]
+            for tracker in trackers
+        ],
+    )
+
+    changes = {}
+    for tracker in trackers:
+        key = get_summary_key({**tracker, "creation": timestamp})
+        changes[key] = changes.get(key, 0) + 1
+    adjust_summary(changes)
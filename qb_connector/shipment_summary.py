@@ -0,0 +1,146 @@
+import frappe
+from frappe.utils import getdate, now
+
+from qb_connector.queues import enqueue_qbo
+
+# shipment_summary.py
+# Keeps Shipment Status Summary, the count of Shipment Trackers per status, organization type
+# and creation month, up to date as trackers change, so the Shipments workspace reads a few
+# summary rows instead of counting the whole tracker table.
+
+SUMMARY_DOCTYPE = "Shipment Status Summary"
+
+
+def get_summary_key(tracker) -> tuple:
+    """
+    Returns the (shipment_status, organization_type, period) a tracker is counted under.
+    Args:
+        tracker: A Shipment Tracker document or row with shipment_status, organization_type and creation.
+    """
+    return (
+        tracker.get("shipment_status") or None,
+        tracker.get("organization_type") or None,
+        getdate(tracker.get("creation")).strftime("%Y-%m"),
+    )
+
+
+def get_summary_name(key: tuple) -> str:
+    """
+    Returns the summary row name for a key; rebuild_shipment_summary builds the same name in SQL.
+    """
+    shipment_status, organization_type, period = key
+    return f"{period}|{organization_type or '-'}|{shipment_status or '-'}"
+
+
+def adjust_summary(changes: dict):
+    """
+    Adds count deltas to the summary rows, creating missing rows. Each row is upserted with one
+    INSERT ... ON DUPLICATE KEY UPDATE, so concurrent updates add up instead of overwriting.
+    Does not commit; the caller's transaction does.
+    Args:
+        changes (dict): (shipment_status, organization_type, period) -> count delta.
+    """
+    timestamp, user = now(), frappe.session.user
+    for key, delta in changes.items():
+        if not delta:
+            continue
+        shipment_status, organization_type, period = key
+        frappe.db.sql(
+            """
+            INSERT INTO `tabShipment Status Summary`
+                (name, creation, modified, owner, modified_by, docstatus,
+                 shipment_status, organization_type, period, tracker_count)
+            VALUES (%(name)s, %(now)s, %(now)s, %(user)s, %(user)s, 0,
+                 %(shipment_status)s, %(organization_type)s, %(period)s, %(delta)s)
+            ON DUPLICATE KEY UPDATE tracker_count = tracker_count + %(delta)s, modified = %(now)s
+            """,
+            {
+                "name": get_summary_name(key),
+                "now": timestamp,
+                "user": user,
+                "shipment_status": shipment_status,
+                "organization_type": organization_type,
+                "period": period,
+                "delta": delta,
+            },
+        )
+
+
+def count_tracker(tracker, delta: int):
+    """
+    Adds a single tracker to (delta 1) or removes it from (delta -1) its summary row.
+    """
+    adjust_summary({get_summary_key(tracker): delta})
+
+
+def move_trackers(trackers: list, values: dict):
+    """
+    Moves trackers to the summary rows matching the given new values, e.g. after a set-based
+    status update that bypassed the Shipment Tracker controller.
+    Args:
+        trackers (list): Tracker rows with shipment_status, organization_type and creation, before the update.
+        values (dict): The field values the trackers were updated with.
+    """
+    changes = {}
+    for tracker in trackers:
+        old_key = get_summary_key(tracker)
+        new_key = get_summary_key({**tracker, **values})
+        if old_key == new_key:
+            continue
+        changes[old_key] = changes.get(old_key, 0) - 1
+        changes[new_key] = changes.get(new_key, 0) + 1
+    adjust_summary(changes)
+
+
+@frappe.whitelist()
+def enqueue_summary_rebuild():
+    """
+    Queues rebuild_shipment_summary on the bulk queue. Also the weekly scheduler entry point.
+    """
+    if frappe.session.user != "Administrator":
+        frappe.only_for("System Manager")
+    queue_summary_rebuild()
+
+
+def queue_summary_rebuild():
+    """
+    Queues rebuild_shipment_summary on the bulk queue after the current transaction commits;
+    repeated calls share one queued job.
+    """
+    enqueue_qbo(
+        "qb_connector.shipment_summary.rebuild_shipment_summary",
+        "bulk",
+        job_id="qbo_shipment_summary_rebuild",
+        deduplicate=True,
+        enqueue_after_commit=True,
+    )
+
+
+def rebuild_shipment_summary() -> int:
+    """
+    Background job: recounts Shipment Status Summary from scratch with one grouped query over
+    Shipment Tracker, repairing any drift from the incremental updates.
+    Returns:
+        int: The number of summary rows written.
+    """
+    frappe.db.delete(SUMMARY_DOCTYPE)
+    frappe.db.sql(
+        """
+        INSERT INTO `tabShipment Status Summary`
+            (name, creation, modified, owner, modified_by, docstatus,
+             shipment_status, organization_type, period, tracker_count)
+        SELECT
+            CONCAT_WS('|', DATE_FORMAT(creation, '%%Y-%%m'),
+                COALESCE(NULLIF(organization_type, ''), '-'), COALESCE(NULLIF(shipment_status, ''), '-')),
+            %(now)s, %(now)s, %(user)s, %(user)s, 0,
+            NULLIF(shipment_status, ''), NULLIF(organization_type, ''), DATE_FORMAT(creation, '%%Y-%%m'), COUNT(*)
+        FROM `tabShipment Tracker`
+        GROUP BY DATE_FORMAT(creation, '%%Y-%%m'), NULLIF(organization_type, ''), NULLIF(shipment_status, '')
+        """,
+        {"now": now(), "user": frappe.session.user},
+    )
+    frappe.db.commit()
+
+    rows = frappe.db.count(SUMMARY_DOCTYPE)
+    frappe.logger().info(f"📦 Rebuilt Shipment Status Summary: {rows} row(s)")
+    return rows
@@ -0,0 +1,250 @@
+import json
+import random
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import frappe
+from qb_connector.queues import enqueue_qbo
+from qb_connector.utils import acquire_qbo_budget, run_ts_script
+
+# sync_retry.py
+# Background retry engine for Sales Invoices and Payment Entries whose QBO sync failed.
+# Scripts run with bounded concurrency; transient failures back off exponentially per document,
+# and progress is pushed to the list view over realtime.
+
+DEFAULT_CONCURRENCY = 4
+DEFAULT_MAX_ATTEMPTS = 5
+BASE_BACKOFF_SECONDS = 5
+MAX_BACKOFF_SECONDS = 300
+
+# Output fragments that indicate the failure is worth retrying (throttling, network, gateway errors)
+TRANSIENT_MARKERS = (
+    "429",
+    "throttl",
+    "econnreset",
+    "etimedout",
+    "econnrefused",
+    "eai_again",
+    "socket hang up",
+    "status code 500",
+    "status code 502",
+    "status code 503",
+    "status code 504",
+    "timeout",
+)
+
+# qbo_calls is the most QBO requests one script run can make, reserved from the rate budget per run
+RETRY_TARGETS = {
+    "Sales Invoice": {
+        "script": "syncInvoiceToQbo.ts",
+        "skip_field": "custom_dont_sync",
+        # The Invoice write; customer, items and taxes are read from Frappe
+        "qbo_calls": 1,
+    },
+    "Payment Entry": {
+        "script": "syncPaymentToQbo.ts",
+        "skip_field": "custom_dont_sync_with_qbo",
+        # The Payment write, plus the payment method and account queries when their maps are missing
+        "qbo_calls": 3,
+    },
+}
+
+PROGRESS_EVENT = "qbo_retry_progress"
+
+
+def enqueue_failed_sync_retry(doctype: str) -> dict:
+    """
+    Queues a background retry of every document of `doctype` whose QBO sync failed.
+    Only one retry job per DocType is queued at a time.
+    Args:
+        doctype (str): 'Sales Invoice' or 'Payment Entry'.
+    Returns:
+        dict: Message and refresh flag for the list view.
+    """
+    if doctype not in RETRY_TARGETS:
+        frappe.throw(f"QBO retry is not supported for {doctype}")
+
+    enqueue_qbo(
+        "qb_connector.sync_retry.retry_failed_syncs",
+        "bulk",
+        job_id=f"qbo_retry::{doctype}",
+        deduplicate=True,
+        doctype=doctype,
+        user=frappe.session.user,
+    )
+    return {
+        "message": f"🔁 Retrying failed {doctype} syncs in the background.",
+        "refresh": False,
+    }
+
+
+def retry_failed_syncs(doctype: str, user: str = None) -> dict:
+    """
+    Background job: re-runs the QBO sync script for every failed document of `doctype`.
+    State is kept in Redis so an interrupted run resumes with the same attempt counts.
+    Args:
+        doctype (str): 'Sales Invoice' or 'Payment Entry'.
+        user (str, optional): User who receives realtime progress updates.
+    Returns:
+        dict: Summary with synced names and permanent/transient failures.
+    """
+    target = RETRY_TARGETS[doctype]
+    concurrency = int(frappe.conf.get("qbo_retry_concurrency") or DEFAULT_CONCURRENCY)
+    max_attempts = int(frappe.conf.get("qbo_retry_max_attempts") or DEFAULT_MAX_ATTEMPTS)
+
+    names = frappe.get_all(
+        doctype,
+        filters={"custom_sync_status": "Failed", "docstatus": 1, target["skip_field"]: 0},
+        pluck="name",
+    )
+    saved_state = load_retry_state(doctype)
+    pending = {name: saved_state.get(name, {"attempts": 0, "next_at": 0}) for name in names}
+
+    summary = {"doctype": doctype, "total": len(names), "synced": [], "permanent": {}, "transient": {}}
+    started = time.time()
+    publish_progress(summary, user, retrying=len(pending))
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        in_flight = {}
+        while pending or in_flight:
+            now = time.time()
+            ready = sorted((state["next_at"], name) for name, state in pending.items() if state["next_at"] <= now)
+            for _, name in ready:
+                if len(in_flight) >= concurrency:
+                    break
+                if not acquire_qbo_budget(target["qbo_calls"]):
+                    break
+                state = pending.pop(name)
+                state["attempts"] += 1
+                in_flight[pool.submit(run_ts_script, target["script"], name)] = (name, state)
+
+            if not in_flight:
+                # Everything left is backing off; sleep until the earliest one is due
+                next_due = min(state["next_at"] for state in pending.values())
+                time.sleep(max(min(next_due - time.time(), MAX_BACKOFF_SECONDS), 0.5))
+                continue
+
+            done, _ = wait(in_flight, timeout=1, return_when=FIRST_COMPLETED)
+            for future in done:
+                name, state = in_flight.pop(future)
+                outcome, detail, qbo_id = classify_result(doctype, future.result())
+
+                if outcome == "synced":
+                    mark_synced(doctype, name, qbo_id)
+                    summary["synced"].append(name)
+                elif outcome == "transient" and state["attempts"] < max_attempts:
+                    state["next_at"] = time.time() + get_backoff(state["attempts"])
+                    pending[name] = state
+                elif outcome == "transient":
+                    summary["transient"][name] = f"gave up after {state['attempts']} attempts: {detail}"
+                else:
+                    summary["permanent"][name] = detail
+
+            save_retry_state(doctype, pending)
+            publish_progress(summary, user, retrying=len(pending) + len(in_flight))
+
+    clear_retry_state(doctype)
+    summary["duration"] = round(time.time() - started, 2)
+
+    for name, reason in {**summary["permanent"], **summary["transient"]}.items():
+        frappe.log_error(reason, f"QBO retry failed for {doctype} {name}")
+
+    publish_progress(summary, user, retrying=0, finished=True)
+    frappe.logger().info(
+        f"🔁 QBO retry for {doctype}: {len(summary['synced'])} synced, "
+        f"{len(summary['permanent'])} permanent, {len(summary['transient'])} transient failures "
+        f"in {summary['duration']}s"
+    )
+    return summary
+
+
+def classify_result(doctype: str, result) -> tuple:
+    """
+    Interprets the output of a sync script run.
+    Args:
+        doctype (str): The DocType that was synced.
+        result (subprocess.CompletedProcess): The finished script run.
+    Returns:
+        tuple: (outcome, detail, qbo_id) where outcome is 'synced', 'transient' or 'permanent'.
+    """
+    stdout = (result.stdout or "").strip()
+    stderr = (result.stderr or "").strip()
+
+    if doctype == "Sales Invoice":
+        # syncInvoiceToQbo.ts prints only the QBO Invoice ID on success
+        try:
+            qbo_id = int(stdout)
+            if qbo_id >= 0:
+                return "synced", "", str(qbo_id)
+        except ValueError:
+            pass
+    elif result.returncode == 0 and stdout:
+        # syncPaymentToQbo.ts prints the payload first and the QBO Payment ID last
+        return "synced", "", stdout.splitlines()[-1].strip()
+
+    output = f"{stdout}\n{stderr}".strip()
+    detail = output[-1000:] or f"exit code {result.returncode}"
+    lowered = output.lower()
+    if result.returncode == -1 or any(marker in lowered for marker in TRANSIENT_MARKERS):
+        return "transient", detail, None
+    return "permanent", detail, None
+
+
+def get_backoff(attempts: int) -> float:
+    """
+    Exponential backoff with jitter for the given number of attempts already made.
+    """
+    delay = min(BASE_BACKOFF_SECONDS * (2 ** (attempts - 1)), MAX_BACKOFF_SECONDS)
+    return delay * random.uniform(0.8, 1.2)
+
+
+def mark_synced(doctype: str, docname: str, qbo_id: str):
+    """
+    Records a successful retry on the document.
+    """
+    if doctype == "Sales Invoice":
+        from qb_connector.qbo_hooks import mark_qbo_sync_status
+
+        mark_qbo_sync_status(doctype=doctype, docname=docname, status="Synced", invoice_id=qbo_id)
+    else:
+        from qb_connector.payment_hooks import mark_qbo_sync_status
+
+        frappe.db.set_value("Payment Entry", docname, "custom_dont_sync_with_qbo", 1)
+        mark_qbo_sync_status(doctype=doctype, docname=docname, status="Synced", payment_id=qbo_id)
+
+
+def publish_progress(summary: dict, user: str, retrying: int, finished: bool = False):
+    """
+    Pushes retry progress to the list view of the user who started the run.
+    """
+    done = len(summary["synced"]) + len(summary["permanent"]) + len(summary["transient"])
+    payload = {
+        "doctype": summary["doctype"],
+        "total": summary["total"],
+        "done": done,
+        "synced": len(summary["synced"]),
+        "permanent": len(summary["permanent"]),
+        "transient": len(summary["transient"]),
+        "retrying": retrying,
+        "finished": finished,
+    }
+    if finished:
+        payload["failures"] = {"permanent": summary["permanent"], "transient": summary["transient"]}
+    frappe.publish_realtime(PROGRESS_EVENT, payload, user=user)
+
+
+def _state_key(doctype: str) -> str:
+    return f"qbo_retry_state::{doctype}"
+
+
+def load_retry_state(doctype: str) -> dict:
+    state = frappe.cache().get_value(_state_key(doctype))
+    return json.loads(state) if state else {}
+
+
+def save_retry_state(doctype: str, pending: dict):
+    frappe.cache().set_value(_state_key(doctype), json.dumps(pending), expires_in_sec=86400)
+
+
+def clear_retry_state(doctype: str):
+    frappe.cache().delete_value(_state_key(doctype))
@@ -0,0 +1,110 @@
+# Copyright (c) 2026, funfangle and Contributors
+# See license.txt
+
+from unittest.mock import patch
+
+import frappe
+from frappe.tests import UnitTestCase
+
+from qb_connector.discount_hooks import apply_dynamic_discount
+from qb_connector.order_hooks import apply_negotiated_prices
+from qb_connector.repricing import needs_repricing
+
+
+class FakeOrder:
+	"""
+	In-memory stand-in for a draft Sales Order, enough for the pricing helpers.
+	"""
+
+	def __init__(self, **fields):
+		self.__dict__.update(fields)
+
+	def get(self, fieldname, default=None):
+		return self.__dict__.get(fieldname, default)
+
+	def is_new(self):
+		return True
+
+	def calculate_taxes_and_totals(self):
+		pass
+
+
+def make_profile(base_discount=0, negotiated_prices=None, organization="Lakeside"):
+	return frappe._dict(
+		customer="Test Customer",
+		base_discount=base_discount,
+		organization=organization,
+		negotiated_prices=negotiated_prices or {},
+	)
+
+
+def make_order(lines, total_qty=10, discount=0, ignore_discount=0, ignore_negotiated_price=0):
+	return FakeOrder(
+		name="SO-TEST",
+		customer="Test Customer",
+		total_qty=total_qty,
+		additional_discount_percentage=discount,
+		discount_amount=0,
+		apply_discount_on="Net Total",
+		custom_ignore_discount=ignore_discount,
+		custom_ignore_negotiated_price=ignore_negotiated_price,
+		items=[frappe._dict(idx=i + 1, item_code=code, rate=rate) for i, (code, rate) in enumerate(lines)],
+	)
+
+
+class UnitTestNeedsRepricing(UnitTestCase):
+	"""
+	Unit tests for repricing.needs_repricing, checked against the hooks it predicts.
+	"""
+
+	def test_no_profile(self):
+		self.assertFalse(needs_repricing(make_order([("A", 10)]), [frappe._dict(item_code="A", rate=10)], None))
+
+	def test_negotiated_price_differs(self):
+		order = make_order([("A", 10)], ignore_discount=1)
+		self.assertTrue(needs_repricing(order, order.items, make_profile(negotiated_prices={"A": 8})))
+
+	def test_negotiated_price_matches(self):
+		order = make_order([("A", 8)], ignore_discount=1)
+		self.assertFalse(needs_repricing(order, order.items, make_profile(negotiated_prices={"A": 8})))
+
+	def test_ignore_negotiated_price(self):
+		order = make_order([("A", 10)], ignore_negotiated_price=1)
+		self.assertFalse(needs_repricing(order, order.items, make_profile(negotiated_prices={"A": 8})))
+
+	def test_negotiated_prices_need_an_organization(self):
+		order = make_order([("A", 10)])
+		profile = make_profile(negotiated_prices={"A": 8}, organization=None)
+		self.assertFalse(needs_repricing(order, order.items, profile))
+
+	def test_ignore_discount(self):
+		self.assertTrue(needs_repricing(make_order([("A", 10)], discount=5, ignore_discount=1), [], make_profile()))
+		self.assertFalse(needs_repricing(make_order([("A", 10)], discount=0, ignore_discount=1), [], make_profile()))
+
+	def test_discount_includes_quantity_tier(self):
+		# 5% base plus 2% for 500+ units
+		profile = make_profile(base_discount=5)
+		self.assertFalse(needs_repricing(make_order([], total_qty=600, discount=7), [], profile))
+		self.assertTrue(needs_repricing(make_order([], total_qty=600, discount=5), [], profile))
+
+	def test_invalid_base_discount(self):
+		self.assertFalse(needs_repricing(make_order([], discount=3), [], make_profile(base_discount="abc")))
+
+	def test_agrees_with_apply_negotiated_prices(self):
+		order = make_order([("A", 10), ("B", 4)])
+		profile = make_profile(negotiated_prices={"A": 8})
+		self.assertTrue(needs_repricing(order, order.items, profile))
+
+		apply_negotiated_prices(order, profile.negotiated_prices)
+		self.assertEqual(order.custom_ignore_discount, 1)
+		self.assertFalse(needs_repricing(order, order.items, profile))
+
+	def test_agrees_with_apply_dynamic_discount(self):
+		order = make_order([("A", 10)], total_qty=1300)
+		profile = make_profile(base_discount=3)
+		self.assertTrue(needs_repricing(order, order.items, profile))
+
+		with patch("qb_connector.discount_hooks.frappe.msgprint"):
+			apply_dynamic_discount(order, "before_save", profile=profile)
+		self.assertEqual(order.additional_discount_percentage, 10)
+		self.assertFalse(needs_repricing(order, order.items, profile))
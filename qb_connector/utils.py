@@ -0,0 +1,149 @@
+import os
+import subprocess
+import time
+from pathlib import Path
+
+import frappe
+import requests
+from dotenv import load_dotenv
+
+# utils.py
+# Shared helpers for running ts_qbo_client scripts and pacing QuickBooks Online (QBO) API usage.
+
+# QBO allows 500 requests per minute per realm; leave headroom for the Node server and webhooks.
+DEFAULT_QBO_REQUESTS_PER_MINUTE = 400
+
+# QBO query API returns at most 1000 rows per page
+QBO_QUERY_PAGE_SIZE = 1000
+
+
+def get_ts_script_dir() -> str:
+    """
+    Returns the absolute path of the ts_qbo_client/src directory.
+    Returns:
+        str: Directory containing the TypeScript sync scripts.
+    """
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    app_root = os.path.abspath(os.path.join(current_dir, ".."))
+    return os.path.join(app_root, "ts_qbo_client", "src")
+
+
+def run_ts_script(script_name: str, *args: str, script_dir: str = None, timeout: int = 300) -> subprocess.CompletedProcess:
+    """
+    Runs a TypeScript script with `npx ts-node` and captures its output.
+    Safe to call from worker threads: it does not touch frappe.local.
+    Args:
+        script_name (str): The TypeScript script filename (relative to script_dir).
+        *args (str): Arguments passed to the script.
+        script_dir (str, optional): Working directory; defaults to ts_qbo_client/src.
+        timeout (int): Seconds to wait before the script is killed.
+    Returns:
+        subprocess.CompletedProcess: returncode, stdout and stderr of the run.
+            A returncode of -1 means the script could not be started or timed out.
+    """
+    cwd = script_dir or get_ts_script_dir()
+    command = ["npx", "ts-node", script_name, *args]
+    try:
+        return subprocess.run(command, cwd=cwd, capture_output=True, text=True, timeout=timeout)
+    except subprocess.TimeoutExpired as e:
+        return subprocess.CompletedProcess(command, -1, e.stdout or "", f"timeout after {timeout}s")
+    except Exception as e:
+        return subprocess.CompletedProcess(command, -1, "", str(e))
+
+
+def acquire_qbo_budget(calls: int = 1, max_wait: int = 120) -> bool:
+    """
+    Reserves `calls` requests from the site-wide QBO rate budget, sleeping until
+    the next one-minute window when the current one is used up.
+    The budget is shared through Redis so concurrent jobs draw from the same pool.
+    Args:
+        calls (int): Number of QBO requests the caller is about to make.
+        max_wait (int): Maximum number of seconds to wait for budget.
+    Returns:
+        bool: True if the budget was reserved, False if max_wait elapsed first.
+    """
+    limit = int(frappe.conf.get("qbo_requests_per_minute") or DEFAULT_QBO_REQUESTS_PER_MINUTE)
+    cache = frappe.cache()
+    deadline = time.time() + max_wait
+
+    while True:
+        window = int(time.time() // 60)
+        key = cache.make_key(f"qbo_rate_budget:{window}")
+        used = cache.incrby(key, calls)
+        if used == calls:
+            cache.expire(key, 120)
+        if used <= limit:
+            return True
+
+        # Over budget: give the reservation back and wait for the next window
+        cache.decrby(key, calls)
+        wait_for = (window + 1) * 60 - time.time()
+        if time.time() + wait_for > deadline:
+            return False
+        time.sleep(max(wait_for, 0.1))
+
+
+def get_node_server_url() -> str:
+    """
+    Returns the base URL of the ts_qbo_client Node server from QuickBooks Settings.
+    """
+    return frappe.db.get_single_value("QuickBooks Settings", "node_server_url") or "http://localhost:3000"
+
+
+def get_qbo_base_url() -> str:
+    """
+    Returns the QBO company API base URL for the configured environment and realm.
+    The environment is read from QBO_ENV in ts_qbo_client/.env, like the Node client.
+    """
+    env_path = Path(frappe.get_app_path("qb_connector")).parent / "ts_qbo_client" / ".env"
+    load_dotenv(dotenv_path=env_path)
+    qbo_env = os.getenv("QBO_ENV", "sandbox").lower()
+    host = "https://quickbooks.api.intuit.com" if qbo_env == "production" else "https://sandbox-quickbooks.api.intuit.com"
+    realm_id = frappe.db.get_single_value("QuickBooks Settings", "realmid")
+    return f"{host}/v3/company/{realm_id}"
+
+
+def get_qbo_headers() -> dict:
+    """
+    Returns QBO request headers with the stored access token.
+    """
+    access_token = frappe.db.get_single_value("QuickBooks Settings", "accesstoken")
+    return {
+        "Authorization": f"Bearer {access_token}",
+        "Accept": "application/json",
+        "Content-Type": "application/json",
+    }
+
+
+def qbo_query_all(entity: str, select: str = "*", where: str = None) -> list:
+    """
+    Runs a QBO query and pages through every result with STARTPOSITION.
+    Args:
+        entity (str): QBO entity name, e.g. 'Item' or 'Customer'.
+        select (str): Comma-separated properties to return.
+        where (str, optional): WHERE clause without the keyword.
+    Returns:
+        list: Every matching entity as a dict.
+    Raises:
+        frappe.ValidationError: If no QBO rate budget could be reserved for a page.
+    """
+    base_url = get_qbo_base_url()
+    headers = get_qbo_headers()
+    rows = []
+    start = 1
+    while True:
+        query = f"SELECT {select} FROM {entity}"
+        if where:
+            query += f" WHERE {where}"
+        query += f" STARTPOSITION {start} MAXRESULTS {QBO_QUERY_PAGE_SIZE}"
+
+        if not acquire_qbo_budget(1):
+            # A partial result would look like missing items to the caller, so give up on the whole query
+            frappe.throw(f"QBO rate budget exhausted while querying {entity} (fetched {len(rows)} rows)")
+        response = requests.get(f"{base_url}/query", params={"query": query}, headers=headers, timeout=60)
+        response.raise_for_status()
+        page = response.json().get("QueryResponse", {}).get(entity, [])
+        rows.extend(page)
+        if len(page) < QBO_QUERY_PAGE_SIZE:
+            return rows
+        start += QBO_QUERY_PAGE_SIZE
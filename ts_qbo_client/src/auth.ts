@@ -95,6 +95,7 @@ export class QuickBooksAuth {
       settings.last_refresh = dayjs().format('YYYY-MM-DD HH:mm:ss');
 
       await frappe.updateDoc('QuickBooks Settings', toFrappe(settings));
+      invalidateQboSettings();
    
     } catch (error: any) {
       console.error('❌ Failed to handle QBO callback:', error);
@@ -132,6 +133,7 @@ export class QuickBooksAuth {
 
       const startUpdate = Date.now();
       await frappe.updateDoc('QuickBooks Settings', toFrappe(settings));
+      invalidateQboSettings();
     } catch (error: any) {
       console.error(`[${ts}] Token refresh failed:`, error.message, error.stack, error.response?.data);
       throw new Error(`Refresh token failed: ${error.message}`);
@@ -139,6 +141,34 @@ export class QuickBooksAuth {
   }
 }
 
+// Settings are read once and shared by the helpers below for a short window,
+// so one sync run does not re-read the QuickBooks Settings singleton for every helper call.
+const SETTINGS_TTL_MS = 30_000;
+let settingsCache: { loadedAt: number; settings: Promise<QuickBooksSettings> } | null = null;
+
+/**
+ * Returns the QuickBooks Settings, memoized for SETTINGS_TTL_MS.
+ * @returns QuickBooksSettings object
+ */
+export async function getQboSettings(): Promise<QuickBooksSettings> {
+  if (!settingsCache || Date.now() - settingsCache.loadedAt > SETTINGS_TTL_MS) {
+    const settings = frappe
+      .getDoc('QuickBooks Settings', 'QuickBooks Settings')
+      .then((raw) => fromFrappe(raw));
+    settingsCache = { loadedAt: Date.now(), settings };
+    // Don't keep a failed read around
+    settings.catch(() => { settingsCache = null; });
+  }
+  return settingsCache.settings;
+}
+
+/**
+ * Drops the memoized settings so the next read sees freshly stored tokens.
+ */
+export function invalidateQboSettings(): void {
+  settingsCache = null;
+}
+
 /**
  * Returns QBO request headers with auth token for API calls.
  * @returns Object containing Authorization, Accept, and Content-Type headers.
@@ -148,9 +178,7 @@ export async function getQboAuthHeaders(): Promise<{
   Accept: string;
   'Content-Type': string;
 }> {
-  const rawSettings = await frappe.getDoc('QuickBooks Settings', 'QuickBooks Settings');
-
-  const settings: QuickBooksSettings = fromFrappe(rawSettings);
+  const settings: QuickBooksSettings = await getQboSettings();
 
   if (!settings.accessToken) {
     throw new Error('❌ No QBO access token found in QuickBooks Settings');
@@ -168,9 +196,7 @@ export async function getQboAuthHeaders(): Promise<{
  * @returns The QuickBooks company realmId string.
  */
 export async function getRealmId(): Promise<string>{
-  const rawSettings = await frappe.getDoc('QuickBooks Settings', 'QuickBooks Settings');
-
-  const settings: QuickBooksSettings = fromFrappe(rawSettings);
+  const settings: QuickBooksSettings = await getQboSettings();
 
   if (!settings.realmId) {
     throw new Error('❌ No QBO access token found in QuickBooks Settings');
@@ -183,8 +209,7 @@ export async function getRealmId(): Promise<string>{
  * @returns The full QBO API base URL for the current environment and company.
  */
 export async function getQboBaseUrl(): Promise<string> {
-  const rawSettings = await frappe.getDoc('QuickBooks Settings', 'QuickBooks Settings');
-  const settings: QuickBooksSettings = fromFrappe(rawSettings);
+  const settings: QuickBooksSettings = await getQboSettings();
 
   if (!settings.realmId) {
     throw new Error('❌ Missing realmId in QuickBooks Settings');
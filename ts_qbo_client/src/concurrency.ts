@@ -0,0 +1,31 @@
+// concurrency.ts
+// Helper for running async work over many items with a bounded number of calls in flight.
+
+/**
+ * Maps items through an async function, running at most `limit` calls at a time.
+ * Results keep the order of the input; a rejected call rejects the whole map,
+ * so callers that need per-item failures should catch inside `fn`.
+ * @param items - Items to process
+ * @param limit - Maximum number of concurrent calls
+ * @param fn - Async function applied to each item
+ * @returns Results in input order
+ */
+export async function mapWithConcurrency<T, R>(
+  items: T[],
+  limit: number,
+  fn: (item: T, index: number) => Promise<R>
+): Promise<R[]> {
+  const results: R[] = new Array(items.length);
+  let next = 0;
+
+  async function worker(): Promise<void> {
+    while (next < items.length) {
+      const index = next++;
+      results[index] = await fn(items[index], index);
+    }
+  }
+
+  const workers = Array.from({ length: Math.max(1, Math.min(limit, items.length)) }, () => worker());
+  await Promise.all(workers);
+  return results;
+}
@@ -46,28 +46,24 @@ function isFilled(str?: string | null): boolean {
   return typeof str === 'string' && str.trim().length > 0;
 }
 /**
- * Creates a customer in QuickBooks Online from ERPNext customer data.
- * Fetches customer and QBO settings, builds QBO payload, checks for required fields,
- * and posts to QBO if all required fields are present. Returns a Frappe response object.
- *
- * @param customerName - The ERPNext customer name to sync to QBO.
- * @returns Frappe response object with sync status and QBO customer ID.
+ * Normalizes a country name for the QBO BillAddr, mapping US variants to "USA".
+ * @param country - The country as entered on the ERPNext customer.
+ * @returns The upper-cased country name.
  */
-export async function createCustomerInQbo(customerName: string): Promise<frappeResponse> {
-  // Fetch customer and QuickBooks settings from Frappe
-  const customer = await frappe.getDoc<any>('Customer', customerName);
-  const rawSettings = await frappe.getDoc('QuickBooks Settings', 'QuickBooks Settings');
-  const settings: QuickBooksSettings = fromFrappe(rawSettings);
-
-  // Get QBO API base URL
-  const baseUrl = await getQboBaseUrl(); // ✅ uses QBO_ENV
-
-  // Ensure customer has a name
-  if (!isFilled(customer.customer_name)) {
-    throw new Error(`❌ Cannot create QBO customer without a customer_name`);
+export function normalizeCountry(country?: string | null): string | undefined {
+  const normalized = country?.trim().toUpperCase();
+  if (normalized === "UNITED STATES" || normalized === "USA" || normalized === "US" || normalized === "US OF A" || normalized === "UNITED STATES OF AMERICA") {
+    return "USA";
   }
+  return normalized;
+}
 
-  // Build QBO customer payload
+/**
+ * Builds the QBO Customer payload for an ERPNext customer.
+ * @param customer - The ERPNext Customer document.
+ * @returns The QBO payload and the labels of required fields that are missing.
+ */
+export function buildQboCustomer(customer: any): { payload: any; missing: string[] } {
   const qboCustomer: any = {
     DisplayName: customer.customer_name.trim(),
   };
@@ -79,7 +75,6 @@ export async function createCustomerInQbo(customerName: string): Promise<frappeR
     qboCustomer.CurrencyRef = {
       value: customer.default_currency.trim().toUpperCase(),
     };
-    console.log(qboCustomer.CurrencyRef);
   } else {
     qboCustomer.CurrencyRef = { value: 'USD' };
   }
@@ -99,17 +94,8 @@ export async function createCustomerInQbo(customerName: string): Promise<frappeR
   }
 
   // Set billing address if all fields are present
-  console.warn(`Line1 ${customer.custom_street_address_line_1}`);
-  console.warn(`Line2 ${customer.custom_street_address_line_2}`);
-  console.warn(`City  ${customer.custom_city}`);
-  console.warn(`State ${customer.custom_state}`);
-  console.warn(`Zip Code: ${customer.custom_zip_code}`);
-  console.warn(`Country:  ${customer.custom_country}`)
 
-  let country = customer.custom_country?.trim().toUpperCase();
-  if (country === "UNITED STATES" || country === "USA" || country === "US" || country === "US OF A" || country === "UNITED STATES OF AMERICA") {
-    country = "USA"; // Normalize US variants to "USA"
-  }
+  const country = normalizeCountry(customer.custom_country);
   if (isFilled(customer.custom_street_address_line_1) && isFilled(customer.custom_city) && isFilled(customer.custom_state) && isFilled(customer.custom_zip_code) && isFilled(customer.custom_country)) {
     const Line1 = customer.custom_street_address_line_1;
     const Line2 = customer.custom_street_address_line_2;
@@ -134,6 +120,40 @@ export async function createCustomerInQbo(customerName: string): Promise<frappeR
     qboCustomer.Taxable = false;
   }
 
+  return { payload: qboCustomer, missing };
+}
+
+/**
+ * Creates a customer in QuickBooks Online from ERPNext customer data.
+ * Fetches customer and QBO settings, builds QBO payload, checks for required fields,
+ * and posts to QBO if all required fields are present. Returns a Frappe response object.
+ *
+ * @param customerName - The ERPNext customer name to sync to QBO.
+ * @returns Frappe response object with sync status and QBO customer ID.
+ */
+export async function createCustomerInQbo(customerName: string): Promise<frappeResponse> {
+  // Fetch customer and QuickBooks settings from Frappe
+  const customer = await frappe.getDoc<any>('Customer', customerName);
+  const rawSettings = await frappe.getDoc('QuickBooks Settings', 'QuickBooks Settings');
+  const settings: QuickBooksSettings = fromFrappe(rawSettings);
+
+  // Get QBO API base URL
+  const baseUrl = await getQboBaseUrl(); // ✅ uses QBO_ENV
+
+  // Ensure customer has a name
+  if (!isFilled(customer.customer_name)) {
+    throw new Error(`❌ Cannot create QBO customer without a customer_name`);
+  }
+
+  // Build QBO customer payload
+  console.warn(`Line1 ${customer.custom_street_address_line_1}`);
+  console.warn(`Line2 ${customer.custom_street_address_line_2}`);
+  console.warn(`City  ${customer.custom_city}`);
+  console.warn(`State ${customer.custom_state}`);
+  console.warn(`Zip Code: ${customer.custom_zip_code}`);
+  console.warn(`Country:  ${customer.custom_country}`)
+  const { payload: qboCustomer, missing } = buildQboCustomer(customer);
+
   // Determine sync status based on missing fields
   let syncStatus = 'Synced';
   if (missing.length === 1) {
@@ -1,27 +1,21 @@
 // frappe.ts
-// Import libraries for HTTP requests, environment variables, and path handling
-import axios from 'axios';
-import http from 'http';
-import dotenv from 'dotenv';
-import path from 'path';
-
-// Load environment variables from .env file (supports local and parent directory)
-dotenv.config();
-dotenv.config({ path: path.resolve(__dirname, '../.env') }); // ✅ Load env vars
-
-// Base URL and API token for Frappe site
-const baseUrl = process.env.FRAPPE_SITE_URL || 'http://localhost:8008';
-const token = process.env.FRAPPE_API_TOKEN || '';
-const ipv4Agent = new http.Agent({ family: 4 }); // Force IPv4 for requests
-
-// Helper to build axios config with auth and agent
-function axiosConfig() {
-  return {
-    headers: {
-      Authorization: `token ${token}`
-    },
-    httpAgent: ipv4Agent
-  };
+// Frappe REST API helpers; every call goes through the pooled client in frappeClient.ts
+import { frappeRequest } from './frappeClient';
+
+export { FrappeError, onFrappeRequest } from './frappeClient';
+
+// Composite server methods that replace chains of REST calls
+export const NODE_CLIENT = 'qb_connector.api_directory.node_client';
+
+// Rows per page when streaming list reads
+const DEFAULT_PAGE_SIZE = 500;
+
+// Options for streamed list reads; `fields` is the column projection
+export interface ListOptions {
+  filters?: Record<string, any> | any[];
+  fields?: string[];
+  orderBy?: string;
+  pageSize?: number;
 }
 
 /**
@@ -35,11 +29,11 @@ export const frappe = {
    */
   async getDoc<T>(doctype: string, name?: string): Promise<T> {
     const url = name
-      ? `${baseUrl}/api/resource/${doctype}/${name}`
-      : `${baseUrl}/api/resource/${doctype}`;  // Handles singleton
+      ? `/api/resource/${doctype}/${name}`
+      : `/api/resource/${doctype}`;  // Handles singleton
 
-    const response = await axios.get(url, axiosConfig());
-    return (response.data as { data: T }).data;
+    const response = await frappeRequest<{ data: T }>('get', url);
+    return response.data;
   },
 
   /**
@@ -48,70 +42,176 @@ export const frappe = {
    */
   async updateDoc(doctype: string, doc: any): Promise<void> {
     const url = doc.name
-      ? `${baseUrl}/api/resource/${doctype}/${doc.name}`
-      : `${baseUrl}/api/resource/${doctype}`; // Handles singleton
+      ? `/api/resource/${doctype}/${doc.name}`
+      : `/api/resource/${doctype}`; // Handles singleton
 
-    await axios.put(url, doc, axiosConfig());
+    await frappeRequest('put', url, { data: doc });
   },
 
   /**
-   * Get all documents for a given DocType (up to 1000).
+   * Get all documents for a given DocType, reading every page.
+   * Prefer `iterate` for large DocTypes so the whole list is never held in memory.
    */
-  async getAll<T = any>(doctype: string): Promise<T[]> {
-    const url = new URL(`${baseUrl}/api/resource/${doctype}`);
-    url.searchParams.set('limit_page_length', '1000');  // Use max safe limit
+  async getAll<T = any>(doctype: string, options?: ListOptions): Promise<T[]> {
+    const docs: T[] = [];
+    for await (const doc of frappe.iterate<T>(doctype, options)) {
+      docs.push(doc);
+    }
+    return docs;
+  },
 
-    const response = await axios.get(url.toString(), axiosConfig());
-    return (response.data as { data: T[] }).data;
+  /**
+   * Stream documents of a DocType as an async iterator, paging with limit_start.
+   * Only one page is held in memory at a time. Pages are ordered by `name asc` unless `orderBy`
+   * is given; avoid changing whether rows match `filters` while iterating, or rows may be skipped.
+   *
+   * @example
+   * for await (const item of frappe.iterate<Item>('Item', { fields: ['name', 'item_code'] })) { ... }
+   */
+  async *iterate<T = any>(doctype: string, options?: ListOptions): AsyncGenerator<T> {
+    const pageSize = options?.pageSize || DEFAULT_PAGE_SIZE;
+    for (let start = 0; ; start += pageSize) {
+      const page = await frappe.getAllFiltered<T>(doctype, {
+        filters: options?.filters,
+        fields: options?.fields,
+        orderBy: options?.orderBy || 'name asc',
+        limit: pageSize,
+        start,
+      });
+      yield* page;
+      if (page.length < pageSize) return;
+    }
   },
 
   /**
-   * Get filtered documents for a given DocType, with optional filters, fields, and limit.
+   * Get filtered documents for a given DocType, with optional filters, fields, ordering, and limit.
+   * Filters accept Frappe operators, e.g. { name: ["in", names] }. A limit of 0 returns every match;
+   * `start` skips that many rows, for paging with `limit`.
    */
   async getAllFiltered<T = any>(
     doctype: string,
-    options?: { filters?: Record<string, any>; fields?: string[]; limit?: number }
+    options?: { filters?: Record<string, any> | any[]; fields?: string[]; orderBy?: string; limit?: number; start?: number }
   ): Promise<T[]> {
-    const url = new URL(`${baseUrl}/api/resource/${doctype}`);
+    const params: Record<string, any> = {};
 
     if (options?.filters) {
-      url.searchParams.set("filters", JSON.stringify(options.filters));
+      params.filters = JSON.stringify(options.filters);
     }
 
     if (options?.fields) {
-      url.searchParams.set("fields", JSON.stringify(options.fields));
+      params.fields = JSON.stringify(options.fields);
+    }
+
+    if (options?.orderBy) {
+      params.order_by = options.orderBy;
     }
 
-    if (options?.limit) {
-      url.searchParams.set("limit_page_length", options.limit.toString());
+    if (options?.limit !== undefined) {
+      params.limit_page_length = options.limit;
     }
 
-    const response = await axios.get(url.toString(), axiosConfig());
-    return (response.data as { data: T[] }).data;
+    if (options?.start) {
+      params.limit_start = options.start;
+    }
+
+    const response = await frappeRequest<{ data: T[] }>('get', `/api/resource/${doctype}`, { params });
+    return response.data;
   },
 
   /**
    * Create a new document in ERPNext for the given DocType.
    */
   createDoc: async <T = any>(doctype: string, doc: Partial<T>): Promise<T> => {
-    const url = `${baseUrl}/api/resource/${doctype}`;
-    const response = await axios.post(url, doc, axiosConfig());
-    return (response.data as { data: T }).data;
+    const response = await frappeRequest<{ data: T }>('post', `/api/resource/${doctype}`, { data: doc });
+    return response.data;
+  },
+
+  /**
+   * Insert many documents in one request via frappe.client.insert_many (at most 200 per call).
+   * Each doc must carry its `doctype`. The whole call fails if any document fails.
+   * @returns Names of the inserted documents.
+   */
+  insertMany: async (docs: Record<string, any>[]): Promise<string[]> => {
+    const response = await frappeRequest<{ message: string[] }>('post', '/api/method/frappe.client.insert_many', {
+      data: { docs: JSON.stringify(docs) },
+    });
+    return response.message;
+  },
+
+  /**
+   * Update many documents in one request via frappe.client.bulk_update.
+   * Each doc must carry `doctype` and `docname`; documents that fail are returned, the rest are saved.
+   * @returns The failed documents with their exceptions.
+   */
+  bulkUpdate: async (docs: Record<string, any>[]): Promise<{ doc: any; exc: string }[]> => {
+    const response = await frappeRequest<{ message: { failed_docs: { doc: any; exc: string }[] } }>(
+      'post',
+      '/api/method/frappe.client.bulk_update',
+      { data: { docs: JSON.stringify(docs) } }
+    );
+    return response.message.failed_docs || [];
+  },
+
+  /**
+   * Call a whitelisted server method and return its `message`.
+   */
+  callMethod: async <T = any>(method: string, data: Record<string, any> = {}): Promise<T> => {
+    const response = await frappeRequest<{ message: T }>('post', `/api/method/${method}`, { data });
+    return response.message;
   },
 
   /**
    * Submit a document in ERPNext (changes status to submitted).
-   * Re-fetches the latest document before submitting to get a fresh timestamp.
+   * The server reads the latest version itself, so this is a single request.
    */
   submitDoc: async (doctype: string, name: string): Promise<void> => {
-    // Re-fetch latest document before submitting to get a fresh timestamp
-    const latestDoc = await frappe.getDoc(doctype, name);
-
-    const url = `${baseUrl}/api/method/frappe.client.submit`;
-    await axios.post(
-      url,
-      { doc: latestDoc },
-      axiosConfig()
-    );
-  }
+    await frappe.callMethod(`${NODE_CLIENT}.submit_doc`, { doctype, name });
+  },
+
+  /**
+   * Insert a document and optionally submit it in the same server transaction.
+   * With `uniqueField`, an existing document with the same value is returned instead of a duplicate.
+   */
+  insertDoc: async (
+    doc: Record<string, any>,
+    options: { submit?: boolean; uniqueField?: string } = {}
+  ): Promise<{ name: string; created: boolean }> => {
+    return frappe.callMethod(`${NODE_CLIENT}.insert_doc`, {
+      doc: JSON.stringify(doc),
+      submit: options.submit ? 1 : 0,
+      unique_field: options.uniqueField,
+    });
+  },
+
+  /**
+   * Look up many documents by QBO ID in one request.
+   * @returns QBO ID to document name, for the IDs that matched.
+   */
+  getNamesByQboId: async (
+    doctype: string,
+    qboIds: string[],
+    filters?: Record<string, any>
+  ): Promise<Record<string, string>> => {
+    if (qboIds.length === 0) return {};
+    return frappe.callMethod(`${NODE_CLIENT}.get_names_by_qbo_id`, {
+      doctype,
+      qbo_ids: JSON.stringify(qboIds),
+      filters: filters ? JSON.stringify(filters) : undefined,
+    });
+  },
+
+  /**
+   * Write QBO sync results for many documents in one request, without re-running their hooks.
+   * Only the sync fields the server allows for the DocType may be set.
+   */
+  setSyncStatus: async (
+    doctype: string,
+    updates: { name: string; values: Record<string, any> }[]
+  ): Promise<{ updated: string[]; failed: Record<string, string> }> => {
+    if (updates.length === 0) return { updated: [], failed: {} };
+    return frappe.callMethod(`${NODE_CLIENT}.set_sync_status`, {
+      doctype,
+      updates: JSON.stringify(updates),
+    });
+  },
 };
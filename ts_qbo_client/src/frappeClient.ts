@@ -0,0 +1,165 @@
+// frappeClient.ts
+// Shared HTTP client for the Frappe REST API: keep-alive connection pool, bounded in-flight
+// requests, retries on gateway errors from gunicorn/nginx (POSTs only when never sent), and a
+// per-request timing hook.
+import axios, { AxiosRequestConfig, Method } from 'axios';
+import http from 'http';
+import https from 'https';
+import dotenv from 'dotenv';
+import path from 'path';
+
+// Load environment variables from .env file (supports local and parent directory)
+dotenv.config();
+dotenv.config({ path: path.resolve(__dirname, '../.env') });
+
+// Base URL and API token for Frappe site
+export const FRAPPE_BASE_URL = process.env.FRAPPE_SITE_URL || 'http://localhost:8008';
+const token = process.env.FRAPPE_API_TOKEN || '';
+
+// Sockets kept open to Frappe, and requests allowed in flight at once (queued beyond that)
+const MAX_SOCKETS = Number(process.env.FRAPPE_MAX_SOCKETS) || 16;
+const MAX_IN_FLIGHT = Number(process.env.FRAPPE_MAX_IN_FLIGHT) || 8;
+
+// Gateway errors returned while gunicorn workers restart or are saturated (retried for non-POST requests)
+const RETRY_STATUSES = [502, 503, 504];
+// Connection errors raised before a request is sent, safe to retry for any method
+const NOT_SENT_CODES = ['ECONNREFUSED', 'EHOSTUNREACH', 'ENETUNREACH', 'ENOTFOUND', 'EAI_AGAIN'];
+const MAX_ATTEMPTS = 4;
+const BASE_RETRY_DELAY_MS = 250;
+
+// Force IPv4 and reuse connections across requests
+const httpAgent = new http.Agent({ family: 4, keepAlive: true, maxSockets: MAX_SOCKETS });
+const httpsAgent = new https.Agent({ family: 4, keepAlive: true, maxSockets: MAX_SOCKETS });
+
+const client = axios.create({
+  baseURL: FRAPPE_BASE_URL,
+  headers: { Authorization: `token ${token}` },
+  httpAgent,
+  httpsAgent,
+});
+
+/**
+ * Error raised for a failed Frappe request.
+ * Keeps `response` ({ status, data }) so existing `error.response?.data` handling still works.
+ */
+export class FrappeError extends Error {
+  status?: number;
+  method: string;
+  url: string;
+  exception?: string;
+  response?: { status: number; data: any };
+
+  constructor(method: string, url: string, cause: any) {
+    const status: number | undefined = cause.response?.status;
+    const data = cause.response?.data;
+    const exception: string | undefined = data?.exception || data?.exc_type;
+    super(`Frappe ${method.toUpperCase()} ${url} failed${status ? ` (${status})` : ''}: ${exception || cause.message}`);
+    this.name = 'FrappeError';
+    this.status = status;
+    this.method = method;
+    this.url = url;
+    this.exception = exception;
+    this.response = cause.response ? { status: cause.response.status, data } : undefined;
+  }
+}
+
+// Timing of one finished request, passed to the timing hook
+export interface FrappeRequestTiming {
+  method: string;
+  url: string;
+  status?: number;
+  attempts: number;
+  waitMs: number;     // Time spent queued behind the in-flight limit
+  durationMs: number; // Time from first attempt to final response
+}
+
+// FRAPPE_LOG_TIMINGS=1 logs every request to stderr (stdout is reserved for script results)
+let timingHook: ((timing: FrappeRequestTiming) => void) | null = process.env.FRAPPE_LOG_TIMINGS
+  ? (t) => console.error(`⏱️ ${t.method.toUpperCase()} ${t.url} ${t.status ?? 'ERR'} ${t.durationMs}ms (waited ${t.waitMs}ms, ${t.attempts} attempt(s))`)
+  : null;
+
+/**
+ * Registers a callback that receives the timing of every Frappe request (pass null to remove it).
+ */
+export function onFrappeRequest(hook: ((timing: FrappeRequestTiming) => void) | null): void {
+  timingHook = hook;
+}
+
+// Simple FIFO semaphore for in-flight requests
+let inFlight = 0;
+const waiting: (() => void)[] = [];
+
+async function acquireSlot(): Promise<void> {
+  if (inFlight < MAX_IN_FLIGHT) {
+    inFlight++;
+    return;
+  }
+  await new Promise<void>((resolve) => waiting.push(resolve));
+}
+
+function releaseSlot(): void {
+  const next = waiting.shift();
+  if (next) {
+    next(); // Hand the slot straight to the next waiter
+  } else {
+    inFlight--;
+  }
+}
+
+/**
+ * Returns true if a failed attempt should be retried.
+ * POSTs (insert, insert_many, method calls) are not idempotent: Frappe may already have committed
+ * them when the connection drops or the gateway times out, so they are only retried when the
+ * connection was never established and the request provably did not reach the server.
+ */
+function shouldRetry(method: string, error: any): boolean {
+  if (NOT_SENT_CODES.includes(error.code)) return true;
+  if (method.toLowerCase() === 'post') return false;
+
+  const status = error.response?.status;
+  if (status === undefined) {
+    return error.code === 'ECONNRESET';
+  }
+  return RETRY_STATUSES.includes(status);
+}
+
+/**
+ * Sends a request to Frappe through the shared pool.
+ * @param method - HTTP method
+ * @param url - Path relative to the site, e.g. /api/resource/Item
+ * @param options - Query params and request body
+ * @returns The parsed response body
+ */
+export async function frappeRequest<T = any>(
+  method: Method,
+  url: string,
+  options: { params?: Record<string, any>; data?: any } = {}
+): Promise<T> {
+  const queued = Date.now();
+  await acquireSlot();
+  const started = Date.now();
+  let attempts = 0;
+  let status: number | undefined;
+
+  try {
+    while (true) {
+      attempts++;
+      try {
+        const config: AxiosRequestConfig = { method, url, params: options.params, data: options.data };
+        const response = await client.request<T>(config);
+        status = response.status;
+        return response.data;
+      } catch (error: any) {
+        status = error.response?.status;
+        if (attempts >= MAX_ATTEMPTS || !shouldRetry(method, error)) {
+          throw new FrappeError(method, url, error);
+        }
+        const delay = BASE_RETRY_DELAY_MS * 2 ** (attempts - 1) * (0.8 + Math.random() * 0.4);
+        await new Promise((resolve) => setTimeout(resolve, delay));
+      }
+    }
+  } finally {
+    releaseSlot();
+    timingHook?.({ method, url, status, attempts, waitMs: started - queued, durationMs: Date.now() - started });
+  }
+}
@@ -8,6 +8,7 @@ import { frappe } from './frappe'; // Frappe API integration
 import { QuickBooksSettings } from './types'; // Type definitions for QuickBooks settings
 import { fromFrappe, toFrappe } from './sync/mappers'; // Data mapping utilities
 import { createCustomerInQbo } from './createCustomerInQbo'; // Function to create customer in QBO
+import { updateCustomerInQbo } from './updateCustomerInQbo'; // Function to send sparse customer updates to QBO
 import cron from 'node-cron'; // For scheduled tasks (not used in this file)
 import axios from 'axios'; // HTTP client (not used in this file)
 
@@ -77,6 +78,24 @@ app.post('/api/handle-customer-create', async (req: Request, res: Response) => {
   }
 });
 
+// API route to send changed customer fields to QuickBooks Online as a sparse update
+app.post('/api/handle-customer-update', async (req: Request, res: Response) => {
+  const { customer_name, fields } = req.body as { customer_name?: string; fields?: string[] };
+
+  if (typeof customer_name !== 'string' || !Array.isArray(fields)) {
+    res.status(400).send('❌ Missing or invalid customer_name or fields');
+    return;
+  }
+
+  try {
+    const result = await updateCustomerInQbo(customer_name, fields);
+    res.json(result);
+  } catch (error: any) {
+    console.error(`❌ Error updating customer '${customer_name}':`, error.message || error);
+    res.status(500).send('❌ Failed to update customer in QBO');
+  }
+});
+
 // Start Express server
 app.listen(port, () => {
   console.log(`QBO integration server running at http://0.0.0.0:${port}`);
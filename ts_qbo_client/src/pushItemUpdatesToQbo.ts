@@ -0,0 +1,100 @@
+// pushItemUpdatesToQbo.ts
+// Pushes the latest ERPNext price/cost of many Items to QBO using sparse batch updates.
+// Input: path to a JSON file with [{ itemCode, qboId, unitPrice?, purchaseCost? }].
+// Output: a single JSON line on stdout: { synced: string[], failed: { [itemCode]: reason } }.
+import fs from 'fs';
+import axios from 'axios';
+import dotenv from 'dotenv';
+import { getQboAuthHeaders, getQboBaseUrl } from './auth';
+import { qboBatch, qboQuote, QboBatchOperation } from './qboBatch';
+
+dotenv.config();
+
+// One pending update for a QBO item
+interface ItemUpdate {
+  itemCode: string;
+  qboId: string;
+  unitPrice?: number;
+  purchaseCost?: number;
+}
+
+// QBO query API caps a page at 1000 rows
+const QUERY_PAGE_SIZE = 1000;
+
+/**
+ * Fetches the current SyncToken of each QBO item, which sparse updates require.
+ * @returns Map of QBO item ID to SyncToken
+ */
+async function fetchSyncTokens(baseUrl: string, headers: Record<string, string>, ids: string[]): Promise<Map<string, string>> {
+  const tokens = new Map<string, string>();
+  for (let i = 0; i < ids.length; i += QUERY_PAGE_SIZE) {
+    const chunk = ids.slice(i, i + QUERY_PAGE_SIZE);
+    const query = `SELECT Id, SyncToken FROM Item WHERE Id IN (${chunk.map(qboQuote).join(', ')}) MAXRESULTS ${QUERY_PAGE_SIZE}`;
+    const { data } = await axios.get<{ QueryResponse: { Item?: { Id: string; SyncToken: string }[] } }>(
+      `${baseUrl}/query`,
+      { params: { query }, headers }
+    );
+    for (const item of data.QueryResponse.Item || []) {
+      tokens.set(item.Id, item.SyncToken);
+    }
+  }
+  return tokens;
+}
+
+/**
+ * Sends sparse updates for the given items and reports per-item results.
+ * @param updates - Latest values per item, at most one entry per item
+ */
+export async function pushItemUpdatesToQbo(updates: ItemUpdate[]) {
+  const synced: string[] = [];
+  const failed: Record<string, string> = {};
+
+  const baseUrl = await getQboBaseUrl();
+  const headers = await getQboAuthHeaders();
+  const tokens = await fetchSyncTokens(baseUrl, headers, updates.map((u) => u.qboId));
+
+  const operations: QboBatchOperation[] = [];
+  for (const update of updates) {
+    const syncToken = tokens.get(update.qboId);
+    if (syncToken === undefined) {
+      failed[update.itemCode] = `QBO item ${update.qboId} not found`;
+      continue;
+    }
+
+    const item: any = { Id: update.qboId, SyncToken: syncToken, sparse: true };
+    if (update.unitPrice !== undefined) item.UnitPrice = update.unitPrice;
+    if (update.purchaseCost !== undefined) item.PurchaseCost = update.purchaseCost;
+    operations.push({ bId: update.itemCode, operation: 'update', Item: item });
+  }
+
+  const results = await qboBatch(baseUrl, headers, operations);
+  for (const [itemCode, result] of results) {
+    if (result.ok) {
+      synced.push(itemCode);
+    } else {
+      failed[itemCode] = result.error || 'Unknown error';
+    }
+  }
+
+  return { synced, failed };
+}
+
+// Run directly via ts-node with the path of the JSON input file
+if (require.main === module) {
+  const inputPath = process.argv[2];
+  if (!inputPath) {
+    console.error('❌ Usage: ts-node pushItemUpdatesToQbo.ts <updates.json>');
+    process.exit(1);
+  }
+
+  const updates: ItemUpdate[] = JSON.parse(fs.readFileSync(inputPath, 'utf8'));
+  pushItemUpdatesToQbo(updates)
+    .then((result) => {
+      console.error(`💲 Pushed ${result.synced.length} item(s), ${Object.keys(result.failed).length} failed`);
+      console.log(JSON.stringify(result));
+    })
+    .catch((err) => {
+      console.error('❌ Failed to push item updates:', err?.response?.data || err.message);
+      process.exit(1);
+    });
+}
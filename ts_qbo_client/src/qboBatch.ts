@@ -0,0 +1,84 @@
+// qboBatch.ts
+// Helper for the QBO batch endpoint, which accepts up to 30 operations per request.
+import axios from 'axios';
+import { mapWithConcurrency } from './concurrency';
+
+// QBO rejects batch requests with more than 30 items
+export const QBO_BATCH_LIMIT = 30;
+
+// A single operation in a QBO batch request
+export interface QboBatchOperation {
+  bId: string;                                   // Caller-chosen ID used to match the response
+  operation?: 'create' | 'update' | 'delete';
+  [entity: string]: any;                         // e.g. Item: {...} or Customer: {...}
+}
+
+// Result of a single batch operation, keyed by bId
+export interface QboBatchResult {
+  ok: boolean;
+  entity?: any;   // The returned entity on success
+  error?: string; // Fault message on failure
+}
+
+/**
+ * Sends operations to the QBO batch endpoint in chunks of QBO_BATCH_LIMIT.
+ * @param baseUrl - QBO company base URL (from getQboBaseUrl)
+ * @param headers - QBO auth headers (from getQboAuthHeaders)
+ * @param operations - Operations to send
+ * @param concurrency - Number of batch requests sent at once (QBO allows up to 10 concurrent requests per realm)
+ * @returns Map of bId to the result of that operation
+ */
+export async function qboBatch(
+  baseUrl: string,
+  headers: Record<string, string>,
+  operations: QboBatchOperation[],
+  concurrency = 1
+): Promise<Map<string, QboBatchResult>> {
+  const results = new Map<string, QboBatchResult>();
+
+  const chunks: QboBatchOperation[][] = [];
+  for (let i = 0; i < operations.length; i += QBO_BATCH_LIMIT) {
+    chunks.push(operations.slice(i, i + QBO_BATCH_LIMIT));
+  }
+
+  await mapWithConcurrency(chunks, concurrency, async (chunk) => {
+    try {
+      const response = await axios.post<{ BatchItemResponse?: any[] }>(
+        `${baseUrl}/batch`,
+        { BatchItemRequest: chunk },
+        { headers }
+      );
+      for (const item of response.data.BatchItemResponse || []) {
+        if (item.Fault) {
+          const errors = item.Fault.Error || [];
+          const error = errors.map((e: any) => e.Detail || e.Message).join('; ') || 'Unknown fault';
+          results.set(item.bId, { ok: false, error });
+        } else {
+          const entityKey = Object.keys(item).find((key) => key !== 'bId');
+          results.set(item.bId, { ok: true, entity: entityKey ? item[entityKey] : undefined });
+        }
+      }
+    } catch (err: any) {
+      // A failed request fails every operation in the chunk
+      const error = JSON.stringify(err.response?.data || err.message);
+      for (const op of chunk) {
+        results.set(op.bId, { ok: false, error });
+      }
+    }
+  });
+
+  // Operations QBO did not answer for are failures too
+  for (const op of operations) {
+    if (!results.has(op.bId)) {
+      results.set(op.bId, { ok: false, error: 'No response from QBO batch' });
+    }
+  }
+  return results;
+}
+
+/**
+ * Quotes a value for use in a QBO query string.
+ */
+export function qboQuote(value: string): string {
+  return `'${value.replace(/'/g, "\\'")}'`;
+}
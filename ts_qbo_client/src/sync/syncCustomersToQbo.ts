@@ -1,9 +1,24 @@
 // src/syncCustomersToQbo.ts
+// Bulk customer sync: loads every Frappe and QBO customer once, matches them in memory,
+// links the matches and creates the missing eligible customers with batched QBO writes.
+// Output: a single JSON summary line on stdout; progress goes to stderr.
 
+import dayjs from 'dayjs';
 // Import Frappe API wrapper
 import { frappe } from '../frappe';
-// Import function to sync a single customer to QBO
-import { syncCustomerToQbo } from './syncCustomerToQbo';
+import { getQboAuthHeaders, getQboBaseUrl } from '../auth';
+import { buildQboCustomer } from '../createCustomerInQbo';
+import { qboBatch, QboBatchOperation } from '../qboBatch';
+import { mapWithConcurrency } from '../concurrency';
+import axios from 'axios';
+
+// Frappe and QBO both page at 1000 rows here
+const PAGE_SIZE = 1000;
+// Concurrent Frappe writes and QBO batch requests
+const FRAPPE_CONCURRENCY = 8;
+const QBO_BATCH_CONCURRENCY = 3;
+// Customers written back per set_sync_status request
+const SYNC_STATUS_CHUNK = 200;
 
 /**
  * Interface representing a Frappe customer for batch sync
@@ -12,66 +27,206 @@ interface Customer {
   name: string; // Frappe document name
   customer_name: string; // Customer display name
   custom_qbo_sync_status?: string; // QBO sync status
+  custom_camp_link?: string;
+  custom_other_organization_link?: string;
+  custom_email?: string;
+  custom_phone?: string;
+  custom_street_address_line_1?: string;
+  custom_street_address_line_2?: string;
+  custom_city?: string;
+  custom_state?: string;
+  custom_zip_code?: string;
+  custom_country?: string;
+  custom_tax_status?: string;
+  custom_tax_exemption_number?: string;
+  default_currency?: string;
+}
+
+interface QboCustomer {
+  Id: string;
+  DisplayName?: string;
+  Taxable?: boolean;
+  PrimaryEmailAddr?: { Address?: string };
+}
+
+// In-memory lookup of QBO customers
+interface QboCustomerIndex {
+  byName: Map<string, QboCustomer>;
+  byEmail: Map<string, QboCustomer>;
 }
 
 /**
- * Main batch sync function for customers
+ * Normalizes a display name or email for matching: trimmed, lower-case, single spaces.
  */
-async function main() {
-  // Fetch all customers from Frappe
-  const allCustomers = await frappe.getAll<Customer>('Customer');
+function normalizeKey(value?: string | null): string {
+  return (value || '').trim().toLowerCase().replace(/\s+/g, ' ');
+}
 
-  // Filter out customers that are already synced
-  const toSync = allCustomers.filter(
-    (cust) => cust.custom_qbo_sync_status !== 'Synced'
-  );
+// Customer fields read for matching and creation
+const CUSTOMER_FIELDS = [
+  'name', 'customer_name', 'custom_qbo_sync_status', 'custom_camp_link', 'custom_other_organization_link',
+  'custom_email', 'custom_phone', 'custom_street_address_line_1', 'custom_street_address_line_2',
+  'custom_city', 'custom_state', 'custom_zip_code', 'custom_country', 'custom_tax_status',
+  'custom_tax_exemption_number', 'default_currency',
+];
 
-  // Log how many customers need syncing
-  console.log(`🔄 Found ${toSync.length} customers to sync\n`);
+/**
+ * Loads every active QBO customer once and indexes it by normalized DisplayName and email.
+ */
+async function buildQboCustomerIndex(baseUrl: string, headers: Record<string, string>): Promise<QboCustomerIndex> {
+  const index: QboCustomerIndex = { byName: new Map(), byEmail: new Map() };
+  for (let start = 1; ; start += PAGE_SIZE) {
+    const query = `SELECT Id, DisplayName, Taxable, PrimaryEmailAddr FROM Customer STARTPOSITION ${start} MAXRESULTS ${PAGE_SIZE}`;
+    const { data } = await axios.get<{ QueryResponse: { Customer?: QboCustomer[] } }>(
+      `${baseUrl}/query`,
+      { params: { query }, headers }
+    );
+    const page = data.QueryResponse.Customer || [];
+    for (const qbo of page) {
+      const name = normalizeKey(qbo.DisplayName);
+      const email = normalizeKey(qbo.PrimaryEmailAddr?.Address);
+      if (name && !index.byName.has(name)) index.byName.set(name, qbo);
+      if (email && !index.byEmail.has(email)) index.byEmail.set(email, qbo);
+    }
+    if (page.length < PAGE_SIZE) return index;
+  }
+}
+
+/**
+ * Returns true if the customer meets the same requirements the Customer on_update hook
+ * checks before creating it in QBO.
+ */
+function isEligibleForCreate(customer: Customer, missing: string[]): boolean {
+  const hasOrganization = Boolean(customer.custom_camp_link || customer.custom_other_organization_link);
+  const taxReady =
+    customer.custom_tax_status === 'Taxed' ||
+    (customer.custom_tax_status === 'Exempt' && Boolean(customer.custom_tax_exemption_number));
+  return hasOrganization && taxReady && missing.length === 0;
+}
+
+/**
+ * Main batch sync function for customers
+ */
+export async function syncCustomersToQbo() {
+  const started = Date.now();
+  const baseUrl = await getQboBaseUrl();
+  const headers = await getQboAuthHeaders();
+  const index = await buildQboCustomerIndex(baseUrl, headers);
+  console.error(`🔄 Matching unsynced customers against ${index.byName.size} QBO customers`);
 
   // Initialize report object to track results
   const report = {
-    matched: [] as string[], // Successfully matched and synced
-    notFound: [] as string[], // No QBO match found
-    failed: [] as { name: string; reason: string }[], // Sync failures
+    matched: [] as string[], // Linked to an existing QBO customer
+    created: [] as string[], // Created in QBO
+    skipped: {} as Record<string, string>, // Not eligible or tax status mismatch
+    failed: {} as Record<string, string>, // Sync failures
   };
+  const now = dayjs().format('YYYY-MM-DD HH:mm:ss');
+  const updates: { name: string; values: Record<string, any> }[] = [];
+  const creates: QboBatchOperation[] = [];
 
-  // Iterate through each customer to sync
-  for (const customer of toSync) {
-    try {
-      const result = await syncCustomerToQbo(customer.name);
+  // Stream unsynced Frappe customers and match them in memory; writes happen after the scan
+  // so the filtered set does not shift under the pager
+  for await (const customer of frappe.iterate<Customer>('Customer', {
+    filters: { custom_qbo_sync_status: ['!=', 'Synced'] },
+    fields: CUSTOMER_FIELDS,
+    pageSize: PAGE_SIZE,
+  })) {
+    if (customer.custom_tax_status?.toLowerCase() === 'pending') {
+      report.skipped[customer.name] = 'Tax Status Pending';
+      continue;
+    }
+
+    const match =
+      index.byName.get(normalizeKey(customer.customer_name)) ||
+      index.byEmail.get(normalizeKey(customer.custom_email));
+
+    if (match) {
+      const frappeTaxStatus = customer.custom_tax_status?.toLowerCase();
+      const isTaxStatusCompatible =
+        (frappeTaxStatus === 'exempt' && match.Taxable === false) ||
+        (frappeTaxStatus === 'taxed' && match.Taxable === true);
 
-      if (result === 'matched') {
-        report.matched.push(customer.name);
-      } else if (result === 'not_found') {
-        report.notFound.push(customer.name);
+      if (!isTaxStatusCompatible) {
+        report.skipped[customer.name] = 'Tax Status Mismatch';
+        updates.push({ name: customer.name, values: { custom_qbo_sync_status: 'Tax Status Mismatch' } });
+        continue;
       }
-    } catch (err: any) {
-      const reason = err?.message || 'Unknown error';
-      console.error(`❌ Failed to sync ${customer.name}:`, reason);
-      report.failed.push({ name: customer.name, reason });
+
+      report.matched.push(customer.name);
+      updates.push({
+        name: customer.name,
+        values: {
+          custom_qbo_customer_id: match.Id,
+          custom_qbo_sync_status: 'Synced',
+          custom_qbo_last_synced_at: now,
+          custom_customer_exists_in_qbo: 1,
+        },
+      });
+      continue;
     }
+
+    const { payload, missing } = buildQboCustomer(customer);
+    if (!isEligibleForCreate(customer, missing)) {
+      report.skipped[customer.name] = missing.length ? `Missing ${missing.join(', ')}` : 'Not eligible for QBO';
+      continue;
+    }
+    creates.push({ bId: customer.name, operation: 'create', Customer: payload });
   }
 
-  // Summary
-  console.log(`\n📊 Sync Summary:`);
-  console.log(`✅ Matched: ${report.matched.length}`);
-  console.log(`🔍 Not Found: ${report.notFound.length}`);
-  console.log(`❌ Failed: ${report.failed.length}`);
-
-  if (report.failed.length) {
-    console.log('\n🧾 Failures:');
-    for (const f of report.failed) {
-      console.log(`- ${f.name}: ${f.reason}`);
+  // Create only the missing customers, 30 per batch request
+  const results = await qboBatch(baseUrl, headers, creates, QBO_BATCH_CONCURRENCY);
+  for (const [name, result] of results) {
+    if (result.ok && result.entity?.Id) {
+      report.created.push(name);
+      updates.push({
+        name,
+        values: {
+          custom_qbo_customer_id: result.entity.Id,
+          custom_qbo_sync_status: 'Synced',
+          custom_qbo_last_synced_at: now,
+          custom_customer_exists_in_qbo: 1,
+          custom_create_customer_in_qbo: 0,
+        },
+      });
+    } else {
+      report.failed[name] = result.error || 'QBO returned no Customer';
     }
   }
+
+  // Write the links back to Frappe, a chunk of customers per request
+  const chunks: (typeof updates)[] = [];
+  for (let i = 0; i < updates.length; i += SYNC_STATUS_CHUNK) {
+    chunks.push(updates.slice(i, i + SYNC_STATUS_CHUNK));
+  }
+  await mapWithConcurrency(chunks, FRAPPE_CONCURRENCY, async (chunk) => {
+    try {
+      const { failed } = await frappe.setSyncStatus('Customer', chunk);
+      for (const [name, reason] of Object.entries(failed)) {
+        report.failed[name] = `Frappe update failed: ${reason}`;
+      }
+    } catch (err: any) {
+      for (const { name } of chunk) {
+        report.failed[name] = `Frappe update failed: ${err?.message || 'Unknown error'}`;
+      }
+    }
+  });
+
+  // Summary
+  const seconds = (Date.now() - started) / 1000;
+  console.error(`📊 Sync Summary (${seconds.toFixed(1)}s):`);
+  console.error(`✅ Matched: ${report.matched.length}`);
+  console.error(`🆕 Created: ${report.created.length}`);
+  console.error(`⏭️ Skipped: ${Object.keys(report.skipped).length}`);
+  console.error(`❌ Failed: ${Object.keys(report.failed).length}`);
+  return { ...report, seconds };
 }
 
 if (require.main === module) {
-  main()
-    .then(() => console.log('\n✅ syncCustomersToQbo.ts complete'))
+  syncCustomersToQbo()
+    .then((report) => console.log(JSON.stringify(report)))
     .catch((err) => {
-      console.error('🔥 Unhandled error in batch sync:', err);
+      console.error('🔥 Unhandled error in batch sync:', err?.response?.data || err);
       process.exit(1);
     });
 }
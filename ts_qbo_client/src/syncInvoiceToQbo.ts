@@ -1,5 +1,5 @@
 import { getQboAuthHeaders, getQboBaseUrl } from "./auth"; // QBO authentication helpers
-import { frappe } from "./frappe"; // Frappe API integration
+import { frappe, NODE_CLIENT } from "./frappe"; // Frappe API integration
 import axios from "axios"; // HTTP client for API requests
 import dotenv from "dotenv"; // Loads environment variables
 dotenv.config(); // Initialize environment variables
@@ -15,6 +15,19 @@ interface QboInvoiceResponse {
   };
 }
 
+// Time spent waiting on Frappe vs QBO, reported on stderr (stdout carries only the QBO ID)
+const timings = { frappeMs: 0, qboMs: 0 };
+
+// Runs a call and adds its duration to the given timing bucket
+async function timed<T>(bucket: keyof typeof timings, call: () => Promise<T>): Promise<T> {
+  const start = Date.now();
+  try {
+    return await call();
+  } finally {
+    timings[bucket] += Date.now() - start;
+  }
+}
+
 // Main function to sync a Sales Invoice from ERPNext to QuickBooks Online
 async function main() {
   // Get invoice name from command line argument
@@ -25,23 +38,30 @@ async function main() {
   }
 
   try {
-    // Fetch invoice and customer data from Frappe
-    const invoice = await frappe.getDoc<any>("Sales Invoice", invoiceName);
-    const customer = await frappe.getDoc<any>("Customer", invoice.customer);
+    // Fetch the invoice, then everything it references in one round of parallel calls
+    const invoice = await timed("frappeMs", () => frappe.getDoc<any>("Sales Invoice", invoiceName));
+    const itemCodes: string[] = Array.from(new Set<string>(invoice.items.map((line: any) => line.item_code)));
+
+    const [customer, itemsByCode, pricesByCode, baseUrl, headers] = await timed("frappeMs", () =>
+      Promise.all([
+        frappe.getDoc<any>("Customer", invoice.customer),
+        fetchItems(itemCodes),
+        fetchSellingPrices(itemCodes),
+        getQboBaseUrl(),
+        getQboAuthHeaders(),
+        getStateTaxMap(), // warms the memoized map used by getStateTaxability
+      ])
+    );
 
     // Determine state taxability for the customer
     const state = customer.custom_state;
-    const stateTaxability = await getStateTaxability(state);
+    const stateTaxability = await timed("frappeMs", () => getStateTaxability(state));
 
     // Ensure customer has a QBO ID
     if (!customer.custom_qbo_customer_id) {
       throw new Error(`❌ Customer ${customer.name} has no QBO ID.`);
     }
 
-    // Get QBO API base URL and auth headers
-    const baseUrl = await getQboBaseUrl();
-    const headers = await getQboAuthHeaders();
-
     // Discount account IDs from environment
     const taxedDiscountID = process.env.TAXED_DISCOUNT_ID;
     const nonTaxedDiscountID = process.env.NON_TAXED_DISCOUNT_ID
@@ -60,27 +80,19 @@ async function main() {
     const discountPercentage = parseFloat(invoice.additional_discount_percentage || 0);
 
     for (const line of invoice.items) {
-      // Fetch item details from Frappe
-      const item = await frappe.getDoc<any>("Item", line.item_code);
+      // Look up prefetched item details
+      const item = itemsByCode.get(line.item_code);
 
       // Skip items without QBO item ID
-      if (!item.custom_qbo_item_id) {
-        console.warn(`⚠️ Skipping item '${item.name}' — No QBO item ID.`);
+      if (!item?.custom_qbo_item_id) {
+        console.warn(`⚠️ Skipping item '${line.item_code}' — No QBO item ID.`);
         continue;
       }
 
-      // Get item price from Frappe
-      const prices = await frappe.getAllFiltered<any>("Item Price", {
-        filters: {
-          item_code: item.name,
-          selling: 1,
-        },
-        limit: 1,
-      });
-
-      // Determine unit price
-      const unitPrice = prices.length && prices[0].price_list_rate !== undefined
-        ? prices[0].price_list_rate
+      // Determine unit price from the prefetched selling price
+      const price = pricesByCode.get(item.name);
+      const unitPrice = price !== undefined
+        ? price
         : line.rate || line.amount / line.qty || 0;
 
       // Calculate item amount
@@ -208,7 +220,7 @@ async function main() {
     }
 
     // Send invoice to QBO via API
-    const response = await axios.post(`${baseUrl}/invoice`, qboInvoice, { headers });
+    const response = await timed("qboMs", () => axios.post(`${baseUrl}/invoice`, qboInvoice, { headers }));
     const resData = response.data as QboInvoiceResponse;
 
     // Handle QBO response
@@ -237,29 +249,60 @@ async function main() {
     }
 
     process.exitCode = -1; // Failure
+  } finally {
+    console.error(`⏱️ Invoice ${invoiceName}: Frappe ${timings.frappeMs}ms, QBO ${timings.qboMs}ms`);
   }
 }
 
+// Fetch every distinct item on the invoice with a single filtered request
+async function fetchItems(itemCodes: string[]): Promise<Map<string, any>> {
+  if (itemCodes.length === 0) return new Map();
+  const items = await frappe.getAllFiltered<any>("Item", {
+    filters: { name: ["in", itemCodes] },
+    fields: ["name", "custom_qbo_item_id", "custom_tax_category", "description"],
+    limit: 0,
+  });
+  return new Map(items.map((item): [string, any] => [item.name, item]));
+}
+
+// Fetch the selling prices of every distinct item with a single filtered request.
+// Keeps the most recently modified selling price per item.
+async function fetchSellingPrices(itemCodes: string[]): Promise<Map<string, number>> {
+  const pricesByCode = new Map<string, number>();
+  if (itemCodes.length === 0) return pricesByCode;
+  const prices = await frappe.getAllFiltered<any>("Item Price", {
+    filters: { item_code: ["in", itemCodes], selling: 1 },
+    fields: ["item_code", "price_list_rate"],
+    orderBy: "modified desc",
+    limit: 0,
+  });
+  for (const price of prices) {
+    if (!pricesByCode.has(price.item_code) && price.price_list_rate !== undefined) {
+      pricesByCode.set(price.item_code, price.price_list_rate);
+    }
+  }
+  return pricesByCode;
+}
+
+
+// State taxability keyed by lower-case abbreviation and state name, fetched at most once per process.
+// The server caches the map and rebuilds it when State Tax Information is saved.
+let stateTaxMapPromise: Promise<Record<string, number>> | null = null;
+
+function getStateTaxMap(): Promise<Record<string, number>> {
+  if (!stateTaxMapPromise) {
+    stateTaxMapPromise = frappe.callMethod<Record<string, number>>(`${NODE_CLIENT}.get_state_taxability`);
+    stateTaxMapPromise.catch(() => { stateTaxMapPromise = null; });
+  }
+  return stateTaxMapPromise;
+}
 
 // Helper function to determine if a state is taxable
 async function getStateTaxability(state: string) {
   try {
-    // Fetch the State Tax Information document (assuming it's a singleton)
-    const stateInfo = await frappe.getDoc<any>("State Tax Information", "State Tax Information");
-    
-    // Convert the state to lowercase to handle case insensitivity
-    state = state.toLowerCase();
-    
-    // Dynamically check if the checkbox corresponding to the state exists
-    const fieldName = state.toLowerCase();  // Example: "california" becomes "california"
-    
-    // Check if the field exists in the document and return its value
-    if (stateInfo.hasOwnProperty(fieldName)) {
-      const isTaxable = stateInfo[fieldName];  // Will be true if checkbox is checked, false otherwise
-      return isTaxable;  // Return true or false
-    } else {
-      return false;  // If the field doesn't exist, return false
-    }
+    const stateTaxMap = await getStateTaxMap();
+    // Unknown states (e.g. outside the US) are not taxable
+    return Boolean(stateTaxMap[(state || "").trim().toLowerCase()]);
   } catch (error) {
     console.error("Error fetching State Tax Information:", error);
     return null;  // In case of any error
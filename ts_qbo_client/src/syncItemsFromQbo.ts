@@ -1,8 +1,8 @@
 // Imports for HTTP requests, Frappe API, type mapping, and date/time handling
 import axios from 'axios';
 import { frappe } from './frappe';
-import { fromFrappe } from './sync/mappers';
-import { QuickBooksSettings } from './types';
+import { getQboAuthHeaders, getQboBaseUrl } from './auth';
+import { mapWithConcurrency } from './concurrency';
 import dayjs from 'dayjs';
 import utc from 'dayjs/plugin/utc';
 import timezone from 'dayjs/plugin/timezone';
@@ -34,128 +34,409 @@ interface QboItemResponse {
   };
 }
 
+// QBO query API caps a page at 1000 rows
+const QUERY_PAGE_SIZE = 1000;
+// Selling price list that receives the QBO UnitPrice
+const SELLING_PRICE_LIST = 'Standard Selling';
+// Failed runs after which an item leaves the retry list
+const MAX_IMPORT_ATTEMPTS = 3;
+// QBO item IDs per retry query
+const RETRY_QUERY_SIZE = 100;
+
+/**
+ * Pages through QBO items with STARTPOSITION until the catalogue is exhausted.
+ * With a watermark, only items changed after it are returned, including deactivated ones
+ * so their Frappe Items can be disabled.
+ * @param watermark - MetaData.LastUpdatedTime of the newest item already imported
+ */
+async function fetchQboItems(baseUrl: string, headers: Record<string, string>, watermark?: string): Promise<QboItem[]> {
+  const where = watermark
+    ? `Active IN (true, false) AND MetaData.LastUpdatedTime > '${watermark}'`
+    : 'Active = true';
+  const items: QboItem[] = [];
+  for (let start = 1; ; start += QUERY_PAGE_SIZE) {
+    const response = await axios.get<QboItemResponse>(`${baseUrl}/query`, {
+      params: {
+        query: `SELECT * FROM Item WHERE ${where} STARTPOSITION ${start} MAXRESULTS ${QUERY_PAGE_SIZE}`,
+      },
+      headers,
+    });
+    const page = response.data.QueryResponse.Item || [];
+    items.push(...page);
+    if (page.length < QUERY_PAGE_SIZE) return items;
+  }
+}
+
+/**
+ * Fetches specific QBO items by ID, e.g. the ones left on the retry list by earlier runs.
+ * @param ids - QBO item IDs
+ */
+async function fetchQboItemsById(baseUrl: string, headers: Record<string, string>, ids: string[]): Promise<QboItem[]> {
+  const items: QboItem[] = [];
+  for (let start = 0; start < ids.length; start += RETRY_QUERY_SIZE) {
+    const idList = ids.slice(start, start + RETRY_QUERY_SIZE).map((id) => `'${id}'`).join(', ');
+    const response = await axios.get<QboItemResponse>(`${baseUrl}/query`, {
+      params: { query: `SELECT * FROM Item WHERE Id IN (${idList}) MAXRESULTS ${QUERY_PAGE_SIZE}` },
+      headers,
+    });
+    items.push(...(response.data.QueryResponse.Item || []));
+  }
+  return items;
+}
+
+/**
+ * Returns the watermark to store after a run: the newest LastUpdatedTime fetched.
+ * Failed items do not hold it back; they go on the retry list instead (see nextRetryList).
+ * @param items - Items fetched in this run
+ * @param previous - The watermark the run started from
+ */
+function nextWatermark(items: QboItem[], previous?: string): string | undefined {
+  let watermark = previous;
+  for (const item of items) {
+    const updated = item.MetaData?.LastUpdatedTime;
+    if (updated && (!watermark || Date.parse(updated) > Date.parse(watermark))) {
+      watermark = updated;
+    }
+  }
+  return watermark;
+}
+
+/**
+ * Returns the retry list to store after a run: every failed item with its attempt count.
+ * Items that reach MAX_IMPORT_ATTEMPTS are dropped and logged; they are fetched again
+ * once they change in QBO.
+ * @param previous - The retry list the run started from (QBO ID -> attempts)
+ * @param failedIds - QBO IDs of items that could not be imported in this run
+ */
+function nextRetryList(previous: Record<string, number>, failedIds: Set<string>): Record<string, number> {
+  const retry: Record<string, number> = {};
+  for (const id of failedIds) {
+    const attempts = (previous[id] || 0) + 1;
+    if (attempts >= MAX_IMPORT_ATTEMPTS) {
+      console.error(`🛑 Giving up on QBO item ${id} after ${attempts} failed attempts; it is retried when it changes in QBO`);
+      continue;
+    }
+    retry[id] = attempts;
+  }
+  return retry;
+}
+
+// frappe.client.insert_many accepts at most 200 documents per call
+const WRITE_CHUNK_SIZE = 200;
+// Bulk write requests in flight against Frappe
+const WRITE_CONCURRENCY = 4;
+
+// Existing Frappe Item fields compared against QBO
+interface FrappeItemRow {
+  name: string;
+  custom_qbo_item_id: string;
+  description?: string;
+  valuation_rate?: number;
+  disabled?: number;
+  custom_qbo_type?: string;
+  custom_tax_category?: string;
+}
+
+/**
+ * Splits a list into chunks of at most `size` elements.
+ */
+function chunked<T>(items: T[], size: number): T[][] {
+  const chunks: T[][] = [];
+  for (let i = 0; i < items.length; i += size) {
+    chunks.push(items.slice(i, i + size));
+  }
+  return chunks;
+}
+
+/**
+ * Returns the `keyField` values of the given documents that already exist in Frappe.
+ * Sent as a POST to frappe.client.get_list so a full chunk of keys does not overflow the URL.
+ */
+async function findExisting(
+  docs: Record<string, any>[],
+  keyField: string,
+  filters: Record<string, any>
+): Promise<Set<string>> {
+  const keys = docs.map((doc) => doc[keyField]);
+  const rows = await frappe.callMethod<Record<string, any>[]>('frappe.client.get_list', {
+    doctype: docs[0].doctype,
+    filters: JSON.stringify({ ...filters, [keyField]: ['in', keys] }),
+    fields: JSON.stringify([keyField]),
+    limit_page_length: keys.length,
+  });
+  return new Set(rows.map((row) => String(row[keyField])));
+}
+
+/**
+ * Inserts documents in chunks through frappe.client.insert_many with bounded concurrency.
+ * A chunk that fails is retried one document at a time so one bad row does not fail its neighbours.
+ * The failure may be a timeout after the server committed the chunk, so documents that now exist
+ * are skipped instead of being created a second time.
+ * @param docs - Documents to insert, each with `doctype`
+ * @param keyField - Field that identifies a document; reported for a document that failed
+ * @param existingFilters - Extra filters that, with `keyField`, find a document already inserted
+ * @returns Keys of the documents that could not be inserted, with the reason
+ */
+async function insertAll(
+  docs: Record<string, any>[],
+  keyField: string,
+  existingFilters: Record<string, any> = {}
+): Promise<Map<string, string>> {
+  const failed = new Map<string, string>();
+  await mapWithConcurrency(chunked(docs, WRITE_CHUNK_SIZE), WRITE_CONCURRENCY, async (chunk) => {
+    try {
+      await frappe.insertMany(chunk);
+    } catch {
+      let existing = new Set<string>();
+      try {
+        existing = await findExisting(chunk, keyField, existingFilters);
+      } catch (error: any) {
+        // Insert them one by one anyway; a duplicate then fails on its own and is reported
+        console.error(`⚠️ Could not check which ${chunk[0].doctype} documents already exist:`, error.message);
+      }
+      for (const doc of chunk) {
+        if (existing.has(String(doc[keyField]))) continue;
+        try {
+          await frappe.createDoc(doc.doctype, doc);
+        } catch (error: any) {
+          failed.set(doc[keyField], JSON.stringify(error.response?.data?.exception || error.message));
+        }
+      }
+    }
+  });
+  return failed;
+}
+
+/**
+ * Saves changed fields on existing documents in chunks through frappe.client.bulk_update.
+ * @param docs - Partial documents, each with `doctype` and `docname`
+ * @returns Names of the documents that could not be updated, with the reason
+ */
+async function updateAll(docs: Record<string, any>[]): Promise<Map<string, string>> {
+  const failed = new Map<string, string>();
+  await mapWithConcurrency(chunked(docs, WRITE_CHUNK_SIZE), WRITE_CONCURRENCY, async (chunk) => {
+    try {
+      for (const { doc, exc } of await frappe.bulkUpdate(chunk)) {
+        failed.set(doc.docname, String(exc).trim().split('\n').pop() || 'Update failed');
+      }
+    } catch (error: any) {
+      for (const doc of chunk) {
+        failed.set(doc.docname, error.message);
+      }
+    }
+  });
+  return failed;
+}
+
+/**
+ * Streams the Item Groups, QBO-linked Items and Standard Selling prices from Frappe into lookup maps.
+ */
+async function loadFrappeItemState() {
+  const groupNames = new Set<string>();
+  for await (const group of frappe.iterate<{ name: string }>('Item Group', { fields: ['name'] })) {
+    groupNames.add(group.name);
+  }
+
+  const itemsByQboId = new Map<string, FrappeItemRow>();
+  for await (const item of frappe.iterate<FrappeItemRow>('Item', {
+    filters: { custom_qbo_item_id: ['is', 'set'] },
+    fields: ['name', 'custom_qbo_item_id', 'description', 'valuation_rate', 'disabled', 'custom_qbo_type', 'custom_tax_category'],
+  })) {
+    itemsByQboId.set(item.custom_qbo_item_id, item);
+  }
+
+  // Newest price per item wins, as in the rest of the connector
+  const priceByItem = new Map<string, { name: string; price_list_rate: number }>();
+  for await (const price of frappe.iterate<{ name: string; item_code: string; price_list_rate: number }>('Item Price', {
+    filters: { price_list: SELLING_PRICE_LIST },
+    fields: ['name', 'item_code', 'price_list_rate'],
+    orderBy: 'modified desc',
+  })) {
+    if (!priceByItem.has(price.item_code)) priceByItem.set(price.item_code, price);
+  }
+
+  return { groupNames, itemsByQboId, priceByItem };
+}
+
 // Main function to sync items from QBO to Frappe
 export async function syncItemsFromQbo(): Promise<void> {
-  // Fetch QuickBooks settings from Frappe
+  const started = Date.now();
+
+  // Fetch QuickBooks settings from Frappe for the stored watermark
   const rawSettings = await frappe.getDoc<any>('QuickBooks Settings', 'QuickBooks Settings');
-  const settings = fromFrappe(rawSettings);
-
-  // Get QBO realm ID and base URL depending on environment
-  const realmId = settings.realmId;
-  const baseUrl =
-    process.env.QBO_ENV === 'production'
-      ? 'https://quickbooks.api.intuit.com/v3/company'
-      : 'https://sandbox-quickbooks.api.intuit.com/v3/company';
-
-  // Prepare QBO API headers
-  const headers = {
-    Authorization: `Bearer ${settings.accessToken}`,
-    Accept: 'application/json',
-  };
+  const watermark: string | undefined = rawSettings.item_sync_watermark || undefined;
+  const retryList: Record<string, number> = rawSettings.item_sync_retry ? JSON.parse(rawSettings.item_sync_retry) : {};
 
-  // Fetch active items from QBO
-  const response = await axios.get<QboItemResponse>(`${baseUrl}/${realmId}/query`, {
-    params: {
-      query: 'SELECT * FROM Item WHERE Active = true',
-      maxResults: 1000,
-    },
-    headers,
-  });
+  // Get QBO base URL and headers (QBO_ENV aware)
+  const baseUrl = await getQboBaseUrl();
+  const headers = await getQboAuthHeaders();
+
+  // Load the QBO changes and everything they are compared with, once
+  const [changedItems, retryItems, { groupNames, itemsByQboId, priceByItem }] = await Promise.all([
+    fetchQboItems(baseUrl, headers, watermark),
+    fetchQboItemsById(baseUrl, headers, Object.keys(retryList)),
+    loadFrappeItemState(),
+  ]);
+  console.log(
+    watermark
+      ? `🔄 ${changedItems.length} QBO item(s) changed since ${watermark}`
+      : `🔄 Full import of ${changedItems.length} active QBO item(s)`
+  );
 
-  const qboItems: QboItem[] = response.data.QueryResponse.Item || [];
+  // Earlier failures are retried alongside the changes; an item in both lists is processed once
+  const fetchedIds = new Set(changedItems.map((item) => item.Id));
+  const qboItems = changedItems.concat(retryItems.filter((item) => !fetchedIds.has(item.Id)));
+  if (retryItems.length) {
+    console.log(`🔁 Retrying ${retryItems.length} QBO item(s) that failed before`);
+  }
+
+  // Compute the work in memory. Every Item / Item Price write carries custom_skip_qbo_sync: 1 so
+  // the qbo_hooks do not push the imported values straight back to QBO (the hooks clear it again)
+  const now = dayjs().tz('America/New_York').format('YYYY-MM-DD HH:mm:ss');
+  const newGroups = new Set<string>();
+  const itemInserts: Record<string, any>[] = [];
+  const itemUpdates: Record<string, any>[] = [];
+  const pendingPrices: { itemCode: string; qboId: string; rate: number }[] = [];
 
-  // Iterate over each QBO item and sync to Frappe
   for (const item of qboItems) {
-    try {
-      // Prepare item fields for Frappe
-      const itemCode = item.Name.trim();
-      const isStockItem = item.Type === 'Inventory' ? 1 : 0;
-      const standardRate = item.UnitPrice || 0;
-      const valuationRate = item.PurchaseCost || item.UnitPrice || 0;
-      const now = dayjs().tz('America/New_York').format('YYYY-MM-DD HH:mm:ss');
-      const itemGroupName = item.Type || 'Uncategorized';
-
-      // Ensure item group exists in Frappe
-      const existingGroups = await frappe.getAllFiltered('Item Group', {
-        filters: { item_group_name: itemGroupName },
-        fields: ['name'],
-      });
+    const itemCode = item.Name.trim();
+    const standardRate = item.UnitPrice || 0;
+    const itemGroupName = item.Type || 'Uncategorized';
+
+    // Fields QBO owns on an Item
+    const qboFields = {
+      description: item.Description || '',
+      valuation_rate: item.PurchaseCost || item.UnitPrice || 0,
+      disabled: item.Active === false ? 1 : 0,
+      custom_qbo_type: item.Type,
+      custom_tax_category: item.Taxable ? 'Taxable' : 'Not Taxable',
+    };
 
-      if (!existingGroups.length) {
-        console.log(`📁 Creating missing Item Group: ${itemGroupName}`);
-        await frappe.createDoc('Item Group', {
-          item_group_name: itemGroupName,
-          is_group: 0,
-          parent_item_group: 'All Item Groups',
-        });
+    const existing = itemsByQboId.get(item.Id);
+    if (existing) {
+      // Apply QBO changes to the existing Item, only when something differs
+      const changed = (Object.keys(qboFields) as (keyof typeof qboFields)[])
+        .some((field) => String(existing[field] ?? '') !== String(qboFields[field] ?? ''));
+      if (changed) {
+        itemUpdates.push({ doctype: 'Item', docname: existing.name, ...qboFields, custom_qbo_last_synced_at: now, custom_skip_qbo_sync: 1 });
       }
+      pendingPrices.push({ itemCode: existing.name, qboId: item.Id, rate: standardRate });
+      continue;
+    }
+
+    // Skip deactivated QBO items that were never imported
+    if (item.Active === false) {
+      continue;
+    }
+
+    if (!groupNames.has(itemGroupName)) {
+      newGroups.add(itemGroupName);
+    }
+    itemInserts.push({
+      doctype: 'Item',
+      item_code: itemCode,
+      item_name: itemCode,
+      is_stock_item: item.Type === 'Inventory' ? 1 : 0,
+      stock_uom: 'Nos',
+      standard_rate: standardRate,
+      item_group: itemGroupName,
+      custom_qbo_item_id: item.Id,
+      custom_qbo_last_synced_at: now,
+      custom_skip_qbo_sync: 1,
+      ...qboFields,
+    });
+    pendingPrices.push({ itemCode, qboId: item.Id, rate: standardRate });
+  }
+
+  const failedIds = new Set<string>();
 
-      // Set tax template based on QBO item taxability
-      const taxTemplate = item.Taxable
-        ? "MD Sales Tax - Taxable - F"
-        : "MD Sales Tax - Not Taxable - F";
-
-      // Check if item already exists in Frappe
-      const existingItems = await frappe.getAllFiltered('Item', {
-        filters: {
-          custom_qbo_item_id: item.Id,
-        },
-        fields: ['name'],
+  // Item Groups first, since new Items link to them
+  for (const groupName of newGroups) {
+    console.log(`📁 Creating missing Item Group: ${groupName}`);
+    try {
+      await frappe.createDoc('Item Group', {
+        item_group_name: groupName,
+        is_group: 0,
+        parent_item_group: 'All Item Groups',
       });
+    } catch (error: any) {
+      // Items in this group fail on insert and are reported there
+      console.error(`❌ Failed to create Item Group '${groupName}':`, error.response?.data || error.message);
+    }
+  }
 
-      if (existingItems.length > 0) {
-        console.log(`🔁 Skipping '${itemCode}': already exists in Frappe as '${existingItems[0].name}'`);
-        continue;
-      }
+  // Items, then the prices of the Items that exist
+  const [insertFailures, updateFailures] = await Promise.all([
+    insertAll(itemInserts, 'custom_qbo_item_id'),
+    updateAll(itemUpdates),
+  ]);
+  for (const [qboId, reason] of insertFailures) {
+    failedIds.add(qboId);
+    console.error(`❌ Failed to create QBO item ${qboId}:`, reason);
+  }
+  const qboIdByItemCode = new Map(pendingPrices.map((price): [string, string] => [price.itemCode, price.qboId]));
+  for (const [name, reason] of updateFailures) {
+    const qboId = qboIdByItemCode.get(name);
+    if (qboId) failedIds.add(qboId);
+    console.error(`❌ Failed to update '${name}':`, reason);
+  }
 
-      // Build payload for new Frappe Item
-      const docPayload = {
-        item_code: itemCode,
-        item_name: itemCode,
-        description: item.Description || '',
-        is_stock_item: isStockItem,
-        stock_uom: 'Nos',
-        standard_rate: standardRate,
-        valuation_rate: valuationRate,
-        disabled: item.Active === false ? 1 : 0,
-        item_group: itemGroupName,
-        custom_qbo_item_id: item.Id,
-        custom_qbo_type: item.Type,
-        custom_qbo_last_synced_at: now,
+  const priceInserts: Record<string, any>[] = [];
+  const priceUpdates: Record<string, any>[] = [];
+  for (const { itemCode, qboId, rate } of pendingPrices) {
+    if (failedIds.has(qboId)) continue;
+    const existingPrice = priceByItem.get(itemCode);
+    if (!existingPrice) {
+      priceInserts.push({
+        doctype: 'Item Price', item_code: itemCode, price_list: SELLING_PRICE_LIST, selling: 1, price_list_rate: rate,
+        custom_skip_qbo_sync: 1,
+      });
+    } else if (existingPrice.price_list_rate !== rate) {
+      priceUpdates.push({
+        doctype: 'Item Price', docname: existingPrice.name, item_code: itemCode, price_list_rate: rate,
         custom_skip_qbo_sync: 1,
-        custom_tax_category: item.Taxable ? 'Taxable' : 'Not Taxable',
-      };
-
-      // Create new Item in Frappe
-      console.log(`📌 Creating Item '${itemCode}' with tax_category = ${docPayload.custom_tax_category}`);
-      await frappe.createDoc('Item', docPayload);
-      console.log(`✅ Created Item '${itemCode}' from QBO`);
-
-      // Ensure selling price exists for the item
-      const existingPrice = await frappe.getAllFiltered('Item Price', {
-        filters: {
-          item_code: itemCode,
-          price_list: 'Standard Selling',
-        },
-        fields: ['name'],
       });
-
-      if (!existingPrice.length) {
-        await frappe.createDoc('Item Price', {
-          item_code: itemCode,
-          price_list: 'Standard Selling',
-          selling: 1,
-          price_list_rate: standardRate,
-        });
-        console.log(`💲 Added selling price for '${itemCode}'`);
-      } else {
-        console.log(`ℹ️  Skipped price for '${itemCode}' (already exists)`);
-      }
-    } catch (error: any) {
-      // Error handling for item sync failures
-      console.error(`❌ Failed to sync QBO item '${item.Name}':`, error.response?.data || error.message);
     }
   }
+  const [priceInsertFailures, priceUpdateFailures] = await Promise.all([
+    insertAll(priceInserts, 'item_code', { price_list: SELLING_PRICE_LIST, selling: 1 }),
+    updateAll(priceUpdates),
+  ]);
+  for (const [itemCode, reason] of priceInsertFailures) {
+    const qboId = qboIdByItemCode.get(itemCode);
+    if (qboId) failedIds.add(qboId);
+    console.error(`❌ Failed to add selling price for '${itemCode}':`, reason);
+  }
+  const itemCodeByPrice = new Map(priceUpdates.map((doc): [string, string] => [doc.docname, doc.item_code]));
+  for (const [priceName, reason] of priceUpdateFailures) {
+    const qboId = qboIdByItemCode.get(itemCodeByPrice.get(priceName) || '');
+    if (qboId) failedIds.add(qboId);
+    console.error(`❌ Failed to update selling price ${priceName}:`, reason);
+  }
+
+  // Advance the watermark so the next run only fetches newer changes, and keep failures on the retry list
+  const watermarkAfter = nextWatermark(qboItems, watermark);
+  const retryAfter = nextRetryList(retryList, failedIds);
+  const retryChanged = JSON.stringify(retryAfter) !== JSON.stringify(retryList);
+  if ((watermarkAfter && watermarkAfter !== watermark) || retryChanged) {
+    await frappe.updateDoc('QuickBooks Settings', {
+      name: 'QuickBooks Settings',
+      item_sync_watermark: watermarkAfter || '',
+      item_sync_retry: Object.keys(retryAfter).length ? JSON.stringify(retryAfter) : '',
+    });
+    console.log(`🕒 Item sync watermark → ${watermarkAfter}, ${Object.keys(retryAfter).length} item(s) to retry`);
+  }
+
+  const seconds = (Date.now() - started) / 1000;
+  const processed = qboItems.length - failedIds.size;
+  console.log(
+    `📊 ${itemInserts.length - insertFailures.size} created, ${itemUpdates.length - updateFailures.size} updated, ` +
+    `${priceInserts.length + priceUpdates.length - priceInsertFailures.size - priceUpdateFailures.size} price(s) written, ` +
+    `${failedIds.size} failed in ${seconds.toFixed(1)}s (${(processed / Math.max(seconds, 0.001)).toFixed(1)} items/s)`
+  );
+  if (failedIds.size) {
+    console.warn(`⚠️ ${failedIds.size} item(s) failed; see the retry list in QuickBooks Settings`);
+  }
 }
 
 // Run syncItemsFromQbo if this file is executed directly
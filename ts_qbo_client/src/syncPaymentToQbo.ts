@@ -77,25 +77,42 @@ async function main() {
     const lineItems: any[] = [];
 
     if (Array.isArray(paymentEntry.references)) {
-      for (const ref of paymentEntry.references) {
-        if (ref.reference_doctype === "Sales Invoice" && ref.reference_name) {
-          // Link payment to QBO Sales Invoice if available
-          const linkedInvoice = await frappe.getDoc<any>("Sales Invoice", ref.reference_name);
-          if (linkedInvoice?.custom_qbo_sales_invoice_id) {
-            lineItems.push({
-              Amount: ref.allocated_amount || paymentEntry.paid_amount,
-              LinkedTxn: [
-                {
-                  TxnId: linkedInvoice.custom_qbo_sales_invoice_id,
-                  TxnType: "Invoice",
-                },
-              ],
-            });
-          } else {
-            console.warn(`⚠️ No valid QBO Sales Invoice ID for ${ref.reference_name}`);
+      const invoiceRefs = paymentEntry.references.filter(
+        (ref: any) => ref.reference_doctype === "Sales Invoice" && ref.reference_name
+      );
+
+      // Resolve the QBO IDs of every referenced Sales Invoice in one query
+      const qboIdsByInvoice = new Map<string, string>();
+      if (invoiceRefs.length > 0) {
+        const linkedInvoices = await frappe.getAllFiltered<any>("Sales Invoice", {
+          filters: { name: ["in", invoiceRefs.map((ref: any) => ref.reference_name)] },
+          fields: ["name", "custom_qbo_sales_invoice_id"],
+          limit: 0,
+        });
+        for (const inv of linkedInvoices) {
+          if (inv.custom_qbo_sales_invoice_id) {
+            qboIdsByInvoice.set(inv.name, inv.custom_qbo_sales_invoice_id);
           }
         }
       }
+
+      for (const ref of invoiceRefs) {
+        // Link payment to QBO Sales Invoice if available
+        const qboInvoiceId = qboIdsByInvoice.get(ref.reference_name);
+        if (qboInvoiceId) {
+          lineItems.push({
+            Amount: ref.allocated_amount || paymentEntry.paid_amount,
+            LinkedTxn: [
+              {
+                TxnId: qboInvoiceId,
+                TxnType: "Invoice",
+              },
+            ],
+          });
+        } else {
+          console.warn(`⚠️ No valid QBO Sales Invoice ID for ${ref.reference_name}`);
+        }
+      }
     }
 
     // If no references, add a generic payment line
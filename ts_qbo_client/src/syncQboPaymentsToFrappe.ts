@@ -4,7 +4,7 @@ import dotenv from "dotenv";
 dotenv.config(); // Load environment variables
 
 import axios from "axios";
-import { frappe } from "./frappe";
+import { frappe, NODE_CLIENT } from "./frappe";
 import { getQboAuthHeaders, getQboBaseUrl } from "./auth";
 
 // Type for QBO Payment
@@ -13,6 +13,7 @@ interface QboPayment {
   TotalAmt: number;
   TxnDate: string;
   Line: {
+    Amount?: number;
     LinkedTxn?: {
       TxnId: string;
       TxnType: "Invoice";
@@ -20,31 +21,11 @@ interface QboPayment {
   }[];
 }
 
-// Type for Frappe Payment Entry payload
-interface FrappePaymentEntryPayload {
-  payment_type: "Receive";
-  party_type: "Customer";
-  party: string;
-  posting_date: string;
-  paid_amount: number;
-  received_amount: number;
-  paid_to: string;
-  mode_of_payment: string;
-  references: {
-    reference_doctype: string;
-    reference_name: string;
-    allocated_amount: number;
-  }[];
-  custom_qbo_payment_id: string;
-  custom_sync_status?: string;
-  custom_dont_sync_with_qbo?: number;
-  
-}
-
-// Type for Frappe document creation response
-interface FrappeDocCreateResponse {
-  name: string;
-  [key: string]: any;
+// Result of the server-side payment import
+interface ImportQboPaymentResult {
+  status: "exists" | "created" | "skipped";
+  name?: string;
+  reason?: string;
 }
 
 // Main function to sync a single QBO Payment to ERPNext
@@ -75,7 +56,8 @@ export async function syncSingleQboPayment(paymentId: string) {
       return;
     }
 
-    // Iterate over each line in the payment
+    // Collect the amount applied to each linked QBO invoice across all lines
+    const amountsByQboInvoice = new Map<string, number>();
     for (const [lineIndex, line] of payment.Line.entries()) {
       console.log(`➡️ Processing Line ${lineIndex + 1} of Payment ${paymentId}`);
 
@@ -85,7 +67,6 @@ export async function syncSingleQboPayment(paymentId: string) {
         continue;
       }
 
-      // Iterate over each linked transaction
       for (const [txnIndex, txn] of line.LinkedTxn.entries()) {
         console.log(`  🔗 LinkedTxn ${txnIndex + 1}: TxnId=${txn.TxnId}, TxnType=${txn.TxnType}`);
 
@@ -95,93 +76,40 @@ export async function syncSingleQboPayment(paymentId: string) {
           continue;
         }
 
-        const qboInvoiceId = txn.TxnId;
-
-        // Find matching ERPNext Sales Invoice by custom_qbo_sales_invoice_id
-        console.log(`  🔍 Searching ERPNext Sales Invoice with custom_qbo_sales_invoice_id=${qboInvoiceId}`);
-        const frappeInvoices = await frappe.getAllFiltered("Sales Invoice", {
-          filters: {
-            custom_qbo_sales_invoice_id: qboInvoiceId,
-            docstatus: 1,
-          },
-          fields: ["name", "customer", "outstanding_amount"],
-          limit: 1,
-        });
-
-        if (frappeInvoices.length === 0) {
-          console.log(`  ⚠️ No ERPNext Sales Invoice matched for QBO Invoice ID: ${qboInvoiceId}`);
-          continue;
-        }
-
-        const frappeInvoice = frappeInvoices[0];
-        console.log(`  ✅ Found ERPNext Sales Invoice: ${frappeInvoice.name}, Customer: ${frappeInvoice.customer}`);
-
-        // Check if Payment Entry for this QBO payment already exists to avoid duplicates
-        const existingPayments = await frappe.getAllFiltered("Payment Entry", {
-          filters: {
-            custom_qbo_payment_id: paymentId,
-          },
-          limit: 1,
-        });
-
-        if (existingPayments.length > 0) {
-          console.log(`  ✅ QBO Payment ${paymentId} already synced as Payment Entry ${existingPayments[0].name}. Skipping creation.`);
-          continue;
-        }
-
-        // Optional: Also check if invoice is fully paid, skip if so
-        if (frappeInvoice.outstanding_amount <= 0) {
-          console.log(`  ⚠️ ERPNext Sales Invoice ${frappeInvoice.name} is already fully paid. Skipping Payment Entry creation.`);
-          continue;
-        }
-
-        console.log(`The Invoice name is ${frappeInvoice.name}`);
-
-        // Build Payment Entry payload for ERPNext
-        const paymentEntry: FrappePaymentEntryPayload & {
-          reference_no: string;
-          reference_date: string;
-        } = {
-          payment_type: "Receive",
-          party_type: "Customer",
-          party: frappeInvoice.customer,
-          posting_date: payment.TxnDate,
-          paid_amount: payment.TotalAmt,
-          received_amount: payment.TotalAmt,
-          paid_to: "Bank Account - F",  // Adjust as needed
-          mode_of_payment: "Cash",       // Adjust as needed
-          reference_no: paymentId,
-          reference_date: payment.TxnDate,
-          references: [
-            {
-              reference_doctype: "Sales Invoice",
-              reference_name: frappeInvoice.name,
-              allocated_amount: payment.TotalAmt,
-            },
-          ],
-          custom_qbo_payment_id: paymentId,
-          custom_sync_status: "Synced",
-          custom_dont_sync_with_qbo: 1,
-        };
-
-        // Log payload for debugging
-        console.log("  📤 Payload sent to Frappe:", JSON.stringify(paymentEntry, null, 2));
-
-        // Create Payment Entry in ERPNext
-        const created = await frappe.createDoc<FrappeDocCreateResponse>("Payment Entry", paymentEntry);
-
-        console.log(`  📝 Created Payment Entry with name: ${created.name}`);
-
-        // Update sync status before submitting
-        created.custom_sync_status = "Synced";
-
-        // Submit Payment Entry doc
-        await frappe.submitDoc("Payment Entry", created.name);
-
-        console.log(`  ✅ Created and submitted Payment Entry ${created.name} for Sales Invoice ${frappeInvoice.name}`);
+        const lineAmount = line.Amount ?? payment.TotalAmt;
+        amountsByQboInvoice.set(txn.TxnId, (amountsByQboInvoice.get(txn.TxnId) || 0) + lineAmount);
       }
     }
 
+    if (amountsByQboInvoice.size === 0) {
+      console.log(`⚠️ Payment ID ${payment.Id} is not linked to any invoices.`);
+      return;
+    }
+    const invoiceAmounts: Record<string, number> = {};
+    amountsByQboInvoice.forEach((amount, qboInvoiceId) => { invoiceAmounts[qboInvoiceId] = amount; });
+
+    // Duplicate check, invoice matching, create and submit all run server-side in one request
+    const result = await frappe.callMethod<ImportQboPaymentResult>(`${NODE_CLIENT}.import_qbo_payment`, {
+      payment: JSON.stringify({
+        qbo_payment_id: paymentId,
+        posting_date: payment.TxnDate,
+        total_amount: payment.TotalAmt,
+        invoice_amounts: invoiceAmounts,
+        paid_to: "Bank Account - F",  // Adjust as needed
+        mode_of_payment: "Cash",       // Adjust as needed
+      }),
+    });
+
+    if (result.status === "exists") {
+      console.log(`✅ QBO Payment ${paymentId} already synced as Payment Entry ${result.name}. Skipping creation.`);
+      return;
+    }
+    if (result.status === "skipped") {
+      console.log(`⚠️ QBO Payment ${paymentId} not imported: ${result.reason}`);
+      return;
+    }
+    console.log(`✅ Created and submitted Payment Entry ${result.name}`);
+
     console.log(`🎉 QBO payment sync completed for Payment ID: ${paymentId}`);
   } catch (err: any) {
     // Error handling for sync failures
@@ -0,0 +1,120 @@
+// updateCustomerInQbo.ts
+// Sends a sparse update of changed ERPNext Customer fields to the linked QBO customer.
+import axios from 'axios';
+import dayjs from 'dayjs';
+import { frappe } from './frappe';
+import { getQboAuthHeaders, getQboBaseUrl } from './auth';
+import { normalizeCountry } from './createCustomerInQbo';
+
+// ERPNext address fields; a change to any of them resends the whole BillAddr
+const ADDRESS_FIELDS = [
+  'custom_street_address_line_1',
+  'custom_street_address_line_2',
+  'custom_city',
+  'custom_state',
+  'custom_zip_code',
+  'custom_country',
+];
+
+/**
+ * Response returned to Frappe after a customer update.
+ * @property name - ERPNext customer name.
+ * @property custom_qbo_customer_id - QBO customer ID.
+ * @property custom_qbo_sync_status - Sync status string.
+ * @property custom_last_synced_at - Last sync timestamp.
+ * @property updated_fields - QBO properties that were sent.
+ */
+interface UpdateCustomerResponse {
+  name: string;
+  custom_qbo_customer_id: string;
+  custom_qbo_sync_status: string;
+  custom_last_synced_at: string;
+  updated_fields: string[];
+}
+
+/**
+ * Builds the sparse QBO payload for the changed ERPNext fields.
+ * Blank values are left out so an emptied field never clears QBO data by accident.
+ * @param customer - The ERPNext Customer document.
+ * @param fields - Changed ERPNext field names.
+ * @returns Partial QBO Customer with only the changed properties.
+ */
+function buildSparsePayload(customer: any, fields: string[]): Record<string, any> {
+  const changed = new Set(fields);
+  const payload: Record<string, any> = {};
+  const filled = (value?: string | null) => typeof value === 'string' && value.trim().length > 0;
+
+  if (changed.has('customer_name') && filled(customer.customer_name)) {
+    payload.DisplayName = customer.customer_name.trim();
+  }
+  if (changed.has('custom_email') && filled(customer.custom_email)) {
+    payload.PrimaryEmailAddr = { Address: customer.custom_email.trim() };
+  }
+  if (changed.has('custom_phone') && filled(customer.custom_phone)) {
+    payload.PrimaryPhone = { FreeFormNumber: customer.custom_phone.trim() };
+  }
+  if (ADDRESS_FIELDS.some((field) => changed.has(field)) && filled(customer.custom_street_address_line_1)) {
+    payload.BillAddr = {
+      Line1: customer.custom_street_address_line_1,
+      Line2: customer.custom_street_address_line_2,
+      City: customer.custom_city,
+      CountrySubDivisionCode: customer.custom_state,
+      PostalCode: customer.custom_zip_code,
+      Country: normalizeCountry(customer.custom_country),
+    };
+  }
+  if (changed.has('custom_tax_status') && customer.custom_tax_status !== 'Pending') {
+    payload.Taxable = customer.custom_tax_status !== 'Exempt';
+  }
+  return payload;
+}
+
+/**
+ * Updates the QBO customer linked to an ERPNext customer with a sparse update.
+ * Fetches the current SyncToken first, as QBO requires it for every update.
+ *
+ * @param customerName - The ERPNext customer name.
+ * @param fields - ERPNext fields that changed since the last sync.
+ * @returns Sync result for Frappe.
+ */
+export async function updateCustomerInQbo(customerName: string, fields: string[]): Promise<UpdateCustomerResponse> {
+  const customer = await frappe.getDoc<any>('Customer', customerName);
+  const qboId = customer.custom_qbo_customer_id;
+  if (!qboId) {
+    throw new Error(`❌ Customer ${customerName} is not linked to a QBO customer`);
+  }
+
+  const payload = buildSparsePayload(customer, fields);
+  const updatedFields = Object.keys(payload);
+  const result: UpdateCustomerResponse = {
+    name: customer.name,
+    custom_qbo_customer_id: qboId,
+    custom_qbo_sync_status: 'Synced',
+    custom_last_synced_at: dayjs().format('YYYY-MM-DD HH:mm:ss'),
+    updated_fields: updatedFields,
+  };
+  if (updatedFields.length === 0) {
+    return result;
+  }
+
+  const baseUrl = await getQboBaseUrl();
+  const headers = await getQboAuthHeaders();
+  const { data } = await axios.get<{ Customer: { Id: string; SyncToken: string } }>(
+    `${baseUrl}/customer/${qboId}`,
+    { headers }
+  );
+
+  try {
+    await axios.post(
+      `${baseUrl}/customer`,
+      { Id: qboId, SyncToken: data.Customer.SyncToken, sparse: true, ...payload },
+      { headers }
+    );
+  } catch (error: any) {
+    console.error(`❌ Failed to update customer '${customerName}' in QBO:`, JSON.stringify(error.response?.data || error.message));
+    throw error;
+  }
+
+  console.log(`✅ Updated ${updatedFields.join(', ')} on QBO customer ${qboId} (${customerName})`);
+  return result;
+}